@@ -0,0 +1,68 @@
+# Copyright (c) Meta Platforms, Inc. and affiliates.
+#
+# This source code is licensed under the MIT license found in the
+# LICENSE file in the root directory of this source tree.
+
+"""Measure the fan-out overhead of Broadcast with 2-8 consumers.
+
+A source yields 32 ms int16 audio chunks as fast as possible and every
+consumer iterates all of them concurrently. The baseline is a single
+consumer iterating the source directly.
+
+Usage: python benchmarks/bench_broadcast.py [--chunks N] [--max-lag N]
+"""
+
+import argparse
+import asyncio
+import time
+
+from context import iftk
+
+CHUNK = bytes(1024)  # 512 samples at 16kHz
+
+
+async def source(n_chunks: int):
+    for _ in range(n_chunks):
+        yield CHUNK
+
+
+async def consume(iterator) -> int:
+    n = 0
+    async for _ in iterator:
+        n += 1
+    return n
+
+
+async def run(n_chunks: int, n_consumers: int, max_lag: int, policy) -> float:
+    start = time.perf_counter()
+    if n_consumers == 0:
+        await consume(source(n_chunks))
+    else:
+        consumers = iftk.tee(source(n_chunks), n_consumers, max_lag, policy)
+        counts = await asyncio.gather(*map(consume, consumers))
+        assert all(c <= n_chunks for c in counts)
+    return time.perf_counter() - start
+
+
+async def main(n_chunks: int, max_lag: int) -> None:
+    baseline = await run(n_chunks, 0, max_lag, None)
+    print(f"direct iteration: {baseline / n_chunks * 1e6:.2f} us/chunk")
+    print(
+        f"{'policy':>12} {'consumers':>10} {'us/chunk':>10} {'us/chunk/consumer':>18}"
+    )
+    for policy in [iftk.OverflowPolicy.BLOCK, iftk.OverflowPolicy.DROP_OLDEST]:
+        for n_consumers in [2, 4, 8]:
+            elapsed = await run(n_chunks, n_consumers, max_lag, policy)
+            per_chunk = elapsed / n_chunks * 1e6
+            print(
+                f"{policy.value:>12} {n_consumers:>10} {per_chunk:>10.2f} "
+                f"{per_chunk / n_consumers:>18.2f}"
+            )
+
+
+if __name__ == "__main__":
+    parser = argparse.ArgumentParser(description=__doc__.splitlines()[0])
+    parser.add_argument("--chunks", type=int, default=50_000)
+    parser.add_argument("--max-lag", type=int, default=64)
+    args = parser.parse_args()
+    asyncio.run(main(args.chunks, args.max_lag))
@@ -0,0 +1,90 @@
+# Copyright (c) Meta Platforms, Inc. and affiliates.
+#
+# This source code is licensed under the MIT license found in the
+# LICENSE file in the root directory of this source tree.
+
+"""Measure AudioSource capture overhead with a WAV file instead of a sound card.
+
+Reads a WAV file (by default, synthetic 16kHz noise) through WavFileSource
+as fast as possible, for several block and chunk sizes, and reports the
+audio throughput as a multiple of real time. A second run replays the file
+in real time to a consumer that stalls, and reports the drops.
+
+Free-running reads with blocks smaller than a chunk hand the GIL back and
+forth between the reader thread and the event loop, so they are bound by
+sys.getswitchinterval(); a real-time device doesn't hit this.
+
+Usage: python benchmarks/bench_capture.py [--wav PATH] [--seconds N]
+"""
+
+import argparse
+import asyncio
+import os
+import random
+import tempfile
+import time
+import wave
+
+from context import iftk
+
+
+def synthetic_wav(path: str, seconds: float, rate: int = 16000) -> None:
+    rng = random.Random(0)
+    frames = bytes(rng.getrandbits(8) for _ in range(int(seconds * rate) * 2))
+    with wave.open(path, "wb") as w:
+        w.setnchannels(1)
+        w.setsampwidth(2)
+        w.setframerate(rate)
+        w.writeframes(frames)
+
+
+async def throughput(path: str, frames_per_buffer: int, chunk_duration: float) -> tuple:
+    source = iftk.WavFileSource(
+        path, frames_per_buffer, realtime=False, chunk_duration=chunk_duration
+    )
+    start = time.perf_counter()
+    audio = 0.0
+    async with source:
+        async for frame in source:
+            audio += frame.duration
+    elapsed = time.perf_counter() - start
+    return audio / elapsed, elapsed / source.stats.chunks * 1e6
+
+
+async def stalled(path: str, stall: float) -> iftk.CaptureStats:
+    source = iftk.WavFileSource(path, buffer_duration=0.5, chunk_duration=0.1)
+    async with source:
+        await source.read()
+        await asyncio.sleep(stall)
+        while source.ring:
+            await source.read()
+    return source.stats
+
+
+async def main(path: str) -> None:
+    print(f"{'block':>6} {'chunk ms':>9} {'x realtime':>12} {'us/chunk':>9}")
+    for frames_per_buffer in [256, 512, 1024]:
+        for chunk_duration in [0.02, 0.1]:
+            speed, per_chunk = await throughput(path, frames_per_buffer, chunk_duration)
+            print(
+                f"{frames_per_buffer:>6} {chunk_duration * 1000:>9.0f} "
+                f"{speed:>12,.0f} {per_chunk:>9.1f}"
+            )
+    stats = await stalled(path, stall=1.0)
+    print(
+        f"1s stall with a 0.5s buffer: captured {stats.captured} frames, "
+        f"dropped {stats.dropped} in {stats.overflows} overflows"
+    )
+
+
+if __name__ == "__main__":
+    parser = argparse.ArgumentParser(description=__doc__.splitlines()[0])
+    parser.add_argument("--wav", help="WAV file to read; defaults to synthetic audio")
+    parser.add_argument("--seconds", type=float, default=60.0)
+    args = parser.parse_args()
+    with tempfile.TemporaryDirectory() as tmp:
+        path = args.wav
+        if path is None:
+            path = os.path.join(tmp, "synthetic.wav")
+            synthetic_wav(path, args.seconds)
+        asyncio.run(main(path))
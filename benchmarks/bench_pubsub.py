@@ -0,0 +1,82 @@
+# Copyright (c) Meta Platforms, Inc. and affiliates.
+#
+# This source code is licensed under the MIT license found in the
+# LICENSE file in the root directory of this source tree.
+
+"""Measure PubSub.publish cost as the number of subscribers grows.
+
+Each bus has a mix of subscribers: a quarter listen to the published event
+type, a quarter listen to a base class of it, and the rest listen to an
+unrelated type and should cost nothing once the dispatch index is warm.
+
+With --concurrent the bus delivers through per-subscriber inboxes, and the
+time includes draining them. With --trace every publish and delivery is
+recorded by an iftk.Tracer; compare with the default to see its cost.
+
+Usage: python benchmarks/bench_pubsub.py [--events N] [--concurrent] [--trace]
+"""
+
+import argparse
+import asyncio
+import time
+
+from context import iftk
+
+
+class AudioEvent:
+    pass
+
+
+class AudioChunk(AudioEvent):
+    pass
+
+
+class Transcript:
+    pass
+
+
+class CountingSubscriber(iftk.BaseSubscriber):
+    def __init__(self, subscribes_to: type) -> None:
+        self.subscribes_to = subscribes_to
+        self.count = 0
+
+    async def on_event(self, event) -> None:
+        self.count += 1
+
+
+async def bench_publish(
+    n_subscribers: int, n_events: int, concurrent: bool = False
+) -> float:
+    """Return the mean publish() time in microseconds."""
+    pubsub = iftk.PubSub(concurrent=concurrent)
+    for i in range(n_subscribers):
+        kind = (AudioChunk, AudioEvent, Transcript, Transcript)[i % 4]
+        pubsub.subscribe(CountingSubscriber(kind))
+
+    event = AudioChunk()
+    await pubsub.publish(event)  # warm up the dispatch index
+    start = time.perf_counter()
+    for _ in range(n_events):
+        await pubsub.publish(event)
+    await pubsub.drain()
+    elapsed = time.perf_counter() - start
+    await pubsub.shutdown()
+    return elapsed / n_events * 1e6
+
+
+async def main(n_events: int, concurrent: bool) -> None:
+    print(f"{'subscribers':>12} {'us/publish':>12}")
+    for n_subscribers in (10, 100, 1000):
+        us = await bench_publish(n_subscribers, n_events, concurrent)
+        print(f"{n_subscribers:>12} {us:>12.2f}")
+
+
+if __name__ == "__main__":
+    parser = argparse.ArgumentParser(description=__doc__.splitlines()[0])
+    parser.add_argument("--events", type=int, default=10_000)
+    parser.add_argument("--concurrent", action="store_true")
+    parser.add_argument("--trace", action="store_true")
+    args = parser.parse_args()
+    if args.trace:
+        iftk.enable_tracing()
+    asyncio.run(main(args.events, args.concurrent))
@@ -0,0 +1,85 @@
+# Copyright (c) Meta Platforms, Inc. and affiliates.
+#
+# This source code is licensed under the MIT license found in the
+# LICENSE file in the root directory of this source tree.
+
+"""Measure Segmenter throughput on synthetic LLM token streams.
+
+Tokens are sub-word pieces of generated text with sentences of varying
+length, commas, decimals, abbreviations and occasional newlines. The naive
+splitter that groq_sentence_stream used before Segmenter is included for
+reference.
+
+Usage: python benchmarks/bench_segmenter.py [--tokens N] [--sentence-words N]
+"""
+
+import argparse
+import random
+import time
+
+from context import iftk
+
+WORDS = "the a model answer is of to and in that it for you with on as".split()
+SPECIAL = ["3.5", "Dr.", "e.g.", "U.S.", "2024"]
+
+
+def synthetic_tokens(n_tokens: int, sentence_words: int, seed: int = 0) -> list[str]:
+    rng = random.Random(seed)
+    tokens = []
+    while len(tokens) < n_tokens:
+        for i in range(rng.randint(sentence_words // 2, sentence_words * 2)):
+            word = rng.choice(SPECIAL) if rng.random() < 0.05 else rng.choice(WORDS)
+            word = " " + word if i else word.capitalize()
+            if rng.random() < 0.1:
+                word += ","
+            # Split words into sub-word pieces, like a tokenizer would.
+            while word:
+                cut = rng.randint(1, 4)
+                tokens.append(word[:cut])
+                word = word[cut:]
+        tokens.append(rng.choice([".", "?", "!", ".\n"]))
+        tokens.append(" ")
+    return tokens[:n_tokens]
+
+
+def naive_split(tokens: list[str]) -> list[str]:
+    sentences, sentence = [], ""
+    for new_text in tokens:
+        if new_text != "" and "." not in new_text:
+            sentence += new_text
+        else:
+            sentence += new_text
+            if sentence:
+                sentences.append(sentence)
+            sentence = ""
+    return sentences
+
+
+def segment(tokens: list[str], policy: iftk.SegmentPolicy) -> list[str]:
+    segmenter = iftk.Segmenter(policy)
+    segments = []
+    for token in tokens:
+        segments += segmenter.push(token)
+    return segments + segmenter.flush()
+
+
+def main(n_tokens: int, sentence_words: int) -> None:
+    tokens = synthetic_tokens(n_tokens, sentence_words)
+    candidates = {"naive": naive_split}
+    for policy in iftk.SegmentPolicy:
+        candidates[policy.value] = lambda tokens, policy=policy: segment(tokens, policy)
+
+    print(f"{'splitter':>12} {'tokens/s':>12} {'segments':>10}")
+    for name, split in candidates.items():
+        start = time.perf_counter()
+        segments = split(tokens)
+        elapsed = time.perf_counter() - start
+        print(f"{name:>12} {n_tokens / elapsed:>12,.0f} {len(segments):>10}")
+
+
+if __name__ == "__main__":
+    parser = argparse.ArgumentParser(description=__doc__.splitlines()[0])
+    parser.add_argument("--tokens", type=int, default=200_000)
+    parser.add_argument("--sentence-words", type=int, default=20)
+    args = parser.parse_args()
+    main(args.tokens, args.sentence_words)
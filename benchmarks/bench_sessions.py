@@ -0,0 +1,141 @@
+# Copyright (c) Meta Platforms, Inc. and affiliates.
+#
+# This source code is licensed under the MIT license found in the
+# LICENSE file in the root directory of this source tree.
+
+"""Load-test a SessionManager with N synthetic sessions sharing one model.
+
+Each session is a simulated conversation: it writes a turn, waits for the
+reply, pauses for a random think time, and repeats. Its pipeline answers a
+turn with a burst of inference calls submitted at once to a shared
+executor, each sleeping for --step-ms outside the GIL like a real model
+call. Every fourth session asks for replies four times as long, so with the
+FIFO thread pool their bursts delay everyone else, while FairExecutor takes
+turns between sessions: under load, the median turn gets faster and the
+long replies make up the tail. Sessions beyond --max-sessions are rejected
+by admission control.
+
+Reports p50/p95/p99 turn latency (write to reply) over all admitted sessions.
+
+Usage: python benchmarks/bench_sessions.py [--sessions 1 8 32 64] [--turns N]
+"""
+
+import argparse
+import asyncio
+import random
+import statistics
+import time
+from concurrent.futures import ThreadPoolExecutor
+from dataclasses import dataclass
+
+from context import iftk
+
+
+@dataclass
+class Turn:
+    sent: float
+    steps: int
+
+
+@dataclass
+class Reply:
+    sent: float
+
+
+class Agent(iftk.Subscriber):
+    subscribes_to = Turn
+    publishes = Reply
+
+    def __init__(self, session: iftk.Session, executor, step: float) -> None:
+        super().__init__(session.pubsub)
+        self.session = session
+        self.executor = executor
+        self.step = step
+        session.state["history"] = []
+
+    async def on_event(self, turn: Turn) -> None:
+        # Independent calls, like synthesizing every sentence of a reply.
+        await asyncio.gather(
+            *(
+                iftk.run_in_executor(self.executor, time.sleep, self.step)
+                for _ in range(turn.steps)
+            )
+        )
+        self.session.state["history"].append(turn)
+        await self.publish(Reply(turn.sent))
+
+
+async def client(
+    manager: iftk.SessionManager, index: int, turns: int, steps: int, think: float
+) -> list[float]:
+    try:
+        session = await manager.create_async_channel()
+    except iftk.SessionLimitError:
+        return []
+    rng = random.Random(index)
+    if index % 4 == 0:
+        steps *= 4
+    latencies = []
+    await asyncio.sleep(rng.uniform(0, think))
+    for _ in range(turns):
+        await session.write(Turn(time.perf_counter(), steps))
+        reply = await session.read()
+        latencies.append(time.perf_counter() - reply.sent)
+        await asyncio.sleep(rng.uniform(0, 2 * think))
+    await session.close()
+    return latencies
+
+
+async def run(args, n_sessions: int, executor) -> tuple[list[float], int]:
+    manager = iftk.SessionManager(
+        lambda session: Agent(session, executor, args.step_ms / 1000),
+        max_sessions=args.max_sessions,
+        outputs=Reply,
+    )
+    results = await asyncio.gather(
+        *(
+            client(manager, i, args.turns, args.steps, args.think)
+            for i in range(n_sessions)
+        )
+    )
+    await manager.shutdown()
+    return [x for latencies in results for x in latencies], manager.stats.rejected
+
+
+async def main(args) -> None:
+    print(
+        f"{'executor':>8} {'sessions':>9} {'rejected':>9} "
+        f"{'p50 ms':>8} {'p95 ms':>8} {'p99 ms':>8}"
+    )
+    for n_sessions in args.sessions:
+        for name in ["fifo", "fair"]:
+            if name == "fifo":
+                executor = ThreadPoolExecutor(args.workers)
+            else:
+                executor = iftk.FairExecutor(args.workers)
+            latencies, rejected = await run(args, n_sessions, executor)
+            executor.shutdown()
+            if len(latencies) > 1:
+                q = statistics.quantiles(latencies, n=100, method="inclusive")
+                p50, p95, p99 = q[49], q[94], q[98]
+            else:
+                p50 = p95 = p99 = latencies[0] if latencies else float("nan")
+            print(
+                f"{name:>8} {n_sessions:>9} {rejected:>9} "
+                f"{p50 * 1e3:>8.1f} {p95 * 1e3:>8.1f} {p99 * 1e3:>8.1f}"
+            )
+
+
+if __name__ == "__main__":
+    parser = argparse.ArgumentParser(description=__doc__.splitlines()[0])
+    parser.add_argument("--sessions", type=int, nargs="+", default=[1, 8, 32, 64])
+    parser.add_argument("--max-sessions", type=int, default=48)
+    parser.add_argument("--turns", type=int, default=5)
+    parser.add_argument("--steps", type=int, default=5, help="inference calls per turn")
+    parser.add_argument("--step-ms", type=float, default=2.0)
+    parser.add_argument(
+        "--think", type=float, default=0.3, help="mean seconds between turns"
+    )
+    parser.add_argument("--workers", type=int, default=2)
+    args = parser.parse_args()
+    asyncio.run(main(args))
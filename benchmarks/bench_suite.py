@@ -0,0 +1,349 @@
+# Copyright (c) Meta Platforms, Inc. and affiliates.
+#
+# This source code is licensed under the MIT license found in the
+# LICENSE file in the root directory of this source tree.
+
+"""Run the offline benchmark suite and write the results as JSON.
+
+Every benchmark runs against the stand-ins in fakes.py, so results are
+reproducible without a microphone, API keys or model weights:
+
+- pubsub/*: publish() to on_event() latency and throughput, delivered
+  inline and through concurrent inboxes, to 4 subscribers.
+- channel/*: write() to read() latency and throughput of DequeChannel and
+  RingChannel, between two tasks.
+- pipeline/deepgram: end of speech to final transcript, replaying a WAV
+  file in real time through deepgram_events() and FakeDeepgram.
+- pipeline/api: end of speech to final transcript and to first audio,
+  through Deepgram, Groq (with speculative_responses) and ElevenLabs.
+- pipeline/local: end of speech to transcript and to first audio, through
+  the Silero VAD, Whisper and XTTS helpers with stub models.
+
+The Deepgram, Groq and ElevenLabs helpers don't need their SDKs to run
+against the fakes, but the local helpers need torch even with stub models;
+pipelines whose helpers can't be imported here are recorded as skipped.
+Latencies are in milliseconds. Pass --compare with an earlier run's JSON
+to print the relative change of every metric.
+
+Usage: python benchmarks/bench_suite.py [--only NAME ...] [--output PATH] [--compare PATH]
+"""
+
+import argparse
+import asyncio
+import json
+import os
+import platform
+import subprocess
+import sys
+import tempfile
+import time
+
+import fakes
+from context import iftk
+
+
+def summarize(latencies: list[float]) -> dict:
+    summary = iftk.Histogram(latencies).summary()
+    return {
+        "count": summary["count"],
+        "mean_ms": summary["mean"] * 1e3,
+        "p50_ms": summary["p50"] * 1e3,
+        "p99_ms": summary["p99"] * 1e3,
+    }
+
+
+class Stamped:
+    __slots__ = ("sent",)
+
+    def __init__(self) -> None:
+        self.sent = time.perf_counter()
+
+
+class LatencySubscriber(iftk.BaseSubscriber):
+    subscribes_to = Stamped
+
+    def __init__(self) -> None:
+        self.latencies = []
+
+    async def on_event(self, event: Stamped) -> None:
+        self.latencies.append(time.perf_counter() - event.sent)
+
+
+async def bench_pubsub(n_events: int, concurrent: bool) -> dict:
+    pubsub = iftk.PubSub(concurrent=concurrent)
+    subscribers = [LatencySubscriber() for _ in range(4)]
+    for subscriber in subscribers:
+        pubsub.subscribe(subscriber)
+    start = time.perf_counter()
+    for _ in range(n_events):
+        await pubsub.publish(Stamped())
+    await pubsub.drain()
+    elapsed = time.perf_counter() - start
+    await pubsub.shutdown()
+    return {
+        "events_per_second": n_events / elapsed,
+        "latency": summarize([x for s in subscribers for x in s.latencies]),
+    }
+
+
+async def bench_channel(n_items: int, kind: str) -> dict:
+    readable = asyncio.Event()
+    if kind == "ring":
+        channel = iftk.RingChannel(64)
+    else:
+        channel = iftk.DequeChannel(readable.set)
+    latencies = []
+
+    async def produce():
+        for i in range(n_items):
+            if kind == "ring":
+                await channel.write(time.perf_counter())
+            else:
+                channel.write(time.perf_counter())
+                if i % 64 == 63:
+                    # Let the reader catch up, as RingChannel would.
+                    await asyncio.sleep(0)
+
+    async def consume():
+        while len(latencies) < n_items:
+            if kind == "ring":
+                sent = await channel.read()
+            else:
+                sent = channel.read()
+                if sent is None:
+                    readable.clear()
+                    await readable.wait()
+                    continue
+            latencies.append(time.perf_counter() - sent)
+
+    start = time.perf_counter()
+    await asyncio.gather(produce(), consume())
+    elapsed = time.perf_counter() - start
+    return {"items_per_second": n_items / elapsed, "latency": summarize(latencies)}
+
+
+class Turns:
+    """Replays the speech WAV in real time and turns arrival times into end-of-speech latencies."""
+
+    def __init__(self, wav: str, ends: list[float]) -> None:
+        self.wav = wav
+        self.ends = ends
+        self.start: float | None = None  # capture time of the first sample
+
+    async def microphone(self):
+        async for frame in fakes.wav_microphone(self.wav):
+            if self.start is None:
+                self.start = frame.timestamp
+            yield frame
+
+    def since_end_of_speech(self, turn: int) -> float:
+        return time.monotonic() - (self.start + self.ends[turn])
+
+
+async def bench_deepgram(wav: str, ends: list[float], args) -> dict:
+    from iftk.helpers import deepgram
+
+    turns = Turns(wav, ends)
+    latencies = []
+    async with fakes.FakeDeepgram(args.deepgram_latency) as server:
+        url = deepgram.deepgram_url(
+            endpointing=300, interim_results=False, url=server.url
+        )
+        pool = deepgram.DeepgramPool("key", url=url, size=1)
+        await pool.start()
+        async for event in deepgram.deepgram_events("key", turns.microphone(), pool):
+            if event.speech_final and len(latencies) < len(ends):
+                latencies.append(turns.since_end_of_speech(len(latencies)))
+        await pool.close()
+    return {"end_of_speech_to_transcript": summarize(latencies)}
+
+
+async def bench_api(wav: str, ends: list[float], args) -> dict:
+    from iftk.helpers import deepgram, elevenlabs, groq
+
+    turns = Turns(wav, ends)
+    groq_client = fakes.FakeGroq(first_token_latency=args.llm_latency)
+    eleven_client = fakes.FakeElevenLabs(first_byte_latency=args.tts_latency)
+    to_transcript, to_audio = [], []
+
+    async def respond(text: str):
+        llm_stream = await groq_client.chat.completions.create(
+            messages=[{"role": "user", "content": text}], model="fake", stream=True
+        )
+        async for sentence in groq.groq_sentence_stream(llm_stream):
+            yield sentence
+
+    async with fakes.FakeDeepgram(args.deepgram_latency) as server:
+        url = deepgram.deepgram_url(
+            endpointing=300, interim_results=True, url=server.url
+        )
+        pool = deepgram.DeepgramPool("key", url=url, size=1)
+        await pool.start()
+        transcripts = deepgram.deepgram_events("key", turns.microphone(), pool)
+        async for _, sentences in iftk.speculative_responses(transcripts, respond):
+            turn = len(to_transcript)
+            to_transcript.append(turns.since_end_of_speech(turn))
+            async for audio in elevenlabs.eleven_prefetch_stream(
+                sentences, eleven_client
+            ):
+                async for _ in audio:
+                    if len(to_audio) == turn:
+                        to_audio.append(turns.since_end_of_speech(turn))
+        await pool.close()
+    return {
+        "end_of_speech_to_transcript": summarize(to_transcript),
+        "end_of_speech_to_first_audio": summarize(to_audio),
+    }
+
+
+async def bench_local(wav: str, ends: list[float], args) -> dict:
+    from iftk.helpers import silero_vad, whisper, xtts
+
+    registry = fakes.stub_registry()
+    synthesizer = xtts.XttsSynthesizer(gpu=False, registry=registry)
+    llm = fakes.FakeGroq(first_token_latency=args.llm_latency)
+    turns = Turns(wav, ends)
+    to_transcript, to_audio = [], []
+    frames: list[iftk.AudioFrame] = []
+
+    async def recorded():
+        async for frame in turns.microphone():
+            frames.append(frame)
+            yield frame
+
+    async def tokens():
+        stream = await llm.chat.completions.create(messages=[], stream=True)
+        async for chunk in stream:
+            yield chunk.choices[0].delta.content
+
+    async def segment():
+        yield b"".join(frame.data for frame in frames)
+
+    async for event in silero_vad.silero_vad_events(recorded(), registry=registry):
+        if isinstance(event, iftk.SpeechStartEvent):
+            del frames[:-1]
+            continue
+        turn = len(to_transcript)
+        if turn == len(ends):
+            break
+        async for _ in whisper.whisper_stream(segment(), registry=registry):
+            pass
+        to_transcript.append(turns.since_end_of_speech(turn))
+        sentences = iftk.segment_stream(tokens(), iftk.SegmentPolicy.FIRST_CHUNK)
+        async for audio in synthesizer.prefetch_stream(sentences):
+            async for _ in audio:
+                if len(to_audio) == turn:
+                    to_audio.append(turns.since_end_of_speech(turn))
+        frames.clear()
+    return {
+        "end_of_speech_to_transcript": summarize(to_transcript),
+        "end_of_speech_to_first_audio": summarize(to_audio),
+    }
+
+
+def _git_commit() -> str | None:
+    try:
+        return subprocess.run(
+            ["git", "rev-parse", "HEAD"],
+            cwd=os.path.dirname(os.path.abspath(__file__)),
+            capture_output=True,
+            text=True,
+            check=True,
+        ).stdout.strip()
+    except (OSError, subprocess.CalledProcessError):
+        return None
+
+
+def _flatten(results: dict, prefix: str = "") -> dict[str, float]:
+    flat = {}
+    for key, value in results.items():
+        if isinstance(value, dict):
+            flat.update(_flatten(value, f"{prefix}{key}."))
+        elif isinstance(value, (int, float)):
+            flat[f"{prefix}{key}"] = value
+    return flat
+
+
+def compare(baseline: dict, current: dict) -> None:
+    old, new = _flatten(baseline["results"]), _flatten(current["results"])
+    width = max(map(len, new), default=0)
+    print(f"{'metric':<{width}} {'baseline':>12} {'current':>12} {'change':>8}")
+    for key, value in new.items():
+        if key in old and old[key] and not key.endswith(".count"):
+            change = (value - old[key]) / old[key] * 100
+            print(f"{key:<{width}} {old[key]:>12.4g} {value:>12.4g} {change:>+7.1f}%")
+
+
+async def main(args) -> dict:
+    benchmarks = {
+        "pubsub/inline": lambda: bench_pubsub(args.events, False),
+        "pubsub/concurrent": lambda: bench_pubsub(args.events, True),
+        "channel/deque": lambda: bench_channel(args.events, "deque"),
+        "channel/ring": lambda: bench_channel(args.events, "ring"),
+        "pipeline/deepgram": lambda: bench_deepgram(wav, ends, args),
+        "pipeline/api": lambda: bench_api(wav, ends, args),
+        "pipeline/local": lambda: bench_local(wav, ends, args),
+    }
+    results = {}
+    with tempfile.TemporaryDirectory() as tmp:
+        wav = os.path.join(tmp, "speech.wav")
+        ends = fakes.speech_wav(wav, turns=args.turns)
+        for name, bench in benchmarks.items():
+            if args.only and not any(name.startswith(prefix) for prefix in args.only):
+                continue
+            try:
+                results[name] = await bench()
+            except ImportError as e:
+                results[name] = {"skipped": f"missing dependency: {e.name}"}
+            print(f"{name}: {json.dumps(results[name])}", file=sys.stderr)
+    return {
+        "meta": {
+            "time": time.strftime("%Y-%m-%dT%H:%M:%S%z"),
+            "commit": _git_commit(),
+            "python": platform.python_version(),
+            "platform": platform.platform(),
+        },
+        "config": {
+            k: v for k, v in vars(args).items() if k not in ("output", "compare")
+        },
+        "results": results,
+    }
+
+
+if __name__ == "__main__":
+    parser = argparse.ArgumentParser(description=__doc__.splitlines()[0])
+    parser.add_argument(
+        "--only", nargs="+", help="benchmark name prefixes, e.g., pubsub pipeline/api"
+    )
+    parser.add_argument(
+        "--events",
+        type=int,
+        default=20_000,
+        help="events per bus and channel benchmark",
+    )
+    parser.add_argument(
+        "--turns", type=int, default=5, help="spoken turns per pipeline benchmark"
+    )
+    parser.add_argument("--deepgram-latency", type=float, default=0.05)
+    parser.add_argument(
+        "--llm-latency", type=float, default=0.2, help="seconds to the first LLM token"
+    )
+    parser.add_argument(
+        "--tts-latency", type=float, default=0.15, help="seconds to the first TTS byte"
+    )
+    parser.add_argument(
+        "--output", help="where to write the JSON results (default: stdout)"
+    )
+    parser.add_argument(
+        "--compare", help="JSON results of an earlier run to compare with"
+    )
+    args = parser.parse_args()
+    report = asyncio.run(main(args))
+    if args.output:
+        with open(args.output, "w") as f:
+            json.dump(report, f, indent=2)
+    else:
+        print(json.dumps(report, indent=2))
+    if args.compare:
+        with open(args.compare) as f:
+            compare(json.load(f), report)
@@ -0,0 +1,395 @@
+# Copyright (c) Meta Platforms, Inc. and affiliates.
+#
+# This source code is licensed under the MIT license found in the
+# LICENSE file in the root directory of this source tree.
+
+"""Deterministic stand-ins for the audio input, services and models the helpers use.
+
+Everything here is driven by a synthetic WAV file of tone bursts ("speech")
+separated by silence, so results don't depend on a microphone, the network
+or model weights:
+
+- speech_wav() writes the file and returns when each burst ends.
+- wav_microphone() replays it with the interface of pyaudio.microphone().
+- FakeDeepgram is a local websocket server speaking Deepgram's listen
+  protocol, with endpointing on signal energy and a configurable delay.
+- FakeGroq and FakeElevenLabs stand in for the SDK clients, with
+  configurable first-token/first-byte latency and token/audio rates.
+- StubVad, StubWhisper and StubXtts implement just the model methods the
+  helpers call, with configurable compute time; stub_registry() installs
+  them where the helpers look for the real models.
+"""
+
+import array
+import asyncio
+import dataclasses
+import json
+import math
+import time
+import wave
+from collections.abc import AsyncIterator, Iterator
+from types import SimpleNamespace
+from urllib.parse import parse_qs, urlparse
+
+from context import iftk
+
+RATE = 16000
+BYTES_PER_SECOND = 2 * RATE  # int16 mono
+
+
+def _energy(data) -> float:
+    """Mean absolute amplitude of int16 samples, 0 to 1."""
+    samples = array.array("h", bytes(data))
+    return sum(map(abs, samples)) / (len(samples) * 32768) if samples else 0.0
+
+
+def speech_wav(
+    path: str,
+    turns: int = 3,
+    speech: float = 1.0,
+    silence: float = 1.0,
+    rate: int = RATE,
+) -> list[float]:
+    """Write turns bursts of a 220Hz tone, each followed by silence.
+
+    Returns the time each burst ends, in seconds from the start of the file.
+    """
+    tone = array.array(
+        "h",
+        (
+            int(8000 * math.sin(2 * math.pi * 220 * i / rate))
+            for i in range(int(speech * rate))
+        ),
+    )
+    quiet = array.array("h", bytes(2 * int(silence * rate)))
+    ends = []
+    with wave.open(path, "wb") as w:
+        w.setnchannels(1)
+        w.setsampwidth(2)
+        w.setframerate(rate)
+        # Lead with silence, like a user who takes a moment to start talking.
+        w.writeframes(quiet.tobytes())
+        for i in range(turns):
+            w.writeframes(tone.tobytes())
+            ends.append(silence + i * (speech + silence) + speech)
+            w.writeframes(quiet.tobytes())
+    return ends
+
+
+async def wav_microphone(
+    path: str, rate: int = RATE, frames_per_buffer: int = 512, realtime: bool = True
+) -> AsyncIterator[iftk.AudioFrame]:
+    """A drop-in for pyaudio.microphone(rate, frames_per_buffer) that replays path.
+
+    With realtime=True audio arrives at the pace it was recorded, as from a
+    device, and frame timestamps are capture times; otherwise as fast as it
+    is consumed.
+    """
+    source = iftk.WavFileSource(
+        path,
+        frames_per_buffer,
+        realtime=realtime,
+        chunk_duration=frames_per_buffer / rate,
+    )
+    if source.sample_rate != rate:
+        raise ValueError(f"{path} is {source.sample_rate}Hz, not {rate}Hz")
+    async with source:
+        async for frame in source:
+            yield frame
+
+
+class FakeDeepgram:
+    """A local stand-in for the Deepgram listen endpoint.
+
+    Audio is analyzed in windows of 100ms: loud windows are speech, and
+    silence for the endpointing given in the URL (300ms by default) ends an
+    utterance with a speech_final Results message. With interim_results,
+    every window of speech also gets a partial Results message. Every message
+    is sent latency seconds after the audio it describes was received.
+    Transcripts are "word word ...", one word per 300ms of speech.
+    """
+
+    window = 0.1
+
+    def __init__(self, latency: float = 0.05, threshold: float = 0.02) -> None:
+        self.latency = latency
+        self.threshold = threshold
+        self.connections = 0
+        self.server = None
+
+    @property
+    def url(self) -> str:
+        port = self.server.sockets[0].getsockname()[1]
+        return f"ws://localhost:{port}/v1/listen"
+
+    async def __aenter__(self) -> "FakeDeepgram":
+        import websockets
+
+        self.server = await websockets.serve(self.handler, "localhost", 0)
+        return self
+
+    async def __aexit__(self, *exc) -> None:
+        self.server.close()
+        await self.server.wait_closed()
+
+    def _result(
+        self, start: float, end: float, is_final: bool, speech_final: bool
+    ) -> str:
+        words = max(1, round((end - start) / 0.3))
+        return json.dumps(
+            {
+                "type": "Results",
+                "channel": {
+                    "alternatives": [{"transcript": " ".join(["word"] * words)}]
+                },
+                "start": start,
+                "duration": end - start,
+                "is_final": is_final,
+                "speech_final": speech_final,
+            }
+        )
+
+    async def _send(self, ws, outbox: asyncio.Queue) -> None:
+        from websockets.exceptions import ConnectionClosed
+
+        loop = asyncio.get_running_loop()
+        while (item := await outbox.get()) is not None:
+            due, message = item
+            await asyncio.sleep(due - loop.time())
+            try:
+                await ws.send(message)
+            except ConnectionClosed:
+                return  # The client went away.
+
+    async def handler(self, ws) -> None:
+        self.connections += 1
+        query = parse_qs(urlparse(ws.path).query)
+        endpointing = query.get("endpointing", ["300"])[0]
+        endpointing = int(endpointing) / 1000 if endpointing.isdigit() else None
+        interim = query.get("interim_results", ["false"])[0] == "true"
+        window_bytes = int(self.window * BYTES_PER_SECOND)
+
+        loop = asyncio.get_running_loop()
+        outbox: asyncio.Queue = asyncio.Queue()
+        sender = asyncio.create_task(self._send(ws, outbox))
+
+        def emit(message: str) -> None:
+            outbox.put_nowait((loop.time() + self.latency, message))
+
+        pending = bytearray()
+        offset = 0.0  # seconds of audio analyzed
+        speech_start = speech_end = None
+        try:
+            async for message in ws:
+                if isinstance(message, str):
+                    if json.loads(message)["type"] == "CloseStream":
+                        break
+                    continue  # KeepAlive
+                pending += message
+                while len(pending) >= window_bytes:
+                    loud = _energy(pending[:window_bytes]) > self.threshold
+                    del pending[:window_bytes]
+                    offset += self.window
+                    if loud:
+                        if speech_start is None:
+                            speech_start = offset - self.window
+                        speech_end = offset
+                        if interim:
+                            emit(self._result(speech_start, offset, False, False))
+                    elif speech_start is not None and (
+                        endpointing is not None
+                        and offset - speech_end >= endpointing - 1e-9
+                    ):
+                        emit(self._result(speech_start, speech_end, True, True))
+                        speech_start = None
+            if speech_start is not None:
+                emit(self._result(speech_start, speech_end, True, False))
+        finally:
+            outbox.put_nowait(None)
+            await sender
+        await ws.close()
+
+
+def _chunk(content: str) -> SimpleNamespace:
+    return SimpleNamespace(
+        choices=[SimpleNamespace(delta=SimpleNamespace(content=content))]
+    )
+
+
+class FakeGroq:
+    """Stands in for groq.AsyncClient: client.chat.completions.create(..., stream=True).
+
+    Every request streams reply, word by word, after first_token_latency
+    seconds and then at tokens_per_second.
+    """
+
+    def __init__(
+        self,
+        reply: str = "Sure, I can help with that. Here is a short answer. Anything else?",
+        first_token_latency: float = 0.2,
+        tokens_per_second: float = 200.0,
+    ) -> None:
+        self.tokens = [word + " " for word in reply.split()]
+        self.first_token_latency = first_token_latency
+        self.tokens_per_second = tokens_per_second
+        self.requests = 0
+        self.chat = SimpleNamespace(completions=SimpleNamespace(create=self.create))
+
+    async def create(
+        self, messages: list, model: str | None = None, stream: bool = True, **kwargs
+    ):
+        self.requests += 1
+        return self._stream()
+
+    async def _stream(self) -> AsyncIterator[SimpleNamespace]:
+        await asyncio.sleep(self.first_token_latency)
+        for i, token in enumerate(self.tokens):
+            if i:
+                await asyncio.sleep(1 / self.tokens_per_second)
+            yield _chunk(token)
+
+
+class FakeElevenLabs:
+    """Stands in for elevenlabs.client.ElevenLabs: client.generate(text=..., stream=True).
+
+    Returns a blocking iterator of silent int16 audio, seconds_per_char long
+    per character of text, delivered speed times faster than real time after
+    first_byte_latency seconds.
+    """
+
+    def __init__(
+        self,
+        first_byte_latency: float = 0.15,
+        speed: float = 4.0,
+        seconds_per_char: float = 0.06,
+        chunk_bytes: int = 4096,
+    ) -> None:
+        self.first_byte_latency = first_byte_latency
+        self.speed = speed
+        self.seconds_per_char = seconds_per_char
+        self.chunk_bytes = chunk_bytes
+        self.requests = 0
+
+    def generate(
+        self, text: str, stream: bool = True, voice: str | None = None, **kwargs
+    ) -> Iterator[bytes]:
+        self.requests += 1
+        total = int(len(text) * self.seconds_per_char * BYTES_PER_SECOND) & ~1
+        chunk = bytes(self.chunk_bytes)
+        delay = self.chunk_bytes / BYTES_PER_SECOND / self.speed
+
+        def audio() -> Iterator[bytes]:
+            time.sleep(self.first_byte_latency)
+            for start in range(0, total, self.chunk_bytes):
+                yield chunk[: min(self.chunk_bytes, total - start)]
+                time.sleep(delay)
+
+        return audio()
+
+
+class StubVad:
+    """Silero VAD's model interface: model(window, sample_rate).item() is a speech probability.
+
+    The probability is 1 for windows louder than threshold, else 0.
+    """
+
+    def __init__(self, threshold: float = 0.02, compute: float = 0.0) -> None:
+        self.threshold = threshold
+        self.compute = compute
+
+    def __call__(self, x, sample_rate: int) -> SimpleNamespace:
+        if self.compute:
+            time.sleep(self.compute)
+        energy = float(abs(x).mean())
+        if energy > 1:  # int16 scale rather than float
+            energy /= 32768
+        probability = 1.0 if energy > self.threshold else 0.0
+        return SimpleNamespace(item=lambda: probability)
+
+    def reset_states(self, batch_size: int = 1) -> None:
+        pass
+
+
+def _loud(audio, threshold: float = 0.02) -> bool:
+    return len(audio) > 0 and float(abs(audio).mean()) > threshold
+
+
+class StubWhisper:
+    """Whisper's model.transcribe(audio, language=...), taking compute seconds per second of audio."""
+
+    def __init__(self, compute: float = 0.05) -> None:
+        self.compute = compute
+
+    def transcribe(self, audio, language: str = "en", **kwargs) -> dict:
+        seconds = len(audio) / RATE
+        time.sleep(self.compute * seconds)
+        words = max(1, round(seconds / 0.3)) if _loud(audio) else 0
+        return {"text": " ".join(["word"] * words)}
+
+
+class StubXtts:
+    """XTTS's model.inference_stream(text, ...), yielding 24kHz float32 chunks.
+
+    The first chunk takes first_chunk seconds and later ones chunk_compute
+    seconds each; there are seconds_per_char * len(text) seconds of audio.
+    """
+
+    def __init__(
+        self,
+        first_chunk: float = 0.1,
+        chunk_compute: float = 0.02,
+        chunk_seconds: float = 0.25,
+        seconds_per_char: float = 0.06,
+    ) -> None:
+        self.first_chunk = first_chunk
+        self.chunk_compute = chunk_compute
+        self.chunk_seconds = chunk_seconds
+        self.seconds_per_char = seconds_per_char
+        self.device = "cpu"
+        default = {"gpt_cond_latent": None, "speaker_embedding": None}
+        self.speaker_manager = SimpleNamespace(speakers=_Speakers(default))
+
+    def inference_stream(self, text: str, **kwargs) -> Iterator:
+        import numpy as np
+
+        n_chunks = max(
+            1, math.ceil(len(text) * self.seconds_per_char / self.chunk_seconds)
+        )
+        for i in range(n_chunks):
+            time.sleep(self.first_chunk if i == 0 else self.chunk_compute)
+            yield np.zeros(int(24000 * self.chunk_seconds), dtype=np.float32)
+
+
+class _Speakers(dict):
+    def __init__(self, default: dict) -> None:
+        super().__init__()
+        self.default = default
+
+    def __missing__(self, speaker: str) -> dict:
+        return self.default
+
+
+def stub_registry(
+    vad: StubVad | None = None,
+    whisper: StubWhisper | None = None,
+    xtts: StubXtts | None = None,
+) -> iftk.ModelRegistry:
+    """A ModelRegistry holding the stubs under the keys of the real models.
+
+    Pass it as registry= to the Silero VAD, Whisper and XTTS helpers
+    (XttsSynthesizer with gpu=False). Importing the helpers still needs
+    their own dependencies, such as torch.
+    """
+    from iftk.helpers import silero_vad
+    from iftk.helpers import whisper as whisper_helper
+    from iftk.helpers import xtts as xtts_helper
+
+    registry = iftk.ModelRegistry()
+    stubs = [
+        (silero_vad.silero_vad_model_spec(), vad or StubVad()),
+        (whisper_helper.whisper_model_spec(), whisper or StubWhisper()),
+        (xtts_helper.xtts_model_spec(gpu=False), xtts or StubXtts()),
+    ]
+    for spec, stub in stubs:
+        registry.get(dataclasses.replace(spec, loader=lambda stub=stub: stub))
+    return registry
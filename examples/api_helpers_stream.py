@@ -27,21 +27,77 @@ async def main():
     groq_client = groq.groq.AsyncClient(api_key=GROQ_API_KEY)
     elevenlabs_client = ElevenLabs(api_key=ELEVENLABS_API_KEY)
     mic_stream: AsyncIterator = pyaudio.microphone(rate=RATE, frames_per_buffer=CHUNK)
-    deepgram_stream: AsyncIterator = deepgram.deepgram_stream(
-        key=DEEPGRAM_API_KEY, audio_stream=mic_stream
-    )
-    async for user_message in deepgram_stream:
-        messages.append({"role": "user", "content": user_message})
+    pubsub = iftk.PubSub()
+    # Stop talking when the user starts speaking (use headphones).
+    barge_in = iftk.BargeIn(pubsub)
+    transcripts: asyncio.Queue = asyncio.Queue()
+
+    async def listen():
+        # Keep listening while the assistant speaks, so it can be interrupted.
+        try:
+            async for event in deepgram.deepgram_events(
+                key=DEEPGRAM_API_KEY,
+                audio_stream=mic_stream,
+                interim_results=True,
+                vad_events=True,
+            ):
+                if isinstance(event, iftk.SpeechStartEvent):
+                    await pubsub.publish(event)
+                else:
+                    transcripts.put_nowait(event)
+        finally:
+            transcripts.put_nowait(None)
+
+    async def transcript_stream() -> AsyncIterator[iftk.TranscriptEvent]:
+        while (event := await transcripts.get()) is not None:
+            yield event
+
+    async def respond(user_message: str) -> AsyncIterator[str]:
         llm_stream = await groq_client.chat.completions.create(
-            messages=messages, model=model_id, stream=True
-        )
-        groq_sentence_stream: AsyncIterator = groq.groq_sentence_stream(
-            llm_stream=llm_stream
+            messages=[*messages, {"role": "user", "content": user_message}],
+            model=model_id,
+            stream=True,
         )
-        async for sentence in elevenlabs.eleven_stream(
-            sentences=groq_sentence_stream, eleven_client=elevenlabs_client
-        ):
-            await asyncio.to_thread(stream, sentence)
+        async for sentence in groq.groq_sentence_stream(llm_stream=llm_stream):
+            yield sentence
+
+    listener = asyncio.create_task(listen())
+    # Start the LLM on stable interim transcripts, before endpointing confirms
+    # the end of the utterance; it is restarted if the final text differs.
+    async for user_message, sentences in iftk.speculative_responses(
+        transcript_stream(), respond
+    ):
+        messages.append({"role": "user", "content": user_message})
+        loop = asyncio.get_running_loop()
+        async with barge_in.turn() as turn:
+            texts = []
+
+            async def non_empty(sentences):
+                async for sentence in sentences:
+                    if sentence:
+                        texts.append(sentence)
+                        yield sentence
+
+            # Close the LLM stream after the TTS requests reading from it.
+            sentences = turn.closing(sentences)
+            # Request audio for upcoming sentences while the current one plays.
+            audios = turn.closing(
+                elevenlabs.eleven_prefetch_stream(
+                    sentences=non_empty(sentences), eleven_client=elevenlabs_client
+                )
+            )
+            played = 0
+            async for audio in audios:
+                # On barge-in the audio feed ends, so the player stops after
+                # what it has buffered.
+                await turn.say(
+                    texts[played],
+                    asyncio.to_thread(stream, iftk.sync_iter(audio, loop)),
+                )
+                played += 1
+        # Only what was played, so the history matches the conversation.
+        messages.append(turn.message())
+    await listener
 
 
 if __name__ == "__main__":
@@ -21,30 +21,80 @@ messages = [{"role": "system", "content": "Respond in a few sentences."}]
 
 
 async def main():
+    # Load every model once up front instead of on first use in the loop.
+    await to_thread(
+        iftk.default_registry().warm_up,
+        [
+            silero_vad.silero_vad_model_spec(),
+            whisper.whisper_model_spec(),
+            transformers.transformer_model_spec(MODEL_ID),
+            xtts.xtts_model_spec(),
+        ],
+    )
+    # Each model runs on its own thread instead of sharing the default pool.
+    synthesizer = xtts.XttsSynthesizer(executor="xtts")
     microphone_stream: AsyncIterator = pyaudio.microphone(
         rate=RATE, frames_per_buffer=CHUNK
     )
+    # VAD, Whisper and barge-in detection share the microphone. Only barge-in
+    # detection, which runs throughout, may hold the microphone back. The
+    # turn-taking loop reads Whisper and the VAD at its own pace and pauses
+    # while the assistant speaks, so they skip the audio they are too late
+    # for. The VAD, read once per transcript, judges only the latest chunk.
+    microphone = iftk.Broadcast(microphone_stream)
+    vad_feed = microphone.subscribe(max_lag=1, policy=iftk.OverflowPolicy.DROP_OLDEST)
+    whisper_feed = microphone.subscribe(policy=iftk.OverflowPolicy.DROP_OLDEST)
+    barge_in_feed = microphone.subscribe()
     vad_stream: AsyncIterator = silero_vad.silero_vad_stream(
-        microphone_stream, sample_rate=RATE
+        vad_feed, sample_rate=RATE, executor="vad"
+    )
+    whisper_stream: AsyncIterator = whisper.whisper_stream(
+        whisper_feed, executor="whisper"
     )
-    whisper_stream: AsyncIterator = whisper.whisper_stream(microphone_stream)
+    pubsub = iftk.PubSub()
+    # Stop talking when the user starts speaking (use headphones).
+    barge_in = iftk.BargeIn(pubsub)
+
+    async def listen():
+        # Runs while the assistant speaks, unlike the turn-taking loop below.
+        async for event in silero_vad.silero_vad_events(
+            barge_in_feed,
+            sample_rate=RATE,
+            executor="barge_in",
+        ):
+            await pubsub.publish(event)
+
+    listener = asyncio.create_task(listen())
     turn_transcription_parts = []
     async for output in whisper_stream:
         turn_transcription_parts.append(output)
-        if not anext(
+        if not await anext(
             vad_stream
         ):  # Detected silence in microphone chunk (around 2 seconds of silence) - ends user turn
             turn_transcription = " ".join(turn_transcription_parts)
             messages.append({"role": "user", "content": turn_transcription})
-            transformer_stream: AsyncIterator = transformers.transformer_stream(
-                model_id=MODEL_ID, messages=messages
-            )
-            assistant_turn_parts = []
-            async for token in transformer_stream:
-                if "." in token:  # Ended sentence, do XTTS chunk generation
-                    xtts_stream: AsyncIterator = xtts.xtts_stream(
-                        " ".join(assistant_turn_parts)
+            async with barge_in.turn() as turn:
+                # Closed in reverse order: synthesis first, then generation.
+                transformer_stream: AsyncIterator = turn.closing(
+                    transformers.transformer_stream(
+                        model_id=MODEL_ID, messages=messages, executor="llm"
                     )
+                )
+                assistant_turn_parts = []
+
+                async def sentences():
+                    # Emit the first few words early to start speaking sooner.
+                    async for sentence in iftk.segment_stream(
+                        transformer_stream, iftk.SegmentPolicy.FIRST_CHUNK
+                    ):
+                        if sentence:
+                            assistant_turn_parts.append(sentence)
+                            yield sentence
+
+                # Synthesize the next sentence while the current one plays.
+                xtts_streams = turn.closing(synthesizer.prefetch_stream(sentences()))
+                played = 0
+                async for xtts_stream in xtts_streams:
                     wav_chunks = []
                     async for chunk in xtts_stream:
                         wav_chunks.append(chunk)
@@ -53,13 +103,18 @@ async def main():
                     wav /= np.max(
                         np.abs(wav), axis=0
                     )  # Scale Tensor to -1 to 1 to be played by sounddevice
-                    await to_thread(sd.play, data=wav, blocking=True)
-                assistant_turn_parts.append(token)
-            messages.append(
-                {"role": "assistant", "content": " ".join(assistant_turn_parts)}
-            )
-            assistant_turn_parts = []
+                    await turn.say(
+                        assistant_turn_parts[played],
+                        to_thread(sd.play, data=wav, blocking=True),
+                        stop=sd.stop,
+                    )
+                    played += 1
+            # Only what was played, so the history matches the conversation.
+            messages.append(turn.message())
             turn_transcription_parts = []
+    listener.cancel()
 
 
 asyncio.run(main())
+# Stop the threads of the "vad", "whisper" and other named executors.
+iftk.shutdown_executors()
@@ -0,0 +1,130 @@
+# Copyright (c) Meta Platforms, Inc. and affiliates.
+#
+# This source code is licensed under the MIT license found in the
+# LICENSE file in the root directory of this source tree.
+
+import asyncio
+from dataclasses import dataclass
+
+from context import iftk
+from dotenv import dotenv_values
+from elevenlabs.client import ElevenLabs
+from elevenlabs.play import stream
+
+from iftk.helpers import deepgram, elevenlabs, groq, pyaudio
+
+DOTENV = dotenv_values(".env")
+GROQ_API_KEY = DOTENV["GROQ_API_KEY"]
+DEEPGRAM_API_KEY = DOTENV["DEEPGRAM_API_KEY"]
+ELEVENLABS_API_KEY = DOTENV["ELEVEN_API_KEY"]
+CHUNK = 512
+RATE = 16000
+model_id = "llama-3.1-8b-instant"
+
+
+@dataclass
+class Sentence:
+    text: str
+
+
+@dataclass
+class SpeechAudio:
+    text: str
+    data: bytes
+
+
+class Microphone(iftk.Stage):
+    publishes = iftk.AudioFrame
+
+    async def run(self) -> None:
+        async for frame in pyaudio.microphone(rate=RATE, frames_per_buffer=CHUNK):
+            await self.publish(frame)
+
+
+class Llm(iftk.Stage):
+    subscribes_to = iftk.TranscriptEvent
+    publishes = Sentence
+
+    def __init__(self) -> None:
+        super().__init__()
+        self.client = groq.groq.AsyncClient(api_key=GROQ_API_KEY)
+        self.messages = [
+            {"role": "system", "content": "Answer to the user in a few sentences."}
+        ]
+        self.finals = []
+
+    async def on_event(self, event: iftk.TranscriptEvent) -> None:
+        if event.text:
+            self.finals.append(event.text)
+        if not event.speech_final or not self.finals:
+            return
+        self.messages.append({"role": "user", "content": " ".join(self.finals)})
+        self.finals = []
+        llm_stream = await self.client.chat.completions.create(
+            messages=self.messages, model=model_id, stream=True
+        )
+        reply = []
+        async for sentence in groq.groq_sentence_stream(llm_stream=llm_stream):
+            if sentence:
+                reply.append(sentence)
+                await self.publish(Sentence(sentence))
+        self.messages.append({"role": "assistant", "content": " ".join(reply)})
+
+
+class Tts(iftk.Stage):
+    subscribes_to = Sentence
+    publishes = SpeechAudio
+
+    def __init__(self) -> None:
+        super().__init__()
+        self.client = ElevenLabs(api_key=ELEVENLABS_API_KEY)
+
+    async def on_event(self, event: Sentence) -> None:
+        chunks = [
+            chunk async for chunk in elevenlabs.eleven_audio(event.text, self.client)
+        ]
+        await self.publish(SpeechAudio(event.text, b"".join(chunks)))
+
+
+class Speaker(iftk.Stage):
+    subscribes_to = SpeechAudio
+
+    async def on_event(self, event: SpeechAudio) -> None:
+        await asyncio.to_thread(stream, iter([event.data]))
+
+
+async def report(pipeline: iftk.Pipeline, interval: float = 10.0) -> None:
+    while True:
+        await asyncio.sleep(interval)
+        for name, stats in pipeline.stats().items():
+            print(f"{name:>10}: {stats.utilization:6.1%} busy, {stats.depth} queued")
+        print(f"bottleneck: {pipeline.bottleneck()}")
+
+
+async def main():
+    # Every stage works at once: the LLM writes the next sentence while TTS
+    # synthesizes this one and the previous one plays.
+    pipeline = iftk.Pipeline(
+        [
+            Microphone(),
+            iftk.StreamStage(
+                lambda frames: deepgram.deepgram_events(
+                    DEEPGRAM_API_KEY, frames, interim_results=False
+                ),
+                subscribes_to=iftk.AudioFrame,
+                publishes=iftk.TranscriptEvent,
+                name="Deepgram",
+            ),
+            Llm(),
+            Tts(),
+            Speaker(),
+        ]
+    )
+    async with pipeline:
+        reporter = asyncio.create_task(report(pipeline))
+        await pipeline.join()
+        reporter.cancel()
+
+
+if __name__ == "__main__":
+    asyncio.run(main())
@@ -3,6 +3,56 @@
 # This source code is licensed under the MIT license found in the
 # LICENSE file in the root directory of this source tree.
 
-from .channel import AsyncChannel, Channel, ChannelClosedEvent, DequeChannel
-from .pubsub import BaseSubscriber, PubSub, PubSubChannel, Subscriber
+from ._iter_utils import Broadcast, BroadcastConsumer, prefetch_stream, sync_iter, tee
+from .audio import AudioFrame
+from .batching import BatchStats, MicroBatcher
+from .capture import AudioRingBuffer, AudioSource, CaptureStats, WavFileSource
+from .channel import (
+    AsyncChannel,
+    Channel,
+    ChannelClosedEvent,
+    DequeChannel,
+    RingChannel,
+)
+from .events import (
+    InterruptionEvent,
+    SpeechEndEvent,
+    SpeechEvent,
+    SpeechStartEvent,
+    TranscriptEvent,
+)
+from .executors import get_executor, run_in_executor, shutdown_executors
+from .interrupt import AssistantTurn, BargeIn
+from .pipeline import Pipeline, PipelineError, Stage, StageStats, StreamStage
+from .process import ProcessChannel, ProcessStage, ProcessSystem, SharedRing
+from .pubsub import (
+    BaseSubscriber,
+    InboxStats,
+    OverflowPolicy,
+    PubSub,
+    PubSubChannel,
+    Subscriber,
+)
+from .recording import EventLog, EventRecorder, LogRecord, ReplayStats, pcm_path, replay
+from .registry import ModelRegistry, ModelSpec, default_registry
+from .segmenter import Segmenter, SegmentPolicy, segment_stream
+from .sessions import (
+    FairExecutor,
+    Session,
+    SessionLimitError,
+    SessionManager,
+    SessionStats,
+    current_session,
+)
+from .speculative import SpeculationStats, Speculator, speculative_responses
 from .system import System
+from .tracing import (
+    Histogram,
+    Tracer,
+    current_turn,
+    disable_tracing,
+    enable_tracing,
+    get_tracer,
+    start_turn,
+    traced_stream,
+)
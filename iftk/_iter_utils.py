@@ -4,25 +4,97 @@
 # LICENSE file in the root directory of this source tree.
 
 import asyncio
+import threading
+from collections import deque
 from collections.abc import AsyncIterator, Iterator
-from typing import TypeVar
+from concurrent.futures import Executor
+from typing import Callable, Generic, TypeVar
+
+from .executors import run_in_executor
+from .pubsub import OverflowPolicy
 
 T = TypeVar("T")
+R = TypeVar("R")
 
 
 _sentinel = object()
 
 
-async def iter_on_thread(iterator: Iterator[T]) -> AsyncIterator[T]:
-    """Request the next iterator value within asyncio.to_thread."""
+async def iter_on_thread(
+    iterator: Iterator[T],
+    executor: Executor | str | None = None,
+    batched: bool = False,
+    max_buffered: int = 64,
+) -> AsyncIterator[T]:
+    """Iterate a blocking Iterator on a worker thread.
+
+    By default each item is requested with its own executor call. With
+    batched=True, a single executor call iterates on one thread and forwards
+    items to the loop with call_soon_threadsafe as soon as they are ready,
+    staying at most max_buffered items ahead of the consumer. This suits
+    fast producers, such as streaming TTS, that would otherwise pay a full
+    executor round trip per item. If the consumer stops early, the worker
+    stops after the item it is computing.
+
+    Args:
+        iterator (Iterator[T]): The blocking iterator.
+        executor (Executor | str, optional): Where to run it; a name is looked up with get_executor().
+                                             Defaults to the loop's default executor.
+        batched (bool, optional): Iterate in a single executor call. Defaults to False.
+        max_buffered (int, optional): Most items read ahead in batched mode. Defaults to 64.
+    """
+    if batched:
+        async for v in _iter_batched(iterator, executor, max_buffered):
+            yield v
+        return
     read = lambda: next(iterator, _sentinel)
     while True:
-        v = await asyncio.to_thread(read)
+        v = await run_in_executor(executor, read)
         if v is _sentinel:
             break
         yield v
 
 
+async def _iter_batched(
+    iterator: Iterator[T], executor: Executor | str | None, max_buffered: int
+) -> AsyncIterator[T]:
+    loop = asyncio.get_running_loop()
+    queue: asyncio.Queue = asyncio.Queue()
+    slots = threading.Semaphore(max_buffered)
+    stop = threading.Event()
+
+    def produce() -> None:
+        try:
+            while True:
+                slots.acquire()
+                if stop.is_set():
+                    break
+                v = next(iterator, _sentinel)
+                if v is _sentinel:
+                    break
+                loop.call_soon_threadsafe(queue.put_nowait, v)
+        finally:
+            try:
+                loop.call_soon_threadsafe(queue.put_nowait, _sentinel)
+            except RuntimeError:
+                pass  # The loop is closed; nobody is reading.
+
+    producer = asyncio.ensure_future(run_in_executor(executor, produce))
+    # Don't warn about an error the consumer stopped too early to see.
+    producer.add_done_callback(lambda f: f.cancelled() or f.exception())
+    try:
+        while True:
+            v = await queue.get()
+            if v is _sentinel:
+                break
+            slots.release()
+            yield v
+        await producer  # Raise the iterator's exception, if any.
+    finally:
+        stop.set()
+        slots.release()
+
+
 async def queue_to_iter(queue: asyncio.Queue[T]) -> AsyncIterator[T]:
     while True:
         yield await queue.get()
@@ -31,3 +103,282 @@ async def queue_to_iter(queue: asyncio.Queue[T]) -> AsyncIterator[T]:
 async def iter_to_queue(iterator: AsyncIterator[T], queue: asyncio.Queue[T]) -> None:
     async for x in iterator:
         await queue.put(x)
+
+
+def sync_iter(
+    iterator: AsyncIterator[T], loop: asyncio.AbstractEventLoop
+) -> Iterator[T]:
+    """Iterate an AsyncIterator from another thread by driving it on loop.
+
+    Useful to hand async output to blocking consumers run via asyncio.to_thread,
+    such as audio players that accept an Iterator.
+    """
+    while True:
+        try:
+            yield asyncio.run_coroutine_threadsafe(anext(iterator), loop).result()
+        except StopAsyncIteration:
+            return
+
+
+async def _read_until_sentinel(
+    queue: asyncio.Queue, task: asyncio.Task
+) -> AsyncIterator[T]:
+    while True:
+        x = await queue.get()
+        if x is _sentinel:
+            break
+        yield x
+    if not task.cancelled() and task.exception() is not None:
+        raise task.exception()
+
+
+async def prefetch_stream(
+    items: AsyncIterator[T],
+    fn: Callable[[T], AsyncIterator[R]],
+    depth: int = 2,
+) -> AsyncIterator[AsyncIterator[R]]:
+    """Run fn on upcoming items ahead of the consumer, yielding outputs in order.
+
+    For each item, yield an AsyncIterator over fn(item). While the consumer
+    works through the output of one item (e.g., plays a sentence's audio), fn
+    already runs on up to `depth` following items, buffering what they
+    produce. Outputs are always yielded in item order. Moving on to the next
+    item cancels what is left of the previous one, and closing or cancelling
+    the returned iterator (e.g., on barge-in) cancels all outstanding work.
+    aclose() returns once that work has stopped and items is no longer being
+    read, so items may be closed right after.
+    """
+    slots = asyncio.Semaphore(depth + 1)
+    pending: asyncio.Queue = asyncio.Queue()
+    tasks: set[asyncio.Task] = set()
+
+    async def drain(item: T, out: asyncio.Queue) -> None:
+        try:
+            async for x in fn(item):
+                out.put_nowait(x)
+        finally:
+            out.put_nowait(_sentinel)
+
+    async def produce() -> None:
+        try:
+            async for item in items:
+                await slots.acquire()
+                out = asyncio.Queue()
+                task = asyncio.create_task(drain(item, out))
+                tasks.add(task)
+                pending.put_nowait((out, task))
+        except Exception as e:
+            pending.put_nowait(e)
+        else:
+            pending.put_nowait(_sentinel)
+
+    producer = asyncio.create_task(produce())
+    try:
+        while True:
+            entry = await pending.get()
+            if entry is _sentinel:
+                break
+            if isinstance(entry, Exception):
+                raise entry
+            out, task = entry
+            try:
+                yield _read_until_sentinel(out, task)
+            finally:
+                if task.done() and not task.cancelled():
+                    task.exception()  # already raised to the reader, if any
+                task.cancel()
+                tasks.discard(task)
+                slots.release()
+    finally:
+        producer.cancel()
+        for task in tasks:
+            task.cancel()
+        await asyncio.gather(producer, *tasks, return_exceptions=True)
+
+
+class BroadcastConsumer(Generic[T]):
+    """One consumer's cursor into a Broadcast, iterated like any AsyncIterator.
+
+    dropped counts the items this consumer skipped for falling more than
+    max_lag items behind, under OverflowPolicy.DROP_OLDEST.
+    """
+
+    def __init__(
+        self,
+        broadcast: "Broadcast[T]",
+        position: int,
+        max_lag: int,
+        policy: OverflowPolicy,
+    ) -> None:
+        self.broadcast = broadcast
+        self.position = position  # index of the next item to read
+        self.max_lag = max_lag
+        self.policy = policy
+        self.dropped = 0
+
+    @property
+    def lag(self) -> int:
+        """Items read from the source that this consumer hasn't read yet."""
+        return self.broadcast._end - self.position
+
+    def __aiter__(self) -> "BroadcastConsumer[T]":
+        return self
+
+    async def __anext__(self) -> T:
+        return await self.broadcast._next(self)
+
+    async def aclose(self) -> None:
+        """Stop consuming, so slower or faster consumers no longer wait for this one."""
+        self.broadcast._detach(self)
+
+
+class Broadcast(Generic[T]):
+    """Let several consumers iterate one AsyncIterator, each seeing every item.
+
+    Items are read from the source once, when the consumer furthest ahead
+    asks for the next one, and kept in a shared buffer until every consumer
+    has read them; items are shared by reference, never copied. Each
+    consumer may fall at most max_lag items behind the one furthest ahead.
+    At that point, OverflowPolicy.BLOCK holds back the others until it
+    catches up, and OverflowPolicy.DROP_OLDEST lets it skip the items it is
+    too late for, counting them in BroadcastConsumer.dropped.
+
+    A consumer that stops iterating must aclose() so it isn't waited for.
+    """
+
+    def __init__(
+        self,
+        source: AsyncIterator[T],
+        max_lag: int = 64,
+        policy: OverflowPolicy = OverflowPolicy.BLOCK,
+    ) -> None:
+        """
+        Args:
+            source (AsyncIterator[T]): The iterator to share, e.g., a microphone stream.
+            max_lag (int, optional): Default lag limit of consumers, in items. Defaults to 64.
+            policy (OverflowPolicy, optional): Default policy for consumers that reach the limit,
+                                               BLOCK or DROP_OLDEST. Defaults to BLOCK.
+        """
+        self.source = source
+        self.max_lag = max_lag
+        self.policy = policy
+        self.consumers: list[BroadcastConsumer[T]] = []
+        self._buffer: deque[T] = deque()
+        self._base = 0  # index of _buffer[0]
+        self._end = 0  # index of the next item from the source
+        self._pull: asyncio.Future | None = None
+        self._done = False
+        self._error: BaseException | None = None
+        self._changed = asyncio.Event()
+        self._waiters = 0
+
+    def subscribe(
+        self, max_lag: int | None = None, policy: OverflowPolicy | None = None
+    ) -> BroadcastConsumer[T]:
+        """Add a consumer, which starts at the next item read from the source."""
+        policy = OverflowPolicy(policy or self.policy)
+        if policy not in (OverflowPolicy.BLOCK, OverflowPolicy.DROP_OLDEST):
+            raise ValueError(f"unsupported policy for a broadcast consumer: {policy}")
+        max_lag = self.max_lag if max_lag is None else max_lag
+        if max_lag < 1:
+            raise ValueError(f"max_lag must be positive, got {max_lag}")
+        consumer = BroadcastConsumer(self, self._end, max_lag, policy)
+        self.consumers.append(consumer)
+        return consumer
+
+    def _notify(self) -> None:
+        if self._waiters:
+            self._changed.set()
+            self._changed = asyncio.Event()
+
+    async def _wait(self) -> None:
+        changed = self._changed
+        self._waiters += 1
+        try:
+            await changed.wait()
+        finally:
+            self._waiters -= 1
+
+    def _trim(self) -> None:
+        """Drop buffered items every consumer has read."""
+        oldest = min((c.position for c in self.consumers), default=self._end)
+        while self._base < oldest:
+            self._buffer.popleft()
+            self._base += 1
+
+    def _detach(self, consumer: BroadcastConsumer[T]) -> None:
+        if consumer in self.consumers:
+            self.consumers.remove(consumer)
+            self._trim()
+            self._notify()
+
+    def _blocked(self) -> bool:
+        """Whether reading another item would leave a BLOCK consumer too far behind."""
+        return any(
+            c.policy is OverflowPolicy.BLOCK and self._end - c.position >= c.max_lag
+            for c in self.consumers
+        )
+
+    def _on_pulled(self, pull: asyncio.Future) -> None:
+        self._pull = None
+        if pull.cancelled():
+            self._done = True
+        elif pull.exception() is not None:
+            self._done = True
+            if not isinstance(pull.exception(), StopAsyncIteration):
+                self._error = pull.exception()
+        else:
+            self._buffer.append(pull.result())
+            self._end += 1
+            for c in self.consumers:
+                if self._end - c.position > c.max_lag:
+                    # Only DROP_OLDEST consumers can fall this far behind.
+                    skipped = self._end - c.max_lag - c.position
+                    c.position += skipped
+                    c.dropped += skipped
+            self._trim()
+        self._notify()
+
+    async def _next(self, consumer: BroadcastConsumer[T]) -> T:
+        while True:
+            if consumer not in self.consumers:
+                raise StopAsyncIteration
+            if consumer.position < self._end:
+                item = self._buffer[consumer.position - self._base]
+                consumer.position += 1
+                if consumer.position - 1 == self._base:
+                    self._trim()
+                    self._notify()
+                return item
+            if self._done:
+                if self._error is not None:
+                    raise self._error
+                raise StopAsyncIteration
+            if self._pull is None and not self._blocked():
+                # Pull in a task, so cancelling this consumer doesn't
+                # interrupt the source for the others.
+                self._pull = asyncio.ensure_future(anext(self.source))
+                self._pull.add_done_callback(self._on_pulled)
+            await self._wait()
+
+    async def aclose(self) -> None:
+        """Detach all consumers and stop reading the source."""
+        self.consumers.clear()
+        self._done = True
+        if self._pull is not None:
+            self._pull.cancel()
+        self._notify()
+
+
+def tee(
+    source: AsyncIterator[T],
+    n: int = 2,
+    max_lag: int = 64,
+    policy: OverflowPolicy = OverflowPolicy.BLOCK,
+) -> tuple[BroadcastConsumer[T], ...]:
+    """Split source into n AsyncIterators that each yield every item, like itertools.tee.
+
+    See Broadcast for how lagging consumers are handled.
+    """
+    broadcast = Broadcast(source, max_lag, policy)
+    return tuple(broadcast.subscribe() for _ in range(n))
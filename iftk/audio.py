@@ -0,0 +1,120 @@
+# Copyright (c) Meta Platforms, Inc. and affiliates.
+#
+# This source code is licensed under the MIT license found in the
+# LICENSE file in the root directory of this source tree.
+
+import time
+from typing import Any
+
+
+class AudioFrame:
+    """A chunk of interleaved PCM audio along with its format and capture time.
+
+    The samples are kept in whatever buffer they arrived in (bytes, bytearray,
+    memoryview, ...). numpy() and torch() are views over that same memory, and
+    float32() computes the normalized [-1, 1] samples on first use and caches
+    them, so a chunk passed to several helpers is converted only once.
+
+    Views and the cached float32 samples are shared by every consumer of the
+    frame and must be treated as read-only.
+
+    numpy is imported on first use and torch only by torch(), so creating and
+    passing frames around does not require either.
+    """
+
+    __slots__ = ("data", "sample_rate", "channels", "dtype", "timestamp", "_float32")
+
+    def __init__(
+        self,
+        data: Any,
+        sample_rate: int,
+        channels: int = 1,
+        dtype: str = "int16",
+        timestamp: float | None = None,
+    ) -> None:
+        """
+        Args:
+            data: A buffer of interleaved samples.
+            sample_rate (int): Samples per second, per channel.
+            channels (int, optional): Number of interleaved channels. Defaults to 1.
+            dtype (str, optional): numpy dtype name of the samples. Defaults to "int16".
+            timestamp (float, optional): time.monotonic() at which the first sample was
+                                         captured. Defaults to now.
+        """
+        self.data = data
+        self.sample_rate = sample_rate
+        self.channels = channels
+        self.dtype = dtype
+        self.timestamp = time.monotonic() if timestamp is None else timestamp
+        self._float32 = None
+
+    @classmethod
+    def from_chunk(cls, chunk: "bytes | AudioFrame", sample_rate: int) -> "AudioFrame":
+        """Return chunk if it is already a frame, else wrap raw int16 mono bytes."""
+        if isinstance(chunk, AudioFrame):
+            return chunk
+        return cls(chunk, sample_rate)
+
+    def __len__(self) -> int:
+        """Size of the sample data in bytes."""
+        return memoryview(self.data).nbytes
+
+    def __bytes__(self) -> bytes:
+        return bytes(self.data)
+
+    def __repr__(self) -> str:
+        return (
+            f"AudioFrame(sample_rate={self.sample_rate}, channels={self.channels}, "
+            f"dtype={self.dtype!r}, num_frames={self.num_frames}, "
+            f"timestamp={self.timestamp:.3f})"
+        )
+
+    @property
+    def itemsize(self) -> int:
+        import numpy as np
+
+        return np.dtype(self.dtype).itemsize
+
+    @property
+    def num_frames(self) -> int:
+        """Number of samples per channel."""
+        return len(self) // (self.itemsize * self.channels)
+
+    @property
+    def duration(self) -> float:
+        """Length of the frame in seconds."""
+        return self.num_frames / self.sample_rate
+
+    @property
+    def end_timestamp(self) -> float:
+        return self.timestamp + self.duration
+
+    def numpy(self):
+        """A numpy view of the raw samples, shaped (num_frames, channels) if multi-channel."""
+        import numpy as np
+
+        samples = np.frombuffer(self.data, dtype=self.dtype)
+        if self.channels > 1:
+            samples = samples.reshape(-1, self.channels)
+        return samples
+
+    def float32(self):
+        """The samples as float32 in [-1, 1], computed once and cached."""
+        if self._float32 is None:
+            import numpy as np
+
+            samples = self.numpy()
+            if samples.dtype == np.float32:
+                self._float32 = samples
+            elif np.issubdtype(samples.dtype, np.integer):
+                scale = float(-np.iinfo(samples.dtype).min)
+                self._float32 = samples.astype(np.float32) / scale
+            else:
+                self._float32 = samples.astype(np.float32)
+        return self._float32
+
+    def torch(self, normalized: bool = True):
+        """A torch tensor sharing memory with float32() (or the raw samples)."""
+        import torch
+
+        return torch.from_numpy(self.float32() if normalized else self.numpy())
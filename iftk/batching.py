@@ -0,0 +1,141 @@
+# Copyright (c) Meta Platforms, Inc. and affiliates.
+#
+# This source code is licensed under the MIT license found in the
+# LICENSE file in the root directory of this source tree.
+
+import asyncio
+import time
+from collections import Counter, deque
+from concurrent.futures import Executor
+from dataclasses import dataclass, field
+from typing import Callable, Generic, TypeVar
+
+from .executors import run_in_executor
+
+T = TypeVar("T")
+R = TypeVar("R")
+
+
+@dataclass
+class BatchStats:
+    """Per-batch size and latency of a MicroBatcher.
+
+    batch_sizes counts batches by size. latencies holds the run time of the
+    most recent batches in seconds.
+    """
+
+    batches: int = 0
+    items: int = 0
+    batch_sizes: Counter = field(default_factory=Counter)
+    latencies: deque = field(default_factory=lambda: deque(maxlen=1024))
+
+    @property
+    def mean_batch_size(self) -> float:
+        return self.items / self.batches if self.batches else 0.0
+
+    def latency_percentile(self, p: float) -> float:
+        """The p-th percentile (0-100) of recent batch latencies, in seconds."""
+        if not self.latencies:
+            return 0.0
+        latencies = sorted(self.latencies)
+        return latencies[min(len(latencies) - 1, int(p / 100 * len(latencies)))]
+
+
+class MicroBatcher(Generic[T, R]):
+    """Gather concurrent requests into batches for a batched function.
+
+    Callers await submit() with a single item. A background task waits for
+    the first item, gathers more for up to max_wait seconds or until
+    max_batch_size items are queued, then runs fn on the batch on a worker
+    thread (of executor, if given) and routes each result (or the exception)
+    back to its caller.
+
+    fn takes a list of items and returns a list of results in the same order.
+    """
+
+    def __init__(
+        self,
+        fn: Callable[[list[T]], list[R]],
+        max_batch_size: int = 8,
+        max_wait: float = 0.01,
+        executor: Executor | str | None = None,
+    ) -> None:
+        self.fn = fn
+        self.max_batch_size = max_batch_size
+        self.max_wait = max_wait
+        self.executor = executor
+        self.stats = BatchStats()
+        self._queue: asyncio.Queue[tuple[T, asyncio.Future]] = asyncio.Queue()
+        self._submitted = asyncio.Event()  # set whenever an item is queued
+        self._task: asyncio.Task | None = None
+
+    async def submit(self, item: T) -> R:
+        """Queue item for the next batch and return its result."""
+        if self._task is None:
+            self._task = asyncio.create_task(self._run())
+        future = asyncio.get_running_loop().create_future()
+        self._queue.put_nowait((item, future))
+        self._submitted.set()
+        return await future
+
+    async def _gather(self) -> list[tuple[T, asyncio.Future]]:
+        loop = asyncio.get_running_loop()
+        batch = [await self._queue.get()]
+        deadline = loop.time() + self.max_wait
+        while True:
+            while len(batch) < self.max_batch_size and not self._queue.empty():
+                batch.append(self._queue.get_nowait())
+            timeout = deadline - loop.time()
+            if len(batch) == self.max_batch_size or timeout <= 0:
+                break
+            # Wait for a submission rather than for an item, so that timing
+            # out can't drop one taken off the queue just then.
+            self._submitted.clear()
+            try:
+                await asyncio.wait_for(self._submitted.wait(), timeout)
+            except asyncio.TimeoutError:
+                break
+        # Drop requests whose callers have gone away.
+        return [(item, future) for item, future in batch if not future.done()]
+
+    async def _run(self) -> None:
+        while True:
+            batch = await self._gather()
+            if not batch:
+                continue
+            start = time.perf_counter()
+            try:
+                results = await run_in_executor(
+                    self.executor, self.fn, [item for item, _ in batch]
+                )
+            except Exception as e:
+                for _, future in batch:
+                    if not future.done():
+                        future.set_exception(e)
+                continue
+            finally:
+                self.stats.batches += 1
+                self.stats.items += len(batch)
+                self.stats.batch_sizes[len(batch)] += 1
+                self.stats.latencies.append(time.perf_counter() - start)
+            results = list(results)
+            if len(results) != len(batch):
+                error = ValueError(
+                    f"fn returned {len(results)} results for {len(batch)} items"
+                )
+                for _, future in batch:
+                    if not future.done():
+                        future.set_exception(error)
+                continue
+            for (_, future), result in zip(batch, results):
+                if not future.done():
+                    future.set_result(result)
+
+    async def close(self) -> None:
+        if self._task is not None:
+            self._task.cancel()
+            try:
+                await self._task
+            except asyncio.CancelledError:
+                pass
+            self._task = None
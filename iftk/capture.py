@@ -0,0 +1,342 @@
+# Copyright (c) Meta Platforms, Inc. and affiliates.
+#
+# This source code is licensed under the MIT license found in the
+# LICENSE file in the root directory of this source tree.
+
+import asyncio
+import threading
+import time
+import wave
+from collections.abc import AsyncIterator
+from dataclasses import dataclass
+
+from .audio import AudioFrame
+from .pubsub import OverflowPolicy
+
+_SAMPLE_WIDTHS = {1: "uint8", 2: "int16", 4: "int32"}
+_ITEMSIZES = {"uint8": 1, "int16": 2, "int32": 4, "float32": 4}
+
+
+@dataclass
+class CaptureStats:
+    """Frame counts of an AudioSource, in samples per channel.
+
+    captured counts every frame the device or file produced, dropped those
+    lost to overflow and overflows the writes that lost any.
+    """
+
+    captured: int = 0
+    dropped: int = 0
+    overflows: int = 0
+    chunks: int = 0
+
+
+class AudioRingBuffer:
+    """A preallocated ring of PCM bytes, written by a capture thread.
+
+    write() copies into the ring and never allocates. When a write doesn't
+    fit, DROP_OLDEST discards the oldest audio, DROP_NEWEST the newest, and
+    BLOCK waits for a reader (only suitable for producers that can wait, such
+    as a file reader). Drops are always whole frames and are counted in
+    stats. read() returns a chunk together with the capture time of its first
+    sample, derived from the timestamp of the latest write.
+    """
+
+    def __init__(
+        self,
+        capacity: int,
+        frame_bytes: int,
+        bytes_per_second: int,
+        overflow: OverflowPolicy = OverflowPolicy.DROP_OLDEST,
+    ) -> None:
+        """
+        Args:
+            capacity (int): Size of the ring in bytes, a multiple of frame_bytes.
+            frame_bytes (int): Bytes per frame (sample width times channels).
+            bytes_per_second (int): Bytes of audio per second, for timestamps.
+            overflow (OverflowPolicy, optional): What to do when full. Defaults to DROP_OLDEST.
+        """
+        overflow = OverflowPolicy(overflow)
+        if overflow is OverflowPolicy.COALESCE:
+            raise ValueError("audio can't be coalesced")
+        if capacity <= 0 or capacity % frame_bytes:
+            raise ValueError(f"capacity must be a positive multiple of {frame_bytes}")
+        self.capacity = capacity
+        self.frame_bytes = frame_bytes
+        self.bytes_per_second = bytes_per_second
+        self.overflow = overflow
+        self.stats = CaptureStats()
+        self._buffer = bytearray(capacity)
+        self._head = 0  # offset of the oldest byte
+        self._size = 0
+        self._end_time: float | None = None  # capture time of the end
+        self._closed = False
+        self._not_full = threading.Condition(threading.Lock())
+
+    def __len__(self) -> int:
+        return self._size
+
+    def _copy_in(self, data: memoryview) -> None:
+        tail = (self._head + self._size) % self.capacity
+        first = min(len(data), self.capacity - tail)
+        self._buffer[tail : tail + first] = data[:first]
+        self._buffer[: len(data) - first] = data[first:]
+        self._size += len(data)
+
+    def write(self, data, timestamp: float | None = None) -> None:
+        """Copy data into the ring. timestamp is the capture time of its first sample."""
+        data = memoryview(data).cast("B")
+        if timestamp is None:
+            end_time = time.monotonic()
+        else:
+            end_time = timestamp + len(data) / self.bytes_per_second
+        with self._not_full:
+            self.stats.captured += len(data) // self.frame_bytes
+            if self.overflow is OverflowPolicy.BLOCK:
+                while len(data) and not self._closed:
+                    while self._size == self.capacity and not self._closed:
+                        self._not_full.wait()
+                    n = min(len(data), self.capacity - self._size)
+                    self._copy_in(data[:n])
+                    data = data[n:]
+                self._end_time = end_time
+                return
+            excess = self._size + len(data) - self.capacity
+            if excess > 0:
+                self.stats.overflows += 1
+                self.stats.dropped += excess // self.frame_bytes
+                if self.overflow is OverflowPolicy.DROP_NEWEST:
+                    data = data[: len(data) - excess]
+                    end_time -= excess / self.bytes_per_second
+                else:
+                    # Drop the oldest queued audio, then any of data that
+                    # still doesn't fit.
+                    queued = min(excess, self._size)
+                    self._head = (self._head + queued) % self.capacity
+                    self._size -= queued
+                    data = data[excess - queued :]
+            self._copy_in(data)
+            self._end_time = end_time
+
+    def read(self, n: int) -> tuple[bytes, float] | None:
+        """Remove the oldest n bytes (or fewer, if that is all there is).
+
+        Returns the bytes and the capture time of their first sample, or None
+        if the ring is empty.
+        """
+        with self._not_full:
+            n = min(n, self._size)
+            if not n:
+                return None
+            end = self._head + n
+            if end <= self.capacity:
+                data = bytes(self._buffer[self._head : end])
+            else:
+                data = bytes(self._buffer[self._head :]) + bytes(
+                    self._buffer[: end - self.capacity]
+                )
+            timestamp = self._end_time - self._size / self.bytes_per_second
+            self._head = end % self.capacity
+            self._size -= n
+            self._not_full.notify_all()
+        return data, timestamp
+
+    def close(self) -> None:
+        """Release writers blocked under OverflowPolicy.BLOCK."""
+        with self._not_full:
+            self._closed = True
+            self._not_full.notify_all()
+
+
+class AudioSource:
+    """An async stream of fixed-duration AudioFrames from a capture thread.
+
+    Subclasses start producing in _open(), calling _push() from any thread
+    for each block of audio and _finish() at the end, and stop in _close().
+    Blocks go into a preallocated AudioRingBuffer, so a stalled consumer
+    loses the oldest audio (by default) instead of growing memory, and
+    frames are delivered in chunk_duration chunks whatever the block size.
+
+    Use as an async context manager, or iterate directly and call close():
+
+        async with WavFileSource("speech.wav") as source:
+            async for frame in source:
+                ...
+    """
+
+    def __init__(
+        self,
+        sample_rate: int,
+        channels: int = 1,
+        dtype: str = "int16",
+        chunk_duration: float = 0.032,
+        buffer_duration: float = 2.0,
+        overflow: OverflowPolicy = OverflowPolicy.DROP_OLDEST,
+    ) -> None:
+        """
+        Args:
+            sample_rate (int): Samples per second, per channel.
+            channels (int, optional): Number of interleaved channels. Defaults to 1.
+            dtype (str, optional): numpy dtype name of the samples. Defaults to "int16".
+            chunk_duration (float, optional): Seconds of audio per delivered frame. Defaults to 0.032.
+            buffer_duration (float, optional): Seconds of audio the ring holds. Defaults to 2.0.
+            overflow (OverflowPolicy, optional): What to do when the ring is full. Defaults to DROP_OLDEST.
+        """
+        self.sample_rate = sample_rate
+        self.channels = channels
+        self.dtype = dtype
+        frame_bytes = _ITEMSIZES[dtype] * channels
+        self.chunk_bytes = max(1, round(chunk_duration * sample_rate)) * frame_bytes
+        capacity = max(1, round(buffer_duration * sample_rate)) * frame_bytes
+        self.ring = AudioRingBuffer(
+            max(capacity, self.chunk_bytes),
+            frame_bytes,
+            frame_bytes * sample_rate,
+            overflow,
+        )
+        self._loop: asyncio.AbstractEventLoop | None = None
+        self._readable = asyncio.Event()
+        self._waiting = False
+        self._started = False
+        self._finished = False
+
+    @property
+    def stats(self) -> CaptureStats:
+        return self.ring.stats
+
+    def _open(self) -> None:
+        raise NotImplementedError
+
+    def _close(self) -> None:
+        pass
+
+    def _wake(self) -> None:
+        if self._waiting:
+            try:
+                self._loop.call_soon_threadsafe(self._readable.set)
+            except RuntimeError:
+                pass  # The loop was closed while capture was still running.
+
+    def _push(self, data, timestamp: float | None = None) -> None:
+        """Add captured audio. Safe to call from any thread."""
+        self.ring.write(data, timestamp)
+        if len(self.ring) >= self.chunk_bytes:
+            self._wake()
+
+    def _finish(self) -> None:
+        """Mark the end of the audio. Safe to call from any thread."""
+        self._finished = True
+        self._wake()
+
+    async def start(self) -> None:
+        if not self._started:
+            self._started = True
+            self._loop = asyncio.get_running_loop()
+            self._open()
+
+    async def close(self) -> None:
+        """Stop capturing. Audio already captured can still be read."""
+        if self._started and not self._finished:
+            self._close()
+        self._finished = True
+        self.ring.close()
+        self._readable.set()
+
+    async def read(self) -> AudioFrame | None:
+        """Wait for a full chunk and return it; at the end, return what is left, then None."""
+        await self.start()
+        while len(self.ring) < self.chunk_bytes and not self._finished:
+            self._waiting = True
+            self._readable.clear()
+            # Check again: the producer may have pushed before seeing _waiting.
+            if len(self.ring) < self.chunk_bytes and not self._finished:
+                await self._readable.wait()
+            self._waiting = False
+        chunk = self.ring.read(self.chunk_bytes)
+        if chunk is None:
+            return None
+        data, timestamp = chunk
+        self.stats.chunks += 1
+        return AudioFrame(data, self.sample_rate, self.channels, self.dtype, timestamp)
+
+    async def __aiter__(self) -> AsyncIterator[AudioFrame]:
+        while (frame := await self.read()) is not None:
+            yield frame
+
+    async def __aenter__(self) -> "AudioSource":
+        await self.start()
+        return self
+
+    async def __aexit__(self, *exc) -> None:
+        await self.close()
+
+
+class WavFileSource(AudioSource):
+    """An AudioSource reading a WAV file, e.g., to test or benchmark without a sound card.
+
+    With realtime=True, blocks of frames_per_buffer frames are produced at
+    the pace of the audio, like a microphone, and the ring drops the oldest
+    audio if the consumer falls behind. Otherwise the file is read as fast as
+    the consumer keeps up, waiting whenever the ring is full.
+    """
+
+    def __init__(
+        self,
+        path: str,
+        frames_per_buffer: int = 512,
+        realtime: bool = True,
+        chunk_duration: float = 0.032,
+        buffer_duration: float = 2.0,
+        overflow: OverflowPolicy | None = None,
+    ) -> None:
+        """
+        Args:
+            path (str): The WAV file to read.
+            frames_per_buffer (int, optional): Frames per block read from the file. Defaults to 512.
+            realtime (bool, optional): Produce audio at the pace of playback. Defaults to True.
+            chunk_duration (float, optional): Seconds of audio per delivered frame. Defaults to 0.032.
+            buffer_duration (float, optional): Seconds of audio the ring holds. Defaults to 2.0.
+            overflow (OverflowPolicy, optional): What to do when the ring is full. Defaults to DROP_OLDEST
+                                                 when realtime, else BLOCK.
+        """
+        with wave.open(path, "rb") as w:
+            sample_rate, channels = w.getframerate(), w.getnchannels()
+            dtype = _SAMPLE_WIDTHS[w.getsampwidth()]
+        if overflow is None:
+            overflow = OverflowPolicy.DROP_OLDEST if realtime else OverflowPolicy.BLOCK
+        super().__init__(
+            sample_rate, channels, dtype, chunk_duration, buffer_duration, overflow
+        )
+        self.path = path
+        self.frames_per_buffer = frames_per_buffer
+        self.realtime = realtime
+        self._stop = threading.Event()
+        self._thread: threading.Thread | None = None
+
+    def _open(self) -> None:
+        self._thread = threading.Thread(target=self._produce, daemon=True)
+        self._thread.start()
+
+    def _produce(self) -> None:
+        start = time.monotonic()
+        frames = 0
+        with wave.open(self.path, "rb") as w:
+            while not self._stop.is_set():
+                data = w.readframes(self.frames_per_buffer)
+                if not data:
+                    break
+                timestamp = start + frames / self.sample_rate
+                frames += len(data) // self.ring.frame_bytes
+                if self.realtime:
+                    # A device delivers a block once all of it was captured.
+                    delay = start + frames / self.sample_rate - time.monotonic()
+                    if delay > 0 and self._stop.wait(delay):
+                        break
+                self._push(data, timestamp)
+        self._finish()
+
+    def _close(self) -> None:
+        self._stop.set()
+        self.ring.close()
+        if self._thread is not None:
+            self._thread.join()
@@ -3,7 +3,9 @@
 # This source code is licensed under the MIT license found in the
 # LICENSE file in the root directory of this source tree.
 
+import asyncio
 from collections import deque
+from collections.abc import Iterable
 from typing import Any, Callable
 
 
@@ -71,3 +73,119 @@ class DequeChannel(Channel):
         self.q.append(x)
         if self.notify_readable:
             self.notify_readable()
+
+
+class RingChannel(AsyncChannel):
+    """A bounded symmetric channel backed by a fixed-capacity ring buffer.
+
+    Unlike DequeChannel, read() suspends until an item is available and write()
+    suspends while the buffer is full, so a stalled reader applies
+    backpressure to writers instead of letting the buffer grow. try_read() and
+    try_write() never suspend, and read_many()/write_many() move several items
+    per call.
+
+    After close(), readers drain the remaining items and then get None (or an
+    empty list from read_many()), and blocked writers raise ChannelClosedEvent.
+    """
+
+    def __init__(
+        self, capacity: int, notify_readable: Callable[[None], None] = None
+    ) -> None:
+        super().__init__(notify_readable)
+        if capacity < 1:
+            raise ValueError(f"capacity must be positive, got {capacity}")
+        self.capacity = capacity
+        self._buffer: list[Any] = [None] * capacity
+        self._head = 0  # index of the oldest item
+        self._size = 0
+        self._readable = asyncio.Event()
+        self._writable = asyncio.Event()
+
+    def __len__(self) -> int:
+        return self._size
+
+    def _push(self, x: Any) -> None:
+        self._buffer[(self._head + self._size) % self.capacity] = x
+        self._size += 1
+        self._readable.set()
+
+    def _pop(self) -> Any:
+        x = self._buffer[self._head]
+        self._buffer[self._head] = None
+        self._head = (self._head + 1) % self.capacity
+        self._size -= 1
+        self._writable.set()
+        return x
+
+    async def _wait_readable(self) -> bool:
+        """Wait for an item; return False if the channel closed while empty."""
+        while not self._size:
+            if self._closed:
+                return False
+            self._readable.clear()
+            await self._readable.wait()
+        return True
+
+    async def _wait_writable(self) -> None:
+        while self._size == self.capacity:
+            self._writable.clear()
+            await self._writable.wait()
+            if self._closed:
+                raise ChannelClosedEvent()
+
+    async def close(self) -> None:
+        await super().close()
+        # Wake everyone so readers can drain and writers can fail.
+        self._readable.set()
+        self._writable.set()
+
+    async def read(self) -> Any | None:
+        if not await self._wait_readable():
+            return None
+        return self._pop()
+
+    async def read_many(self, n: int) -> list[Any]:
+        """Wait for at least one item, then return up to n items."""
+        if not await self._wait_readable():
+            return []
+        return [self._pop() for _ in range(min(n, self._size))]
+
+    def try_read(self) -> Any | None:
+        """Pop an item if one is available without waiting, else return None."""
+        if not self._size:
+            return None
+        return self._pop()
+
+    async def write(self, x: Any) -> None:
+        await super().write(x)
+        await self._wait_writable()
+        self._push(x)
+        if self.notify_readable:
+            self.notify_readable()
+
+    async def write_many(self, xs: Iterable[Any]) -> None:
+        """Write all items in order, waiting for room whenever the buffer fills."""
+        if self._closed:
+            raise ChannelClosedEvent()
+        pushed = False
+        for x in xs:
+            if self._size == self.capacity:
+                if pushed and self.notify_readable:
+                    self.notify_readable()
+                pushed = False
+                await self._wait_writable()
+            self._push(x)
+            pushed = True
+        if pushed and self.notify_readable:
+            self.notify_readable()
+
+    def try_write(self, x: Any) -> bool:
+        """Write x if there is room without waiting. Return whether it was written."""
+        if self._closed:
+            raise ChannelClosedEvent()
+        if self._size == self.capacity:
+            return False
+        self._push(x)
+        if self.notify_readable:
+            self.notify_readable()
+        return True
@@ -0,0 +1,66 @@
+# Copyright (c) Meta Platforms, Inc. and affiliates.
+#
+# This source code is licensed under the MIT license found in the
+# LICENSE file in the root directory of this source tree.
+
+from dataclasses import dataclass
+
+
+@dataclass
+class SpeechEvent:
+    """A voice activity boundary.
+
+    sample is the offset from the start of the audio stream, in samples at
+    sample_rate. timestamp is the time.monotonic() at which that sample was
+    captured, when known.
+    """
+
+    sample: int
+    sample_rate: int
+    timestamp: float | None = None
+
+    @property
+    def seconds(self) -> float:
+        return self.sample / self.sample_rate
+
+
+@dataclass
+class SpeechStartEvent(SpeechEvent):
+    pass
+
+
+@dataclass
+class SpeechEndEvent(SpeechEvent):
+    pass
+
+
+@dataclass
+class TranscriptEvent:
+    """Recognized speech.
+
+    Partial transcripts (is_final=False) are the recognizer's current guess
+    and may be revised by later events; final transcripts will not change.
+    start and end are offsets from the start of the audio stream in seconds,
+    when known. speech_final marks the end of an utterance, for recognizers
+    that detect it (e.g., Deepgram's endpointing); the utterance is the text
+    of the final transcripts since the previous one.
+    """
+
+    text: str
+    is_final: bool = True
+    start: float | None = None
+    end: float | None = None
+    speech_final: bool = False
+
+
+@dataclass
+class InterruptionEvent:
+    """The user started speaking over the assistant, cutting its turn short.
+
+    spoken is the text of the sentences that were played in full before the
+    interruption. latency is the time in seconds from the capture of the
+    start of speech to the cancellation of the turn, when known.
+    """
+
+    spoken: str
+    latency: float | None = None
@@ -0,0 +1,65 @@
+# Copyright (c) Meta Platforms, Inc. and affiliates.
+#
+# This source code is licensed under the MIT license found in the
+# LICENSE file in the root directory of this source tree.
+
+import asyncio
+import contextvars
+import functools
+import threading
+from concurrent.futures import Executor, ThreadPoolExecutor
+from typing import Callable, TypeVar
+
+R = TypeVar("R")
+
+_executors: dict[str, ThreadPoolExecutor] = {}
+_executors_lock = threading.Lock()
+
+
+def get_executor(name: str, max_workers: int = 1) -> ThreadPoolExecutor:
+    """The process-wide thread pool called name, created on first use.
+
+    Give each model (or device) its own executor, e.g., "whisper" or
+    "cuda:0", so that its inference queues up behind itself instead of
+    competing with every other blocking call in the loop's default
+    executor. max_workers only applies when the executor is created; the
+    default of one thread serializes calls, which suits a single model.
+    """
+    with _executors_lock:
+        executor = _executors.get(name)
+        if executor is None:
+            executor = ThreadPoolExecutor(
+                max_workers, thread_name_prefix=f"iftk-{name}"
+            )
+            _executors[name] = executor
+        return executor
+
+
+def resolve_executor(executor: Executor | str | None) -> Executor | None:
+    """Look up executor by name if it is a string; None means the loop's default."""
+    if isinstance(executor, str):
+        return get_executor(executor)
+    return executor
+
+
+def shutdown_executors(wait: bool = True) -> None:
+    """Shut down every named executor, e.g., once asyncio.run() returns."""
+    with _executors_lock:
+        executors = list(_executors.values())
+        _executors.clear()
+    for executor in executors:
+        executor.shutdown(wait=wait)
+
+
+async def run_in_executor(
+    executor: Executor | str | None, fn: Callable[..., R], *args, **kwargs
+) -> R:
+    """Like asyncio.to_thread, but on the given executor (or executor name).
+
+    With executor=None this is asyncio.to_thread.
+    """
+    if executor is None:
+        return await asyncio.to_thread(fn, *args, **kwargs)
+    loop = asyncio.get_running_loop()
+    call = functools.partial(contextvars.copy_context().run, fn, *args, **kwargs)
+    return await loop.run_in_executor(resolve_executor(executor), call)
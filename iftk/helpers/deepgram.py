@@ -4,64 +4,509 @@
 # LICENSE file in the root directory of this source tree.
 
 import asyncio
+import bisect
+import contextlib
 import json
+import logging
+import os
+import sys
+import time
+from collections import deque
 from typing import AsyncIterator
+from urllib.parse import parse_qs, urlencode, urlsplit
 
 import websockets
 
-WSS_URL = "wss://api.deepgram.com/v1/listen?endpointing=500&encoding=linear16&sample_rate=16000&channels=1&interim_results=false"
+sys.path.insert(0, os.path.abspath(os.path.join(os.path.dirname(__file__), "../..")))
+from iftk.audio import AudioFrame
+from iftk.events import SpeechStartEvent, TranscriptEvent
+from iftk.tracing import traced_stream
 
+logger = logging.getLogger(__name__)
 
-async def deepgram_stream(
-    key: str, audio_stream: AsyncIterator[bytes]
-) -> AsyncIterator[str]:
-    """An AsyncIterator-friendly Deepgram wrapper for streaming inputs/outputs.
+LISTEN_URL = "wss://api.deepgram.com/v1/listen"
+
+
+def deepgram_url(
+    endpointing: int | bool = 500,
+    interim_results: bool = False,
+    sample_rate: int = 16000,
+    channels: int = 1,
+    url: str = LISTEN_URL,
+    **params,
+) -> str:
+    """The listen URL for int16 audio with the given options.
+
+    Args:
+        endpointing (int | bool, optional): Milliseconds of silence that end an utterance (speech_final),
+                                            or False to disable. Defaults to 500.
+        interim_results (bool, optional): Send partial transcripts while speech is in progress. Defaults to False.
+        sample_rate (int, optional): Sample rate of the audio. Defaults to 16000.
+        channels (int, optional): Number of audio channels. Defaults to 1.
+        url (str, optional): The listen endpoint. Defaults to LISTEN_URL.
+        **params: Other Deepgram query parameters, e.g., utterance_end_ms=1000.
+    """
+    query = {
+        "endpointing": endpointing,
+        "encoding": "linear16",
+        "sample_rate": sample_rate,
+        "channels": channels,
+        "interim_results": interim_results,
+        **params,
+    }
+    query = {k: str(v).lower() if isinstance(v, bool) else v for k, v in query.items()}
+    return f"{url}?{urlencode(query)}"
+
+
+WSS_URL = deepgram_url()
+
+KEEP_ALIVE = json.dumps({"type": "KeepAlive"})
+CLOSE_STREAM = json.dumps({"type": "CloseStream"})
+
+
+class DeepgramConnection:
+    """A Deepgram streaming socket that reconnects when it drops.
+
+    Audio sent since the last final result is kept, and replayed on a fresh
+    socket if the current one fails, so no speech is lost. Result times are
+    shifted so that they stay relative to the start of the whole stream
+    rather than to the start of the current socket.
+    """
+
+    def __init__(
+        self,
+        url: str,
+        headers: dict[str, str],
+        bytes_per_second: int | None = None,
+        max_replay_seconds: float = 30.0,
+        max_retries: int = 3,
+        retry_delay: float = 0.5,
+    ) -> None:
+        """
+        Args:
+            url (str): The listen endpoint, including encoding query parameters.
+            headers (dict[str, str]): Headers for the handshake, e.g., Authorization.
+            bytes_per_second (int, optional): Audio bytes per second, to keep time. Defaults to that of
+                                              int16 audio at the url's sample_rate and channels.
+            max_replay_seconds (float, optional): Most audio kept for replay. Defaults to 30.0.
+            max_retries (int, optional): Connection attempts per reconnect. Defaults to 3.
+            retry_delay (float, optional): Seconds before the first retry, doubling after each. Defaults to 0.5.
+        """
+        self.url = url
+        self.headers = headers
+        if bytes_per_second is None:
+            bytes_per_second = 2 * _sample_rate(url) * _channels(url)
+        self.bytes_per_second = bytes_per_second
+        self.max_replay_seconds = max_replay_seconds
+        self.max_retries = max_retries
+        self.retry_delay = retry_delay
+        self.ws: websockets.WebSocketClientProtocol | None = None
+        self.reconnects = 0
+        self.last_sent = 0.0
+        # (start, data) of audio not yet covered by a final result, with start
+        # in seconds from the beginning of the stream.
+        self._replay: deque[tuple[float, bytes]] = deque()
+        self._replay_bytes = 0
+        self._sent = 0.0
+        # Stream time of the first sample sent on the current socket.
+        self._offset = 0.0
+        self._lock = asyncio.Lock()
+        self._closed = False
+
+    @property
+    def open(self) -> bool:
+        return not self._closed and self.ws is not None and self.ws.open
+
+    async def connect(self) -> None:
+        self.ws = await self._open_socket()
+        self.last_sent = time.monotonic()
+
+    async def _open_socket(self) -> websockets.WebSocketClientProtocol:
+        delay = self.retry_delay
+        for attempt in range(self.max_retries):
+            try:
+                return await websockets.connect(self.url, extra_headers=self.headers)
+            except (OSError, websockets.InvalidHandshake):
+                if attempt == self.max_retries - 1:
+                    raise
+                logger.warning(f"deepgram connection failed, retrying in {delay}s")
+                await asyncio.sleep(delay)
+                delay *= 2
+
+    async def send(self, data: bytes) -> None:
+        """Send audio, reconnecting and replaying buffered audio if the socket failed."""
+        self._replay.append((self._sent, data))
+        self._replay_bytes += len(data)
+        self._sent += len(data) / self.bytes_per_second
+        # Don't trim while a reconnect is replaying the buffer.
+        while (
+            not self._lock.locked()
+            and self._replay_bytes / self.bytes_per_second > self.max_replay_seconds
+        ):
+            _, dropped = self._replay.popleft()
+            self._replay_bytes -= len(dropped)
+        ws = self.ws
+        try:
+            await ws.send(data)
+        except websockets.ConnectionClosedError:
+            # The new socket is sent everything in the replay buffer,
+            # including data.
+            await self._reconnect(ws)
+        self.last_sent = time.monotonic()
+
+    async def keep_alive(self, idle: float) -> None:
+        """Send a KeepAlive if no audio was sent in the last idle seconds."""
+        if not self.open or time.monotonic() - self.last_sent < idle:
+            return
+        with contextlib.suppress(websockets.ConnectionClosed):
+            await self.ws.send(KEEP_ALIVE)
+            self.last_sent = time.monotonic()
+
+    async def _reconnect(self, failed: websockets.WebSocketClientProtocol) -> None:
+        async with self._lock:
+            if self.ws is not failed or self._closed:
+                return  # Already reconnected by the sender or the receiver.
+            logger.warning("deepgram connection lost, reconnecting")
+            ws = await self._open_socket()
+            self._offset = self._replay[0][0] if self._replay else self._sent
+            # Audio sent meanwhile goes to the failed socket and is appended
+            # to the buffer, so it is replayed here in order.
+            i = 0
+            while i < len(self._replay):
+                await ws.send(self._replay[i][1])
+                i += 1
+            self.ws = ws
+            self.last_sent = time.monotonic()
+            self.reconnects += 1
+
+    def _acknowledge(self, end: float) -> None:
+        """Drop buffered audio that ends before a final result's end time."""
+        while self._replay:
+            start, data = self._replay[0]
+            if start + len(data) / self.bytes_per_second > end:
+                break
+            self._replay.popleft()
+            self._replay_bytes -= len(data)
+
+    async def messages(self) -> AsyncIterator[dict]:
+        """Yield messages from Deepgram until the stream is finished or closed.
+
+        Results and SpeechStarted messages are yielded with times relative
+        to the start of the stream, across reconnects.
+        """
+        while True:
+            ws, offset = self.ws, self._offset
+            try:
+                async for raw in ws:
+                    message = json.loads(raw)
+                    msg_type = message.get("type", "Results")
+                    if msg_type == "Results":
+                        message["start"] = message.get("start", 0.0) + offset
+                        if message.get("is_final"):
+                            self._acknowledge(
+                                message["start"] + message.get("duration", 0.0)
+                            )
+                    elif msg_type == "SpeechStarted":
+                        message["timestamp"] = message.get("timestamp", 0.0) + offset
+                    yield message
+                return
+            except websockets.ConnectionClosedError:
+                if self._closed:
+                    return
+                await self._reconnect(ws)
+
+    async def finish(self) -> None:
+        """Ask Deepgram to flush remaining results and close the stream."""
+        with contextlib.suppress(websockets.ConnectionClosed):
+            await self.ws.send(CLOSE_STREAM)
+
+    async def close(self) -> None:
+        self._closed = True
+        if self.ws is not None:
+            await self.ws.close()
+
+
+class DeepgramPool:
+    """Pre-opened Deepgram connections, handed out one per stream.
+
+    Opening a socket costs a TLS and websocket handshake, so the pool keeps
+    size connections open ahead of time and opens a replacement in the
+    background whenever one is handed out. Deepgram closes sockets that
+    receive nothing for about 10 seconds; a single scheduler task sends
+    KeepAlive messages to every idle or quiet connection in the pool.
+
+    Connections are not reused once released, since a Deepgram stream can't
+    be restarted after it is finished.
+    """
+
+    def __init__(
+        self,
+        key: str,
+        url: str = WSS_URL,
+        size: int = 1,
+        keep_alive_interval: float = 3.0,
+        **connection_kwargs,
+    ) -> None:
+        """
+        Args:
+            key (str): Your Deepgram API key.
+            url (str, optional): The listen endpoint. Defaults to WSS_URL.
+            size (int, optional): Number of connections to keep ready. Defaults to 1.
+            keep_alive_interval (float, optional): Seconds between keep-alives. Defaults to 3.0.
+            **connection_kwargs: Other DeepgramConnection options.
+        """
+        self.url = url
+        self.headers = {"Authorization": f"Token {key}"}
+        self.size = size
+        self.keep_alive_interval = keep_alive_interval
+        self.connection_kwargs = connection_kwargs
+        self._idle: deque[DeepgramConnection] = deque()
+        self._active: set[DeepgramConnection] = set()
+        self._tasks: set[asyncio.Task] = set()
+        self._keep_alive_task: asyncio.Task | None = None
+
+    async def _open(self) -> DeepgramConnection:
+        connection = DeepgramConnection(
+            self.url, self.headers, **self.connection_kwargs
+        )
+        await connection.connect()
+        return connection
+
+    async def _refill(self) -> None:
+        try:
+            self._idle.append(await self._open())
+        except Exception:
+            logger.exception("failed to pre-open a deepgram connection")
+
+    def _start_keep_alive(self) -> None:
+        if self._keep_alive_task is None:
+            self._keep_alive_task = asyncio.create_task(self._keep_alive())
+
+    async def _keep_alive(self) -> None:
+        while True:
+            await asyncio.sleep(self.keep_alive_interval)
+            connections = [*self._idle, *self._active]
+            await asyncio.gather(
+                *(c.keep_alive(self.keep_alive_interval) for c in connections)
+            )
+
+    async def start(self) -> None:
+        """Open size connections in parallel."""
+        connections = await asyncio.gather(
+            *(self._open() for _ in range(self.size - len(self._idle)))
+        )
+        self._idle.extend(connections)
+        self._start_keep_alive()
+
+    async def acquire(self) -> DeepgramConnection:
+        """Return a ready connection, opening one if none is idle."""
+        self._start_keep_alive()
+        connection = None
+        while self._idle:
+            candidate = self._idle.popleft()
+            if candidate.open:
+                connection = candidate
+                break
+        if connection is None:
+            connection = await self._open()
+        self._active.add(connection)
+        if len(self._idle) + len(self._tasks) < self.size:
+            task = asyncio.create_task(self._refill())
+            self._tasks.add(task)
+            task.add_done_callback(self._tasks.discard)
+        return connection
+
+    async def release(self, connection: DeepgramConnection) -> None:
+        self._active.discard(connection)
+        await connection.close()
+
+    @contextlib.asynccontextmanager
+    async def connection(self) -> AsyncIterator[DeepgramConnection]:
+        connection = await self.acquire()
+        try:
+            yield connection
+        finally:
+            await self.release(connection)
+
+    async def close(self) -> None:
+        tasks = list(self._tasks)
+        if self._keep_alive_task is not None:
+            tasks.append(self._keep_alive_task)
+            self._keep_alive_task = None
+        for task in tasks:
+            task.cancel()
+        await asyncio.gather(*tasks, return_exceptions=True)
+        connections = [*self._idle, *self._active]
+        self._idle.clear()
+        self._active.clear()
+        await asyncio.gather(*(c.close() for c in connections))
+
+
+@traced_stream("deepgram")
+async def deepgram_events(
+    key: str,
+    audio_stream: AsyncIterator[bytes | AudioFrame],
+    pool: DeepgramPool | None = None,
+    endpointing: int | bool = 500,
+    interim_results: bool = True,
+    vad_events: bool = False,
+) -> AsyncIterator[TranscriptEvent | SpeechStartEvent]:
+    """Stream audio to Deepgram, yielding every transcript it sends.
+
+    Partial transcripts (is_final=False) arrive while a segment of speech is
+    in progress, each replacing the previous one. Final transcripts
+    (is_final=True) will not change, and speech_final marks the end of an
+    utterance after endpointing milliseconds of silence. Deepgram's
+    UtteranceEnd messages are yielded as empty speech_final transcripts.
+    With vad_events, its SpeechStarted messages are yielded as
+    SpeechStartEvent as soon as speech is detected, ahead of any transcript,
+    e.g., to publish for barge-in.
 
     Args:
         key (str): Your Deepgram API key
-        audio_stream (AsyncIterator[bytes]): An AsyncIterator-compatible audio iterator, commonly in the form of streaming file or audio input.
+        audio_stream (AsyncIterator[bytes | AudioFrame]): An AsyncIterator-compatible audio iterator of 16kHz int16 mono audio.
+        pool (DeepgramPool, optional): Where to get a pre-opened connection from. Its url then sets the endpointing
+                                       and interim_results options. Defaults to opening a new connection.
+        endpointing (int | bool, optional): Milliseconds of silence that end an utterance, or False. Defaults to 500.
+        interim_results (bool, optional): Yield partial transcripts. Defaults to True.
+        vad_events (bool, optional): Yield the start of speech as a SpeechStartEvent. Defaults to False.
 
     Yields:
-        str: A sentence of text.
+        TranscriptEvent: A partial or final transcript, with start and end in seconds from the start of the stream.
+        SpeechStartEvent: The start of speech, with vad_events, at the url's sample rate and with the capture
+                          time of that audio (AudioFrame.timestamp, or when a bytes chunk was sent).
+    """
+    owned_pool = pool is None
+    if owned_pool:
+        url = deepgram_url(endpointing, interim_results, vad_events=vad_events)
+        pool = DeepgramPool(key, url=url, size=0)
+
+    try:
+        async with pool.connection() as connection:
+            clock = _CaptureClock()
+            sample_rate = _sample_rate(connection.url)
+
+            async def sender():
+                try:
+                    async for data in audio_stream:
+                        if isinstance(data, AudioFrame):
+                            timestamp, data = data.timestamp, data.data
+                        else:
+                            timestamp = time.monotonic()
+                        seconds = memoryview(data).nbytes / connection.bytes_per_second
+                        clock.add(seconds, timestamp)
+                        await connection.send(data)
+                    await connection.finish()
+                except Exception:
+                    # Unblock the receiver; the error is raised below.
+                    await connection.close()
+                    raise
+
+            sender_task = asyncio.create_task(sender())
+            try:
+                async for msg in connection.messages():
+                    event = _event(msg, sample_rate, clock)
+                    if event is not None:
+                        yield event
+                if sender_task.done() and sender_task.exception():
+                    raise sender_task.exception()
+            finally:
+                sender_task.cancel()
+    finally:
+        if owned_pool:
+            await pool.close()
+
+
+class _CaptureClock:
+    """Map times in the stream sent to Deepgram to when that audio was captured.
+
+    Captured audio mostly follows on from the previous chunk, so only the
+    chunks that don't, after a pause in capture say, are kept as anchors.
     """
-    extra_headers = {"Authorization": f"Token {key}"}
 
-    async with websockets.connect(
-        WSS_URL,
-        extra_headers=extra_headers,
-    ) as ws:
+    def __init__(self, tolerance: float = 0.05) -> None:
+        self.tolerance = tolerance
+        self._starts: list[float] = []  # stream seconds of each anchor
+        self._timestamps: list[float] = []  # and its time.monotonic() capture time
+        self._sent = 0.0
 
-        async def keep_alive(websocket: websockets.WebSocketClientProtocol):
-            while True:
-                keep_alive_msg = json.dumps({"type": "KeepAlive"})
-                await websocket.send(keep_alive_msg)
-                await asyncio.sleep(3)
+    def add(self, seconds: float, timestamp: float) -> None:
+        """Record a chunk of audio of the given duration, captured at timestamp."""
+        expected = self.capture_time(self._sent)
+        if expected is None or abs(expected - timestamp) > self.tolerance:
+            self._starts.append(self._sent)
+            self._timestamps.append(timestamp)
+        self._sent += seconds
 
-        keep_alive_task = asyncio.create_task(keep_alive(websocket=ws))
+    def capture_time(self, seconds: float) -> float | None:
+        i = bisect.bisect_right(self._starts, seconds) - 1
+        if i < 0:
+            return None
+        return self._timestamps[i] + seconds - self._starts[i]
 
-        async def sender(ws):
-            while True:
-                data = await anext(audio_stream)
-                await ws.send(data)
 
-        async def receiver(ws):
+def _sample_rate(url: str) -> int:
+    return int(parse_qs(urlsplit(url).query).get("sample_rate", ["16000"])[0])
+
+
+def _channels(url: str) -> int:
+    return int(parse_qs(urlsplit(url).query).get("channels", ["1"])[0])
+
+
+def _event(
+    msg: dict, sample_rate: int, clock: _CaptureClock
+) -> TranscriptEvent | SpeechStartEvent | None:
+    msg_type = msg.get("type", "Results")
+    if msg_type == "UtteranceEnd":
+        return TranscriptEvent("", True, speech_final=True)
+    if msg_type == "SpeechStarted":
+        seconds = msg.get("timestamp", 0.0)
+        return SpeechStartEvent(
+            round(seconds * sample_rate), sample_rate, clock.capture_time(seconds)
+        )
+    if msg_type != "Results":
+        return None
+    start = msg["start"]
+    return TranscriptEvent(
+        msg["channel"]["alternatives"][0]["transcript"],
+        is_final=msg.get("is_final", True),
+        start=start,
+        end=start + msg.get("duration", 0.0),
+        speech_final=msg.get("speech_final", False),
+    )
+
+
+async def deepgram_stream(
+    key: str,
+    audio_stream: AsyncIterator[bytes | AudioFrame],
+    pool: DeepgramPool | None = None,
+    endpointing: int | bool = 500,
+) -> AsyncIterator[str]:
+    """An AsyncIterator-friendly Deepgram wrapper for streaming inputs/outputs.
+
+    Args:
+        key (str): Your Deepgram API key
+        audio_stream (AsyncIterator[bytes | AudioFrame]): An AsyncIterator-compatible audio iterator of 16kHz int16 mono audio,
+                                                          commonly in the form of streaming file or audio input.
+        pool (DeepgramPool, optional): Where to get a pre-opened connection from. Defaults to opening a new one.
+        endpointing (int | bool, optional): Milliseconds of silence that end an utterance. Defaults to 500.
+
+    Yields:
+        str: A sentence of text.
+    """
+    transcript = ""
+    events = deepgram_events(
+        key, audio_stream, pool, endpointing=endpointing, interim_results=False
+    )
+    async for event in events:
+        if not isinstance(event, TranscriptEvent):
+            continue  # e.g., SpeechStartEvent, if the pool's url asks for vad_events
+        if event.is_final and event.text:
+            if transcript:
+                transcript += " "
+            transcript += event.text
+        if event.speech_final and transcript:
+            yield transcript
             transcript = ""
-            async for msg in ws:
-                msg = json.loads(msg)
-                if len(msg["channel"]["alternatives"][0]["transcript"]) > 0:
-                    if transcript:
-                        transcript += " "
-                    transcript += msg["channel"]["alternatives"][0]["transcript"]
-                if msg["speech_final"]:
-                    yield transcript
-                    transcript = ""
-
-        sender_task = asyncio.create_task(sender(ws))
-
-        async for update in receiver(ws):
-            if update:
-                yield update
-
-        tasks = [sender_task, keep_alive_task]
-        for task in tasks:
-            task.cancel()
+    if transcript:
+        yield transcript
@@ -3,14 +3,24 @@
 # This source code is licensed under the MIT license found in the
 # LICENSE file in the root directory of this source tree.
 
+import os
+import sys
+from contextlib import aclosing
 from typing import AsyncIterator, Iterator, Optional
 
-from elevenlabs.client import ElevenLabs
+try:
+    from elevenlabs.client import ElevenLabs
+except ImportError:  # Only for annotations; any client with generate() will do.
+    ElevenLabs = None
+
+sys.path.insert(0, os.path.abspath(os.path.join(os.path.dirname(__file__), "../..")))
+from iftk._iter_utils import iter_on_thread, prefetch_stream
+from iftk.tracing import traced_stream
 
 
 async def eleven_stream(
     sentences: AsyncIterator[str],
-    eleven_client: ElevenLabs,
+    eleven_client: "ElevenLabs",
     voice: Optional[str] = "Jessica",
 ) -> AsyncIterator[Iterator[bytes]]:
     """An AsyncIterator wrapper for the 11Labs TTS generation stream.
@@ -29,3 +39,48 @@ async def eleven_stream(
                 text=sentence, stream=True, voice=voice
             )
             yield audio_stream
+
+
+@traced_stream("elevenlabs")
+async def eleven_audio(
+    sentence: str, eleven_client: "ElevenLabs", voice: Optional[str] = "Jessica"
+) -> AsyncIterator[bytes]:
+    """Request 11Labs TTS for one sentence, yielding audio bytes as they arrive."""
+    audio_stream = eleven_client.generate(text=sentence, stream=True, voice=voice)
+    async for chunk in iter_on_thread(audio_stream, batched=True):
+        yield chunk
+
+
+async def eleven_prefetch_stream(
+    sentences: AsyncIterator[str],
+    eleven_client: "ElevenLabs",
+    voice: Optional[str] = "Jessica",
+    depth: int = 2,
+) -> AsyncIterator[AsyncIterator[bytes]]:
+    """Like eleven_stream, but requests audio for up to `depth` upcoming sentences while the current one plays.
+
+    Args:
+        sentences (AsyncIterator): A sentence AsyncIterator
+        eleven_client (ElevenLabs): The 11Labs third-party TTS client.
+        voice (str, optional): The 11Labs voice name. Defaults to "Jessica".
+        depth (int, optional): How many sentences to synthesize ahead of playback. Defaults to 2.
+
+    Yields:
+        AsyncIterator[bytes]: The audio of each sentence, in sentence order. See iftk.sync_iter to play it with the 11Labs
+                              stream audio playing function.
+    """
+
+    async def non_empty(sentences):
+        async for sentence in sentences:
+            if sentence:
+                yield sentence
+
+    async with aclosing(
+        prefetch_stream(
+            non_empty(sentences),
+            lambda sentence: eleven_audio(sentence, eleven_client, voice),
+            depth=depth,
+        )
+    ) as audios:
+        async for audio in audios:
+            yield audio
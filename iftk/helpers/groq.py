@@ -3,29 +3,44 @@
 # This source code is licensed under the MIT license found in the
 # LICENSE file in the root directory of this source tree.
 
+import os
+import sys
 from typing import AsyncIterator
 
-import groq
+try:
+    import groq
+except ImportError:  # Only for annotations; the streams take any client's stream.
+    groq = None
 
+sys.path.insert(0, os.path.abspath(os.path.join(os.path.dirname(__file__), "../..")))
+from iftk.segmenter import SegmentPolicy, segment_stream
+from iftk.tracing import traced_stream
 
-async def groq_sentence_stream(llm_stream: groq._client.AsyncStream) -> AsyncIterator:
+
+@traced_stream("groq_tokens")
+async def groq_token_stream(
+    llm_stream: "groq._client.AsyncStream",
+) -> AsyncIterator[str]:
+    """Yield the text of each non-empty delta in a groq generation stream."""
+    async for token in llm_stream:
+        new_text = token.choices[0].delta.content
+        if new_text:
+            yield new_text
+
+
+@traced_stream("groq_sentences")
+async def groq_sentence_stream(
+    llm_stream: "groq._client.AsyncStream",
+    policy: SegmentPolicy = SegmentPolicy.SENTENCE,
+) -> AsyncIterator:
     """An AsyncIterator wrapper for the groq generation stream.
 
     Args:
         llm_stream (groq._client.AsyncStream): The generation stream from the groq library.
+        policy (SegmentPolicy, optional): Where to split the text. Defaults to SegmentPolicy.SENTENCE.
 
     Yields:
         sentence (str): A sentence of text.
     """
-    sentence = ""
-    async for token in llm_stream:
-        new_text = token.choices[0].delta.content
-        if new_text is None:
-            continue
-        if new_text != "" and "." not in new_text:
-            sentence += new_text
-        else:
-            sentence += new_text
-            if sentence:
-                yield sentence
-            sentence = ""
+    async for sentence in segment_stream(groq_token_stream(llm_stream), policy):
+        yield sentence
@@ -3,42 +3,92 @@
 # This source code is licensed under the MIT license found in the
 # LICENSE file in the root directory of this source tree.
 
-import asyncio
+import os
+import sys
+import time
 from typing import AsyncIterator
 
 import pyaudio
 
+sys.path.insert(0, os.path.abspath(os.path.join(os.path.dirname(__file__), "../..")))
+from iftk.audio import AudioFrame
+from iftk.capture import AudioSource
+from iftk.pubsub import OverflowPolicy
 
-async def microphone(rate: int, frames_per_buffer: int) -> AsyncIterator[bytes]:
+
+class MicrophoneSource(AudioSource):
+    """An AudioSource recording int16 mono audio from the default input device.
+
+    PortAudio's callback only copies each block into the source's ring
+    buffer, so a stalled consumer costs at most buffer_duration seconds of
+    memory; the oldest audio is then dropped and counted in stats.dropped.
+    """
+
+    def __init__(
+        self,
+        rate: int = 16000,
+        frames_per_buffer: int = 512,
+        chunk_duration: float | None = None,
+        buffer_duration: float = 2.0,
+        overflow: OverflowPolicy = OverflowPolicy.DROP_OLDEST,
+    ) -> None:
+        """
+        Args:
+            rate (int, optional): Sampling rate for the microphone recording. Defaults to 16000.
+            frames_per_buffer (int, optional): Frames per PortAudio callback. Defaults to 512.
+            chunk_duration (float, optional): Seconds of audio per delivered frame. Defaults to one buffer.
+            buffer_duration (float, optional): Seconds of audio kept for a slow consumer. Defaults to 2.0.
+            overflow (OverflowPolicy, optional): DROP_OLDEST or DROP_NEWEST. Defaults to DROP_OLDEST.
+        """
+        if chunk_duration is None:
+            chunk_duration = frames_per_buffer / rate
+        super().__init__(
+            rate,
+            chunk_duration=chunk_duration,
+            buffer_duration=buffer_duration,
+            overflow=overflow,
+        )
+        self.frames_per_buffer = frames_per_buffer
+        self._pa: pyaudio.PyAudio | None = None
+        self._stream: pyaudio.Stream | None = None
+
+    def _callback(self, in_data, frame_count, time_info, status):
+        # The callback runs once the buffer is full, so capture started
+        # frame_count samples ago.
+        self._push(in_data, time.monotonic() - frame_count / self.sample_rate)
+        return (None, pyaudio.paContinue)
+
+    def _open(self) -> None:
+        self._pa = pyaudio.PyAudio()
+        self._stream = self._pa.open(
+            stream_callback=self._callback,
+            rate=self.sample_rate,
+            format=pyaudio.paInt16,
+            channels=1,
+            input=True,
+            frames_per_buffer=self.frames_per_buffer,
+        )
+        self._stream.start_stream()
+
+    def _close(self) -> None:
+        self._stream.stop_stream()
+        self._stream.close()
+        self._pa.terminate()
+
+
+async def microphone(rate: int, frames_per_buffer: int) -> AsyncIterator[AudioFrame]:
     """An AsyncIterator-friendly PyAudio microphone stream.
 
+    The stream is closed when the iterator is closed. See MicrophoneSource
+    for control over chunk size and buffering.
+
     Args:
         rate (int): Sampling rate for the microphone recording.
         frames_per_buffer (int): Chunk size of microphone recordings.
 
     Yields:
-        bytes: A recorded audio chunk.
+        AudioFrame: A recorded int16 mono audio chunk.
     """
-    loop = asyncio.get_event_loop()
-    queue = asyncio.Queue()
-    pa = pyaudio.PyAudio()
-
-    def put(in_data, frame_count, time_info, status):
-        loop.call_soon_threadsafe(queue.put_nowait, in_data)
-        return (None, pyaudio.paContinue)
-
-    async def get():
-        while True:
-            yield await queue.get()
-
-    stream = pa.open(
-        stream_callback=put,
-        rate=rate,
-        format=pyaudio.paInt16,
-        channels=1,
-        input=True,
-        frames_per_buffer=frames_per_buffer,
-    )
-    stream.start_stream()
-    async for chunk in get():
-        yield chunk
+    async with MicrophoneSource(rate, frames_per_buffer) as source:
+        async for frame in source:
+            yield frame
@@ -3,38 +3,185 @@
 # This source code is licensed under the MIT license found in the
 # LICENSE file in the root directory of this source tree.
 
-import io
-from asyncio import to_thread
+import copy
+import os
+import sys
+from concurrent.futures import Executor
+from functools import partial
 from typing import AsyncIterator
 
-import numpy as np
 import torch
 import torchaudio
-from scipy.io import wavfile
-from silero_vad import get_speech_timestamps, load_silero_vad
+from silero_vad import VADIterator, get_speech_timestamps, load_silero_vad
 
+sys.path.insert(0, os.path.abspath(os.path.join(os.path.dirname(__file__), "../..")))
+from iftk.audio import AudioFrame
+from iftk.events import SpeechEndEvent, SpeechEvent, SpeechStartEvent
+from iftk.executors import run_in_executor
+from iftk.registry import ModelRegistry, ModelSpec, default_registry
+from iftk.tracing import traced_stream
 
+# Silero VAD only accepts fixed-size windows at these rates.
+WINDOW_SIZE_SAMPLES = {16000: 512, 8000: 256}
+
+
+def silero_vad_model_spec(onnx: bool = False) -> ModelSpec:
+    """The registry spec for the Silero VAD model, e.g., for ModelRegistry.warm_up()."""
+    model_id = "silero_vad/onnx" if onnx else "silero_vad/jit"
+    return ModelSpec(model_id, partial(load_silero_vad, onnx=onnx))
+
+
+async def _acquire_model(onnx: bool, registry: ModelRegistry | None):
+    """Return a Silero VAD model with its own recurrent state.
+
+    The model keeps its state between calls, so each stream gets a shallow
+    copy that shares the registry's weights but not its state.
+    """
+    registry = registry if registry is not None else default_registry()
+    model = copy.copy(await registry.acquire(silero_vad_model_spec(onnx)))
+    model.reset_states()
+    return model
+
+
+class _Resampler:
+    """Resample to a fixed rate, building a transform only for rates that differ."""
+
+    def __init__(self, sample_rate: int) -> None:
+        self.sample_rate = sample_rate
+        self._transforms: dict[int, torchaudio.transforms.Resample] = {}
+
+    def __call__(self, frame: AudioFrame) -> torch.Tensor:
+        data = frame.torch()
+        if frame.sample_rate == self.sample_rate:
+            return data
+        transform = self._transforms.get(frame.sample_rate)
+        if transform is None:
+            transform = torchaudio.transforms.Resample(
+                frame.sample_rate, self.sample_rate
+            )
+            self._transforms[frame.sample_rate] = transform
+        return transform(data)
+
+
+@traced_stream("silero_vad")
 async def silero_vad_stream(
-    audio_feed: AsyncIterator[bytes], sample_rate: int = 16000
+    audio_feed: AsyncIterator[bytes | AudioFrame],
+    sample_rate: int = 16000,
+    onnx: bool = False,
+    registry: ModelRegistry | None = None,
+    executor: Executor | str | None = None,
 ) -> AsyncIterator[list]:
     """A Stream-friendly implementation of the Silero VAD model.
 
+    Each chunk is analyzed on its own, so speech spanning chunk boundaries is
+    not tracked. See silero_vad_events() for a stateful streaming alternative.
+
     Args:
-        audio_feed (AsyncIterator[bytes]): An AsyncIterator streamer for audio chunks.
+        audio_feed (AsyncIterator[bytes | AudioFrame]): An AsyncIterator streamer for audio chunks. Raw bytes are
+                                                        taken to be int16 mono at sample_rate.
         sample_rate (int, optional): The sample rate for Silero VAD. Defaults to 16000.
+        onnx (bool, optional): Run the model with ONNX Runtime instead of PyTorch. Defaults to False.
+        registry (ModelRegistry, optional): Where to load the model from. Defaults to the process-wide registry.
+        executor (Executor | str, optional): Where to run the model, e.g., "vad". Defaults to the loop's default executor.
 
     Yields:
         AsyncIterator[list]: Voice activity timestamp of its respective audio chunk.
     """
-    model = await to_thread(load_silero_vad, onnx=False)
+    model = await _acquire_model(onnx, registry)
+    resample = _Resampler(sample_rate)
     async for chunk in audio_feed:
-        wav_bytes_io = io.BytesIO()
-        raw_data = np.frombuffer(buffer=chunk, dtype=np.int16)
-        wavfile.write(wav_bytes_io, sample_rate, raw_data)
-        data, sr = torchaudio.load(wav_bytes_io)
-        transform = torchaudio.transforms.Resample(sr, sample_rate)
-        data = transform(data)
-        data = data.squeeze(0)
-        coro = to_thread(get_speech_timestamps, data, model)
+        data = resample(AudioFrame.from_chunk(chunk, sample_rate))
+        coro = run_in_executor(executor, get_speech_timestamps, data, model)
         yield await coro
         model.reset_states()
+
+
+def _detect(vad: VADIterator, data: torch.Tensor, window: int) -> list[dict]:
+    """Feed whole windows of data to vad, returning the boundaries it reports."""
+    boundaries = []
+    for offset in range(0, len(data), window):
+        boundary = vad(data[offset : offset + window])
+        if boundary:
+            boundaries.append(boundary)
+    return boundaries
+
+
+@traced_stream("silero_vad_events")
+async def silero_vad_events(
+    audio_feed: AsyncIterator[bytes | AudioFrame],
+    sample_rate: int = 16000,
+    threshold: float = 0.5,
+    min_silence_duration_ms: int = 100,
+    speech_pad_ms: int = 30,
+    onnx: bool = False,
+    registry: ModelRegistry | None = None,
+    executor: Executor | str | None = None,
+) -> AsyncIterator[SpeechEvent]:
+    """A stateful streaming Silero VAD emitting speech start and end events.
+
+    Audio is fed to the model in fixed windows of 512 samples (256 at 8kHz),
+    carrying leftover samples and the model's recurrent state over to the next
+    chunk, so chunks may be of any size and speech spanning chunk boundaries is
+    tracked correctly. Audio is resampled only when its rate differs from
+    sample_rate.
+
+    Args:
+        audio_feed (AsyncIterator[bytes | AudioFrame]): An AsyncIterator streamer for audio chunks. Raw bytes are
+                                                        taken to be int16 mono at sample_rate.
+        sample_rate (int, optional): The sample rate for Silero VAD, 8000 or 16000. Defaults to 16000.
+        threshold (float, optional): Speech probability above which a window is speech. Defaults to 0.5.
+        min_silence_duration_ms (int, optional): Silence needed before ending speech. Defaults to 100.
+        speech_pad_ms (int, optional): Padding added around each speech segment. Defaults to 30.
+        onnx (bool, optional): Run the model with ONNX Runtime instead of PyTorch. Defaults to False.
+        registry (ModelRegistry, optional): Where to load the model from. Defaults to the process-wide registry.
+        executor (Executor | str, optional): Where to run the model, e.g., "vad". Defaults to the loop's default executor.
+
+    Yields:
+        AsyncIterator[SpeechEvent]: A SpeechStartEvent or SpeechEndEvent, with sample offsets from the start of the
+                                    stream at sample_rate.
+    """
+    window = WINDOW_SIZE_SAMPLES[sample_rate]
+    model = await _acquire_model(onnx, registry)
+    vad = VADIterator(
+        model,
+        threshold=threshold,
+        sampling_rate=sample_rate,
+        min_silence_duration_ms=min_silence_duration_ms,
+        speech_pad_ms=speech_pad_ms,
+    )
+    resample = _Resampler(sample_rate)
+    pending = torch.zeros(0)
+    # Capture time of the first sample of the latest AudioFrame, and that
+    # sample's offset in the stream, to timestamp events.
+    frame_timestamp = None
+    frame_start = 0
+
+    def event(boundary_type: type, sample: int) -> SpeechEvent:
+        timestamp = None
+        if frame_timestamp is not None:
+            timestamp = frame_timestamp + (sample - frame_start) / sample_rate
+        return boundary_type(sample, sample_rate, timestamp)
+
+    async for chunk in audio_feed:
+        frame = AudioFrame.from_chunk(chunk, sample_rate)
+        if isinstance(chunk, AudioFrame):
+            frame_timestamp = frame.timestamp
+            frame_start = vad.current_sample + len(pending)
+        data = resample(frame)
+        if len(pending):
+            data = torch.cat([pending, data])
+        whole = len(data) - len(data) % window
+        pending = data[whole:]
+        if whole:
+            boundaries = await run_in_executor(
+                executor, _detect, vad, data[:whole], window
+            )
+            for boundary in boundaries:
+                if "start" in boundary:
+                    yield event(SpeechStartEvent, boundary["start"])
+                else:
+                    yield event(SpeechEndEvent, boundary["end"])
+
+    if vad.triggered:
+        yield event(SpeechEndEvent, vad.current_sample)
+    vad.reset_states()
@@ -3,7 +3,12 @@
 # This source code is licensed under the MIT license found in the
 # LICENSE file in the root directory of this source tree.
 
-from asyncio import to_thread
+import asyncio
+import os
+import sys
+import threading
+from concurrent.futures import Executor
+from dataclasses import dataclass
 from typing import AsyncIterator
 
 import torch
@@ -11,49 +16,200 @@ from transformers import (
     AutoModelForCausalLM,
     AutoTokenizer,
     BitsAndBytesConfig,
+    DynamicCache,
+    StoppingCriteria,
+    StoppingCriteriaList,
     TextIteratorStreamer,
 )
 
+sys.path.insert(0, os.path.abspath(os.path.join(os.path.dirname(__file__), "../..")))
+from iftk._iter_utils import iter_on_thread
+from iftk.executors import run_in_executor
+from iftk.registry import ModelRegistry, ModelSpec, default_registry
+from iftk.tracing import traced_stream
 
+
+def transformer_model_spec(model_id: str, quantize: bool = True) -> ModelSpec:
+    """The registry spec for a (tokenizer, model) pair, e.g., for ModelRegistry.warm_up()."""
+
+    def load():
+        tokenizer = AutoTokenizer.from_pretrained(model_id)
+        if quantize:
+            config = BitsAndBytesConfig(
+                load_in_4bit=True, bnb_4bit_compute_dtype=torch.float16
+            )
+            model = AutoModelForCausalLM.from_pretrained(
+                model_id, device_map="auto", quantization_config=config
+            )
+        else:
+            model = AutoModelForCausalLM.from_pretrained(model_id, device_map="auto")
+        return tokenizer, model
+
+    return ModelSpec(
+        model_id, load, quantization="4bit" if quantize else None, device="auto"
+    )
+
+
+class _StopOnEvent(StoppingCriteria):
+    """Stop generation at the next step once event is set."""
+
+    def __init__(self, event: threading.Event) -> None:
+        self.event = event
+
+    def __call__(
+        self, input_ids: torch.LongTensor, scores, **kwargs
+    ) -> torch.BoolTensor:
+        return torch.full(
+            (input_ids.shape[0],),
+            self.event.is_set(),
+            dtype=torch.bool,
+            device=input_ids.device,
+        )
+
+
+@dataclass
+class SessionStats:
+    """Prefix-cache counters for a ChatSession."""
+
+    turns: int = 0
+    prefix_hits: int = 0
+    reused_tokens: int = 0
+    prefilled_tokens: int = 0
+
+    @property
+    def hit_rate(self) -> float:
+        """Fraction of prompt tokens served from the cache."""
+        total = self.reused_tokens + self.prefilled_tokens
+        return self.reused_tokens / total if total else 0.0
+
+
+def _crop_cache(cache: DynamicCache, length: int) -> None:
+    if hasattr(cache, "crop"):
+        cache.crop(length)
+        return
+    for i in range(len(cache.key_cache)):
+        cache.key_cache[i] = cache.key_cache[i][..., :length, :]
+        cache.value_cache[i] = cache.value_cache[i][..., :length, :]
+    cache._seen_tokens = length
+
+
+class ChatSession:
+    """Per-conversation KV cache for transformer_stream.
+
+    Holds the past key/values of the last turn along with the tokens they
+    cover. When the next turn's prompt starts with those tokens, only the
+    newly appended messages are prefilled. If the history was edited, the
+    cache is cropped to the longest common prefix, which falls back to a
+    full prefill when nothing is shared. A session must not be used by two
+    streams at once.
+    """
+
+    def __init__(self) -> None:
+        self.input_ids: torch.LongTensor | None = None
+        self.past_key_values: DynamicCache | None = None
+        self.stats = SessionStats()
+
+    def reset(self) -> None:
+        self.input_ids = None
+        self.past_key_values = None
+
+    def _prepare(self, input_ids: torch.LongTensor) -> DynamicCache:
+        """Return a cache to generate from for input_ids, updating stats."""
+        reused = 0
+        if self.past_key_values is not None:
+            cached = self.input_ids[0]
+            prompt = input_ids[0]
+            # At least one prompt token must be left to compute logits from.
+            limit = min(len(cached), len(prompt) - 1)
+            mismatch = (cached[:limit] != prompt[:limit]).nonzero()
+            reused = int(mismatch[0]) if len(mismatch) else limit
+        self.stats.turns += 1
+        self.stats.reused_tokens += reused
+        self.stats.prefilled_tokens += input_ids.shape[-1] - reused
+        if not reused:
+            self.reset()
+            return DynamicCache()
+        self.stats.prefix_hits += 1
+        if reused < self.input_ids.shape[-1]:
+            _crop_cache(self.past_key_values, reused)
+        return self.past_key_values
+
+    def _update(self, sequences: torch.LongTensor, past_key_values) -> None:
+        # The last generated token was never fed back to the model, so the
+        # cache covers every token but that one.
+        self.input_ids = sequences[:, :-1]
+        self.past_key_values = past_key_values
+
+
+@traced_stream("transformers")
 async def transformer_stream(
-    model_id: str, messages: list, quantize: bool = True, max_new_tokens: int = 50
+    model_id: str,
+    messages: list,
+    quantize: bool = True,
+    max_new_tokens: int = 50,
+    registry: ModelRegistry | None = None,
+    session: ChatSession | None = None,
+    executor: Executor | str | None = None,
 ) -> AsyncIterator[str]:
     """A streaming wrapper for AsyncIterator-form transformer chat generation outputs.
 
+    Generation runs on a worker thread and tokens are yielded as they are
+    produced. If the caller stops iterating early (e.g., closes the iterator
+    on barge-in), generation stops at its next step.
+
     Args:
         model_id (str): The model ID according to HuggingFace
         messages (list): A message list in the form of a HuggingFace chat template
         quantize (bool, optional): Flag to add quantization to model generation. Model must support 4-bit quantization. Defaults to True.
         max_new_tokens (int, optional): Maximum tokens to generate. Defaults to 50.
+        registry (ModelRegistry, optional): Where to load the model from. Defaults to the process-wide registry.
+        session (ChatSession, optional): Conversation state to reuse the KV cache of previous turns from.
+        executor (Executor | str, optional): Where to run generation, e.g., "llm". Defaults to the loop's default
+                                             executor. Tokens are read on a separate thread of the default executor.
 
     Yields:
         AsyncIterator[str]: A generated string token.
     """
-    tokenizer = AutoTokenizer.from_pretrained(model_id)
-    streamer = TextIteratorStreamer(tokenizer=tokenizer)
-    if quantize:
-        config = BitsAndBytesConfig(
-            load_in_4bit=True, bnb_4bit_compute_dtype=torch.float16
-        )
-        model = await to_thread(
-            AutoModelForCausalLM.from_pretrained,
-            model_id,
-            device_map="auto",
-            quantization_config=config,
-        )
-    else:
-        model = await to_thread(
-            AutoModelForCausalLM.from_pretrained, model_id, device_map="auto"
-        )
+    registry = registry if registry is not None else default_registry()
+    tokenizer, model = await registry.acquire(
+        transformer_model_spec(model_id, quantize)
+    )
+    streamer = TextIteratorStreamer(
+        tokenizer=tokenizer, skip_prompt=True, skip_special_tokens=True
+    )
     tokenized_messages = tokenizer.apply_chat_template(
         messages, add_generation_prompt=True, return_tensors="pt"
     ).to(model.device)
-    await to_thread(
-        model.generate,
-        tokenized_messages,
-        streamer=streamer,
-        max_new_tokens=max_new_tokens,
-    )
-    for new_text in streamer:
-        if new_text:
-            yield new_text
+    stop = threading.Event()
+    kwargs = {}
+    if session is not None:
+        kwargs["past_key_values"] = session._prepare(tokenized_messages)
+        kwargs["return_dict_in_generate"] = True
+
+    def generate():
+        try:
+            return model.generate(
+                tokenized_messages,
+                streamer=streamer,
+                max_new_tokens=max_new_tokens,
+                stopping_criteria=StoppingCriteriaList([_StopOnEvent(stop)]),
+                **kwargs,
+            )
+        except BaseException:
+            if session is not None:
+                session.reset()  # the cache may hold a partial turn
+            streamer.end()  # unblock the consumer; the error is raised below
+            raise
+
+    generation = asyncio.create_task(run_in_executor(executor, generate))
+    try:
+        # One thread forwards tokens as they are decoded, instead of a thread
+        # round trip per token.
+        async for new_text in iter_on_thread(streamer, batched=True):
+            if new_text:
+                yield new_text
+    finally:
+        stop.set()
+        output = await generation
+        if session is not None:
+            session._update(output.sequences, output.past_key_values)
@@ -3,35 +3,280 @@
 # This source code is licensed under the MIT license found in the
 # LICENSE file in the root directory of this source tree.
 
-from asyncio import to_thread
+import os
+import sys
+from concurrent.futures import Executor
+from functools import partial
 from typing import AsyncIterator
 
 import numpy as np
+import torch
 import whisper
 
+sys.path.insert(0, os.path.abspath(os.path.join(os.path.dirname(__file__), "../..")))
+from iftk.audio import AudioFrame
+from iftk.batching import MicroBatcher
+from iftk.events import TranscriptEvent
+from iftk.executors import run_in_executor
+from iftk.registry import ModelRegistry, ModelSpec, default_registry
+from iftk.tracing import traced_stream
 
+
+def whisper_model_spec(model_size: str = "tiny") -> ModelSpec:
+    """The registry spec for a Whisper model, e.g., for ModelRegistry.warm_up()."""
+    return ModelSpec(
+        f"openai-whisper/{model_size}", partial(whisper.load_model, name=model_size)
+    )
+
+
+class WhisperBatcher(MicroBatcher[np.ndarray, str]):
+    """Transcribe audio from many concurrent sessions in batched model passes.
+
+    Segments submitted within max_wait seconds of each other, up to
+    max_batch_size of them, are padded to Whisper's 30 second window and
+    decoded together. Segments longer than 30 seconds are truncated. Batch
+    sizes and latencies are available in stats.
+    """
+
+    def __init__(
+        self,
+        model_size: str = "tiny",
+        language: str = "en",
+        max_batch_size: int = 8,
+        max_wait: float = 0.02,
+        registry: ModelRegistry | None = None,
+        executor: Executor | str | None = None,
+    ) -> None:
+        super().__init__(self._transcribe_batch, max_batch_size, max_wait, executor)
+        self.spec = whisper_model_spec(model_size)
+        self.language = language
+        self.registry = registry if registry is not None else default_registry()
+
+    def _transcribe_batch(self, audios: list[np.ndarray]) -> list[str]:
+        model = self.registry.get(self.spec)
+        mel = torch.stack(
+            [
+                whisper.log_mel_spectrogram(
+                    whisper.pad_or_trim(audio), model.dims.n_mels
+                )
+                for audio in audios
+            ]
+        ).to(model.device)
+        options = whisper.DecodingOptions(
+            language=self.language, fp16=model.device.type == "cuda"
+        )
+        return [result.text for result in whisper.decode(model, mel, options)]
+
+
+@traced_stream("whisper")
 async def whisper_stream(
-    audio_feed: AsyncIterator[bytes], model_size: str = "tiny", language: str = "en"
+    audio_feed: AsyncIterator[bytes | AudioFrame],
+    model_size: str = "tiny",
+    language: str = "en",
+    registry: ModelRegistry | None = None,
+    batcher: WhisperBatcher | None = None,
+    executor: Executor | str | None = None,
 ) -> AsyncIterator[str]:
     """A stream-friendly implementation of Whisper for ASR transcript generation.
 
     Args:
-        audio_feed (AsyncIterator[bytes]): Audio bytes AsyncIterator to generate the transcription on. Note that the chunk size
-                                           should be big enough to generate streaming transcriptions.
+        audio_feed (AsyncIterator[bytes | AudioFrame]): Audio AsyncIterator to generate the transcription on, as 16kHz int16
+                                                        bytes or AudioFrames. Note that the chunk size should be big enough to
+                                                        generate streaming transcriptions.
         model_size (str, optional): The model size tag. Defaults to "tiny".
         language (str, optional): The model language to generate the transcription on. Defaults to "en".
+        registry (ModelRegistry, optional): Where to load the model from. Defaults to the process-wide registry.
+        batcher (WhisperBatcher, optional): A batcher shared with other sessions to transcribe with instead. Its model
+                                            and language are used in place of model_size and language.
+        executor (Executor | str, optional): Where to run the model, e.g., "whisper". Defaults to the loop's default
+                                             executor.
 
     Yields:
         AsyncIterator[str]: The text result of the transcription.
     """
-    model = await to_thread(whisper.load_model, name=model_size)
+    if batcher is None:
+        registry = registry if registry is not None else default_registry()
+        model = await registry.acquire(whisper_model_spec(model_size))
     async for chunk in audio_feed:
-        buffer = (
-            np.frombuffer(buffer=chunk, dtype=np.int16).flatten().astype(np.float32)
-            / 32768.0
-        )
+        buffer = AudioFrame.from_chunk(chunk, whisper.audio.SAMPLE_RATE).float32()
         if not buffer.any():
             break
-        result = await to_thread(model.transcribe, buffer, language=language)
-        if result["text"]:
-            yield result["text"]
+        if batcher is not None:
+            text = await batcher.submit(buffer)
+        else:
+            result = await run_in_executor(
+                executor, model.transcribe, buffer, language=language
+            )
+            text = result["text"]
+        if text:
+            yield text
+
+
+# (start, end, text) of a recognized word, in seconds from the start of the stream
+Word = tuple[float, float, str]
+
+
+def _normalize(word: str) -> str:
+    return word.strip().lower()
+
+
+class _LocalAgreement:
+    """Commit the words on which two consecutive hypotheses agree.
+
+    Each hypothesis is the transcript of the whole audio window. Words that
+    the previous hypothesis also ended with are unlikely to change once more
+    audio arrives, so the longest common prefix of the uncommitted words of
+    both is committed.
+    """
+
+    def __init__(self) -> None:
+        self.committed: list[Word] = []  # committed words still in the window
+        self.committed_end = 0.0
+        self.uncommitted: list[Word] = []
+
+    def update(self, words: list[Word]) -> list[Word]:
+        """Take a new hypothesis and return the newly committed words."""
+        new = [w for w in words if w[0] > self.committed_end - 0.1]
+        # Timestamps are fuzzy, so the hypothesis may also repeat the last few
+        # committed words right at the boundary.
+        if new and abs(new[0][0] - self.committed_end) < 1.0:
+            for n in range(min(len(self.committed), len(new), 5), 0, -1):
+                tail = [_normalize(w[2]) for w in self.committed[-n:]]
+                if tail == [_normalize(w[2]) for w in new[:n]]:
+                    new = new[n:]
+                    break
+        agreed = []
+        for word, previous in zip(new, self.uncommitted):
+            if _normalize(word[2]) != _normalize(previous[2]):
+                break
+            agreed.append(word)
+        self.uncommitted = new[len(agreed) :]
+        if agreed:
+            self.committed.extend(agreed)
+            self.committed_end = agreed[-1][1]
+        return agreed
+
+    def commit_all(self) -> list[Word]:
+        """Commit the uncommitted words as they are, e.g., at the end of a stream."""
+        words = self.uncommitted
+        self.uncommitted = []
+        if words:
+            self.committed.extend(words)
+            self.committed_end = words[-1][1]
+        return words
+
+    def trim(self, time: float) -> list[Word]:
+        """Forget committed words that end before time, returning them."""
+        kept = [w for w in self.committed if w[1] > time]
+        trimmed = self.committed[: len(self.committed) - len(kept)]
+        self.committed = kept
+        return trimmed
+
+
+def _transcribe_words(
+    model, audio: np.ndarray, offset: float, language: str, prompt: str
+) -> list[Word]:
+    result = model.transcribe(
+        audio,
+        language=language,
+        initial_prompt=prompt or None,
+        word_timestamps=True,
+        condition_on_previous_text=False,
+    )
+    return [
+        (offset + word["start"], offset + word["end"], word["word"])
+        for segment in result["segments"]
+        for word in segment.get("words", [])
+    ]
+
+
+def _transcript(words: list[Word], is_final: bool) -> TranscriptEvent:
+    text = "".join(w[2] for w in words).strip()
+    return TranscriptEvent(text, is_final, words[0][0], words[-1][1])
+
+
+@traced_stream("whisper_incremental")
+async def whisper_incremental_stream(
+    audio_feed: AsyncIterator[bytes | AudioFrame],
+    model_size: str = "tiny",
+    language: str = "en",
+    min_chunk_seconds: float = 1.0,
+    trim_seconds: float = 15.0,
+    registry: ModelRegistry | None = None,
+    executor: Executor | str | None = None,
+) -> AsyncIterator[TranscriptEvent]:
+    """An incremental Whisper transcription stream over a sliding audio window.
+
+    Every min_chunk_seconds of new audio, the window is transcribed again and
+    compared with the previous transcription. Words on which both agree are
+    committed and emitted as a final TranscriptEvent, and the remaining words
+    as a partial one. Audio before the last committed word is then dropped,
+    and committed text is passed to Whisper as a prompt instead, so each step
+    decodes only the uncommitted tail. Unlike whisper_stream(), chunks may be
+    small.
+
+    Args:
+        audio_feed (AsyncIterator[bytes | AudioFrame]): Audio AsyncIterator to generate the transcription on, as 16kHz int16
+                                                        bytes or AudioFrames.
+        model_size (str, optional): The model size tag. Defaults to "tiny".
+        language (str, optional): The model language to generate the transcription on. Defaults to "en".
+        min_chunk_seconds (float, optional): New audio needed before transcribing again. Defaults to 1.0.
+        trim_seconds (float, optional): Most audio kept while no words are recognized, e.g., in silence.
+                                        Defaults to 15.0.
+        registry (ModelRegistry, optional): Where to load the model from. Defaults to the process-wide registry.
+        executor (Executor | str, optional): Where to run the model. Defaults to the loop's default executor.
+
+    Yields:
+        AsyncIterator[TranscriptEvent]: Partial and final transcripts, with start and end times from the start of the
+                                        stream.
+    """
+    sample_rate = whisper.audio.SAMPLE_RATE
+    max_window = whisper.audio.CHUNK_LENGTH * sample_rate
+    registry = registry if registry is not None else default_registry()
+    model = await registry.acquire(whisper_model_spec(model_size))
+    agreement = _LocalAgreement()
+    window = np.zeros(0, dtype=np.float32)
+    offset = 0.0  # stream time of the first sample of window
+    prompt = ""  # committed text that is no longer in the window
+    pending = 0  # samples received since the last transcription
+
+    async def transcribe():
+        return await run_in_executor(
+            executor, _transcribe_words, model, window, offset, language, prompt[-200:]
+        )
+
+    async for chunk in audio_feed:
+        samples = AudioFrame.from_chunk(chunk, sample_rate).float32()
+        window = np.concatenate([window, samples])
+        pending += len(samples)
+        if pending < min_chunk_seconds * sample_rate:
+            continue
+        pending = 0
+
+        committed = agreement.update(await transcribe())
+        if len(window) >= max_window:
+            # Whisper cannot see past 30s, so stop waiting for agreement.
+            committed += agreement.commit_all()
+        if committed:
+            yield _transcript(committed, is_final=True)
+        if agreement.uncommitted:
+            yield _transcript(agreement.uncommitted, is_final=False)
+
+        cut = offset
+        if committed:
+            # Only the uncommitted tail is decoded again, after the last
+            # committed word, kept to match words repeated at the boundary.
+            cut = committed[-1][0]
+        elif not agreement.uncommitted and len(window) > trim_seconds * sample_rate:
+            # Nothing was recognized (e.g., silence); keep recent audio only.
+            cut = offset + (len(window) / sample_rate - trim_seconds)
+        if cut > offset:
+            window = window[int((cut - offset) * sample_rate) :]
+            offset = cut
+            trimmed = agreement.trim(cut)
+            prompt += "".join(w[2] for w in trimmed)
+
+    committed = agreement.update(await transcribe()) if pending else []
+    committed += agreement.commit_all()
+    if committed:
+        yield _transcript(committed, is_final=True)
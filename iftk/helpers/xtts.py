@@ -3,9 +3,13 @@
 # This source code is licensed under the MIT license found in the
 # LICENSE file in the root directory of this source tree.
 
+import hashlib
 import os
 import sys
+import tempfile
 from asyncio import to_thread
+from concurrent.futures import Executor
+from contextlib import aclosing
 from typing import AsyncIterator
 
 import torch
@@ -14,42 +18,207 @@ from TTS.tts.models.xtts import Xtts
 from TTS.utils.generic_utils import get_user_data_dir
 
 sys.path.insert(0, os.path.abspath(os.path.join(os.path.dirname(__file__), "../..")))
-from iftk._iter_utils import iter_on_thread
+from iftk._iter_utils import iter_on_thread, prefetch_stream
+from iftk.executors import run_in_executor
+from iftk.registry import ModelRegistry, ModelSpec, default_registry
+from iftk.tracing import traced_stream
 
+MODEL_NAME = "tts_models--multilingual--multi-dataset--xtts_v2"
 
+
+def xtts_model_spec(gpu: bool = True) -> ModelSpec:
+    """The registry spec for the XTTS v2 model, e.g., for ModelRegistry.warm_up()."""
+    device = "cuda" if torch.cuda.is_available() and gpu else "cpu"
+
+    def load():
+        config = XttsConfig()
+        model_path = os.path.join(get_user_data_dir("tts"), MODEL_NAME)
+        config.load_json(os.path.join(model_path, "config.json"))
+        xtts_model = Xtts.init_from_config(config=config)
+        xtts_model.load_checkpoint(config=config, checkpoint_dir=model_path)
+        return xtts_model.to(device)
+
+    return ModelSpec(MODEL_NAME, load, device=device)
+
+
+def _file_digest(path: str) -> str:
+    digest = hashlib.sha256()
+    with open(path, "rb") as f:
+        for block in iter(lambda: f.read(1 << 20), b""):
+            digest.update(block)
+    return digest.hexdigest()
+
+
+class XttsSynthesizer:
+    """A long-lived XTTS synthesizer with cached speaker conditioning.
+
+    The model is loaded once through the registry, and the conditioning
+    latents of each speaker are computed once. Latents computed from custom
+    reference WAVs are also saved under cache_dir, keyed by the hash of the
+    file contents, so later processes skip the computation too.
+    """
+
+    def __init__(
+        self,
+        language: str = "en",
+        gpu: bool = True,
+        cache_dir: str | None = None,
+        registry: ModelRegistry | None = None,
+        executor: Executor | str | None = None,
+    ) -> None:
+        """
+        Args:
+            language (str, optional): The language for the speech generation. Defaults to "en".
+            gpu (bool, optional): Run the model on GPU when one is available. Defaults to True.
+            cache_dir (str, optional): Where to save latents of reference WAVs. Defaults to a directory next to the
+                                       TTS models.
+            registry (ModelRegistry, optional): Where to load the model from. Defaults to the process-wide registry.
+            executor (Executor | str, optional): Where to run the model, e.g., "xtts". Defaults to the loop's
+                                                 default executor.
+        """
+        self.language = language
+        self.executor = executor
+        self.spec = xtts_model_spec(gpu)
+        self.registry = registry if registry is not None else default_registry()
+        self.cache_dir = cache_dir or os.path.join(
+            get_user_data_dir("tts"), "iftk_speaker_latents"
+        )
+        self._latents: dict[str, tuple[torch.Tensor, torch.Tensor]] = {}
+        # (path, mtime, size) -> content hash, to avoid rehashing unchanged files
+        self._digests: dict[tuple, str] = {}
+
+    async def model(self) -> Xtts:
+        return await self.registry.acquire(self.spec)
+
+    async def speaker_latents(
+        self, speaker: str = "Luis Moray", speaker_wav: str | None = None
+    ) -> tuple[torch.Tensor, torch.Tensor]:
+        """Return (gpt_cond_latent, speaker_embedding) for a named speaker or reference WAV."""
+        if speaker_wav is None:
+            key = f"speaker:{speaker}"
+        else:
+            stat = os.stat(speaker_wav)
+            file_id = (os.path.abspath(speaker_wav), stat.st_mtime_ns, stat.st_size)
+            digest = self._digests.get(file_id)
+            if digest is None:
+                digest = await to_thread(_file_digest, speaker_wav)
+                self._digests[file_id] = digest
+            key = f"wav:{digest}"
+        latents = self._latents.get(key)
+        if latents is not None:
+            return latents
+
+        xtts_model = await self.model()
+        if speaker_wav is None:
+            latents = tuple(xtts_model.speaker_manager.speakers[speaker].values())
+        else:
+            latents = await run_in_executor(
+                self.executor, self._load_wav_latents, xtts_model, speaker_wav, digest
+            )
+        self._latents[key] = latents
+        return latents
+
+    def _load_wav_latents(
+        self, xtts_model: Xtts, speaker_wav: str, digest: str
+    ) -> tuple[torch.Tensor, torch.Tensor]:
+        path = os.path.join(self.cache_dir, f"{digest}.pt")
+        if os.path.exists(path):
+            return tuple(torch.load(path, map_location=xtts_model.device))
+        latents = xtts_model.get_conditioning_latents(audio_path=[speaker_wav])
+        os.makedirs(self.cache_dir, exist_ok=True)
+        # Write then rename so readers never see a partial file. Each writer,
+        # even another thread of this process, gets its own temporary file.
+        with tempfile.NamedTemporaryFile(
+            dir=self.cache_dir, suffix=".tmp", delete=False
+        ) as f:
+            torch.save(latents, f)
+        os.replace(f.name, path)
+        return latents
+
+    async def synthesize(
+        self, message: str, speaker: str = "Luis Moray", speaker_wav: str | None = None
+    ) -> AsyncIterator[torch.Tensor]:
+        """Yield audio chunks for one message as they are generated.
+
+        Generation runs in a single executor call, which forwards each chunk
+        as soon as it is ready.
+        """
+        xtts_model = await self.model()
+        gpt_cond_latent, speaker_embedding = await self.speaker_latents(
+            speaker, speaker_wav
+        )
+        async for chunk in iter_on_thread(
+            xtts_model.inference_stream(
+                message,
+                gpt_cond_latent=gpt_cond_latent,
+                speaker_embedding=speaker_embedding,
+                language=self.language,
+            ),
+            self.executor,
+            batched=True,
+        ):
+            yield chunk
+
+    async def stream(
+        self,
+        sentences: AsyncIterator[str],
+        speaker: str = "Luis Moray",
+        speaker_wav: str | None = None,
+    ) -> AsyncIterator[torch.Tensor]:
+        """Synthesize a stream of sentences back to back with the same model and speaker."""
+        async for sentence in sentences:
+            if sentence:
+                async for chunk in self.synthesize(sentence, speaker, speaker_wav):
+                    yield chunk
+
+    async def prefetch_stream(
+        self,
+        sentences: AsyncIterator[str],
+        speaker: str = "Luis Moray",
+        speaker_wav: str | None = None,
+        depth: int = 1,
+    ) -> AsyncIterator[AsyncIterator[torch.Tensor]]:
+        """Yield each sentence's audio in order, synthesizing up to `depth`
+        sentences ahead of the consumer."""
+
+        async def non_empty(sentences):
+            async for sentence in sentences:
+                if sentence:
+                    yield sentence
+
+        async with aclosing(
+            prefetch_stream(
+                non_empty(sentences),
+                lambda sentence: self.synthesize(sentence, speaker, speaker_wav),
+                depth=depth,
+            )
+        ) as audios:
+            async for audio in audios:
+                yield audio
+
+
+@traced_stream("xtts")
 async def xtts_stream(
-    message: str, speaker: str = "Luis Moray", language: str = "en", gpu: bool = True
+    message: str,
+    speaker: str = "Luis Moray",
+    language: str = "en",
+    gpu: bool = True,
+    registry: ModelRegistry | None = None,
 ) -> AsyncIterator[torch.Tensor]:
     """A Stream-friendly AsyncIterator for TTS audio chunk generation with the XTTS model.
 
+    See XttsSynthesizer to also cache custom speaker latents across messages.
+
     Args:
         message (str): The message to be turned into speech with TTS.
         speaker (str, optional): The name of the pre-trained TTS speaker. Defaults to "Luis Moray".
         language (str, optional): The language for the speech generation. Defaults to "en".
+        gpu (bool, optional): Run the model on GPU when one is available. Defaults to True.
+        registry (ModelRegistry, optional): Where to load the model from. Defaults to the process-wide registry.
 
     Yields:
         AsyncIterator[torch.Tensor]: A torch.Tensor containing the TTS audio generated by the XTTS model.
     """
-    config = XttsConfig()
-    model_path = os.path.join(
-        get_user_data_dir("tts"), "tts_models--multilingual--multi-dataset--xtts_v2"
-    )
-    config.load_json(os.path.join(model_path, "config.json"))
-    xtts_model = await to_thread(Xtts.init_from_config, config=config)
-    await to_thread(
-        xtts_model.load_checkpoint, config=config, checkpoint_dir=model_path
-    )
-    if torch.cuda.is_available() and gpu:
-        xtts_model.cuda()
-    gpt_cond_latent, speaker_embedding = xtts_model.speaker_manager.speakers[
-        speaker
-    ].values()
-    async for chunk in iter_on_thread(
-        xtts_model.inference_stream(
-            message,
-            gpt_cond_latent=gpt_cond_latent,
-            speaker_embedding=speaker_embedding,
-            language=language,
-        )
-    ):
+    synthesizer = XttsSynthesizer(language=language, gpu=gpu, registry=registry)
+    async for chunk in synthesizer.synthesize(message, speaker):
         yield chunk
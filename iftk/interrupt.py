@@ -0,0 +1,172 @@
+# Copyright (c) Meta Platforms, Inc. and affiliates.
+#
+# This source code is licensed under the MIT license found in the
+# LICENSE file in the root directory of this source tree.
+
+import asyncio
+import time
+from collections.abc import AsyncIterator
+from typing import Awaitable, Callable, TypeVar
+
+from .events import InterruptionEvent, SpeechStartEvent
+from .pubsub import PubSub, Subscriber
+
+T = TypeVar("T")
+
+
+class AssistantTurn:
+    """One assistant reply, whose work is cancelled all at once if interrupted.
+
+    Use it as an async context manager around the code that generates and
+    plays the reply, in the task that does so. interrupt() cancels that task
+    wherever it is waiting, calls the stop callbacks of the say() in
+    progress, and resumes after the async with block as if the reply had
+    ended. Streams registered with closing() are closed on the way out, so an
+    LLM stream and the TTS requests queued by prefetch_stream stop too.
+
+    spoken holds the sentences whose playback finished, so message() is
+    what the user actually heard, ready to record in the chat history.
+    """
+
+    def __init__(self, barge_in: "BargeIn | None" = None) -> None:
+        self.barge_in = barge_in
+        self.spoken: list[str] = []
+        self.interrupted = False
+        self.started: float | None = None  # time.monotonic() at the start of the turn
+        self._task: asyncio.Task | None = None
+        self._cancelling = 0
+        self._cancelled = False  # whether interrupt() cancelled the task
+        self._streams: list[AsyncIterator] = []
+        self._stops: list[Callable[[], None]] = []
+
+    @property
+    def text(self) -> str:
+        return " ".join(self.spoken)
+
+    def message(self) -> dict[str, str]:
+        """The spoken part of the turn as a chat message, e.g., for messages.append()."""
+        return {"role": "assistant", "content": self.text}
+
+    def closing(self, stream: AsyncIterator[T]) -> AsyncIterator[T]:
+        """Close stream when the turn ends, however it ends, and return it.
+
+        Register outer streams last: they are closed in reverse order, so a
+        prefetch stream is closed before the sentences it reads.
+        """
+        self._streams.append(stream)
+        return stream
+
+    async def say(
+        self, text: str, playback: Awaitable, stop: Callable[[], None] | None = None
+    ) -> None:
+        """Await playback of text's audio, then count text as spoken.
+
+        Args:
+            text (str): The text being played.
+            playback (Awaitable): Plays the audio, e.g., asyncio.to_thread(sd.play, wav, blocking=True).
+            stop (Callable[[], None], optional): Called if the turn is interrupted during playback, to stop
+                                                 audio that cancelling playback doesn't, e.g., sd.stop.
+        """
+        if stop is not None:
+            self._stops.append(stop)
+        try:
+            await playback
+        finally:
+            if stop is not None:
+                self._stops.remove(stop)
+        self.spoken.append(text)
+
+    def interrupt(self) -> bool:
+        """Cancel the turn. Return False if it isn't running or was already interrupted."""
+        if self._task is None or self.interrupted:
+            return False
+        self.interrupted = True
+        for stop in self._stops:
+            stop()
+        self._task.cancel()
+        self._cancelled = True
+        return True
+
+    async def __aenter__(self) -> "AssistantTurn":
+        if self.barge_in is not None:
+            self.barge_in._begin(self)
+        self._task = asyncio.current_task()
+        self._cancelling = self._task.cancelling()
+        self.started = time.monotonic()
+        return self
+
+    async def __aexit__(self, exc_type, exc, tb) -> bool:
+        task, self._task = self._task, None
+        if self.barge_in is not None:
+            self.barge_in._end(self)
+        for stream in reversed(self._streams):
+            aclose = getattr(stream, "aclose", None)
+            if aclose is not None:
+                await aclose()
+        if not self._cancelled:
+            return False
+        self._cancelled = False
+        delivered = exc_type is asyncio.CancelledError
+        if exc_type is None:
+            # interrupt() came after the block's last wait, so the
+            # cancellation is still on its way. Let it arrive here.
+            try:
+                await asyncio.sleep(0)
+            except asyncio.CancelledError:
+                delivered = True
+        # Take back our cancellation whether or not it reached the block, and
+        # swallow it unless someone else cancelled the task too.
+        if task.uncancel() > self._cancelling:
+            if delivered and exc_type is None:
+                raise asyncio.CancelledError
+            return False
+        return delivered
+
+
+class BargeIn(Subscriber):
+    """Interrupt the assistant's reply when the user starts speaking.
+
+    Wrap each reply in `async with barge_in.turn() as turn:`. A
+    SpeechStartEvent published during the turn interrupts it (see
+    AssistantTurn) and publishes an InterruptionEvent with what was spoken,
+    and the code after the async with block can go straight on to the
+    user's next turn. Start events captured before the turn began are
+    ignored, since they belong to the utterance being answered.
+
+    Speech events must be published from another task than the reply's,
+    e.g., one that reads a VAD stream for the whole conversation. Without
+    echo cancellation, use headphones, or the assistant will interrupt
+    itself.
+    """
+
+    subscribes_to = SpeechStartEvent
+    publishes = InterruptionEvent
+
+    def __init__(self, pubsub: PubSub) -> None:
+        super().__init__(pubsub)
+        self.current: AssistantTurn | None = None
+
+    def turn(self) -> AssistantTurn:
+        """A new turn, interrupted by speech while its async with block runs."""
+        return AssistantTurn(self)
+
+    def _begin(self, turn: AssistantTurn) -> None:
+        if self.current is not None:
+            raise RuntimeError("another assistant turn is in progress")
+        self.current = turn
+
+    def _end(self, turn: AssistantTurn) -> None:
+        if self.current is turn:
+            self.current = None
+
+    async def on_event(self, event: SpeechStartEvent) -> None:
+        turn = self.current
+        if turn is None:
+            return
+        if event.timestamp is not None and event.timestamp < turn.started:
+            return
+        if turn.interrupt():
+            latency = None
+            if event.timestamp is not None:
+                latency = time.monotonic() - event.timestamp
+            await self.publish(InterruptionEvent(turn.text, latency))
@@ -0,0 +1,370 @@
+# Copyright (c) Meta Platforms, Inc. and affiliates.
+#
+# This source code is licensed under the MIT license found in the
+# LICENSE file in the root directory of this source tree.
+
+import asyncio
+import logging
+import time
+from collections.abc import AsyncIterator, Iterable
+from dataclasses import dataclass
+from typing import Any, Callable
+
+from .pubsub import BaseSubscriber, InboxStats, OverflowPolicy, PubSub, Subscriber
+
+logger = logging.getLogger(__name__)
+
+
+class PipelineError(ValueError):
+    """Raised when a Pipeline's stages are not connected by the types they declare."""
+
+
+class Stage(Subscriber):
+    """A Subscriber that a Pipeline connects to its bus, instead of on creation.
+
+    subscribes_to and publishes declare the types of events the stage
+    handles and emits, as a type or a tuple of types. A source, such as a
+    microphone, subscribes to nothing (the default) and publishes from
+    run(), which the pipeline runs as a task once started.
+    """
+
+    subscribes_to: type | tuple[type, ...] | None = ()
+    publishes: type | tuple[type, ...] | None = ()
+    name: str | None = None
+
+    def __init__(self) -> None:
+        self.pubsub: PubSub | None = None
+
+    async def run(self) -> None:
+        """Publish events until done; only sources need to override this."""
+
+    async def publish(self, event: Any) -> None:
+        if not isinstance(event, self.publishes or ()):
+            logger.warn(f"publish() unregistered event: {type(event)} in {type(self)}")
+        await self.pubsub.publish(event)
+
+
+class StreamStage(Stage):
+    """Run a Stream-style helper, such as deepgram_events(), as a pipeline stage.
+
+    Events matching subscribes_to are fed to fn's input AsyncIterator
+    through a queue of maxsize events, and whatever fn yields is published.
+    The helper does its work in run() rather than on_event(), so busy counts
+    the time fn takes to produce each output, not counting its waits for
+    input or the time spent publishing it. Once fn returns or raises, the
+    events still queued for it and any that arrive later are dropped.
+    """
+
+    def __init__(
+        self,
+        fn: Callable[[AsyncIterator], AsyncIterator],
+        subscribes_to: type | tuple[type, ...],
+        publishes: type | tuple[type, ...],
+        name: str | None = None,
+        maxsize: int = 1,
+    ) -> None:
+        """
+        Args:
+            fn (Callable[[AsyncIterator], AsyncIterator]): The helper, e.g., lambda frames: deepgram_events(key, frames).
+            subscribes_to (type | tuple[type, ...]): The events fed to fn.
+            publishes (type | tuple[type, ...]): The events fn yields.
+            name (str, optional): The stage's name in stats. Defaults to fn's name.
+            maxsize (int, optional): Most events queued for fn, after those in the inbox. Defaults to 1.
+        """
+        super().__init__()
+        self.fn = fn
+        self.subscribes_to = subscribes_to
+        self.publishes = publishes
+        self.name = name if name is not None else getattr(fn, "__name__", None)
+        self.busy = 0.0
+        self._input: asyncio.Queue = asyncio.Queue(maxsize)
+        self._taken = False  # whether fn holds an event it hasn't finished with
+        self._done = False
+
+    async def on_event(self, event: Any) -> None:
+        if not self._done:
+            await self._input.put(event)
+        if self._done:
+            # fn returned or failed, so nothing is left to take the event.
+            self._discard()
+
+    def _discard(self) -> None:
+        if self._taken:
+            self._taken = False
+            self._input.task_done()
+        while not self._input.empty():
+            self._input.get_nowait()
+            self._input.task_done()
+
+    async def run(self) -> None:
+        waited = 0.0  # seconds fn spent waiting for input since the last output
+
+        async def events() -> AsyncIterator:
+            nonlocal waited
+            while True:
+                start = time.monotonic()
+                event = await self._input.get()
+                waited += time.monotonic() - start
+                self._taken = True
+                yield event
+                self._taken = False
+                self._input.task_done()  # fn is ready for more
+
+        try:
+            stream = aiter(self.fn(events()))
+            while True:
+                waited = 0.0
+                start = time.monotonic()
+                try:
+                    x = await anext(stream)
+                except StopAsyncIteration:
+                    return
+                self.busy += time.monotonic() - start - waited
+                await self.publish(x)
+        finally:
+            self._done = True
+            self._discard()
+
+    async def join(self) -> None:
+        """Wait until fn has taken every queued event and asked for more, or has stopped."""
+        await self._input.join()
+
+
+@dataclass
+class StageStats:
+    """How hard one stage of a Pipeline has worked since start().
+
+    busy is the time in seconds spent handling events, not counting waits
+    for room in a slower stage's inbox, and utilization the fraction of the
+    running time that is. depth, max_depth and dropped describe the stage's
+    inbox; sources have none.
+    """
+
+    handled: int = 0
+    busy: float = 0.0
+    utilization: float = 0.0
+    depth: int = 0
+    max_depth: int = 0
+    dropped: int = 0
+
+
+def _types(declared: Any) -> tuple[type, ...] | None:
+    """declared as a tuple of types, or None if it is not a type or tuple of types."""
+    if isinstance(declared, type):
+        return (declared,)
+    if isinstance(declared, tuple) and all(isinstance(t, type) for t in declared):
+        return declared
+    return None
+
+
+def _related(a: tuple[type, ...], b: tuple[type, ...]) -> bool:
+    """Whether an event declared as one of a may be one of b, or the other way round."""
+    return any(issubclass(x, y) or issubclass(y, x) for x in a for y in b)
+
+
+class Pipeline:
+    """Stages connected by the types of events they declare, all running at once.
+
+    Stages are subscribers of one concurrent PubSub, so each has its own
+    worker task and a bounded inbox of inbox_size events (a stage may
+    override it, and overflow, with attributes of the same name). Where
+    nested async for loops run ASR, LLM and TTS one after another, here
+    every stage works on its own item at the same time, e.g., TTS
+    synthesizes one sentence while the LLM writes the next and the previous
+    one plays, and a full inbox holds back the stages feeding it.
+
+    build() checks the graph before anything runs: every type a stage
+    subscribes to must be published by another stage or listed in inputs
+    (events published from outside, with publish()), and every type a stage
+    publishes must reach another stage or be listed in outputs. Subscribers
+    to all events (subscribes_to = None), such as loggers, don't count.
+
+    stats() reports each stage's utilization, so bottleneck() can name the
+    stage holding the others back.
+    """
+
+    def __init__(
+        self,
+        stages: Iterable[BaseSubscriber] = (),
+        inputs: type | tuple[type, ...] = (),
+        outputs: type | tuple[type, ...] = (),
+        inbox_size: int = 8,
+        overflow: OverflowPolicy = OverflowPolicy.BLOCK,
+    ) -> None:
+        """
+        Args:
+            stages (Iterable[BaseSubscriber], optional): Stages to add(). Defaults to none.
+            inputs (type | tuple[type, ...], optional): Events published from outside the pipeline. Defaults to none.
+            outputs (type | tuple[type, ...], optional): Events published for outside the pipeline, e.g., for a
+                                                         PubSubChannel subscribed to self.pubsub. Defaults to none.
+            inbox_size (int, optional): Events queued per stage. Defaults to 8.
+            overflow (OverflowPolicy, optional): What to do when a stage's inbox is full. Defaults to BLOCK.
+        """
+        self.inputs = inputs
+        self.outputs = outputs
+        self.pubsub = PubSub(concurrent=True, inbox_size=inbox_size, overflow=overflow)
+        self.stages: dict[str, BaseSubscriber] = {}
+        self._built = False
+        self._started: float | None = None
+        self._tasks: dict[str, asyncio.Task] = {}
+        for stage in stages:
+            self.add(stage)
+
+    def add(self, stage: BaseSubscriber) -> BaseSubscriber:
+        """Add stage, named by its name attribute or its class, and return it."""
+        if self._built:
+            raise RuntimeError("can't add stages to a pipeline that was built")
+        base = getattr(stage, "name", None) or type(stage).__name__
+        name, n = base, 1
+        while name in self.stages:
+            n += 1
+            name = f"{base}#{n}"
+        self.stages[name] = stage
+        return stage
+
+    def check(self) -> list[str]:
+        """Describe every unconnected or mistyped edge of the graph; empty if there are none."""
+        problems = []
+        subscribes: dict[str, tuple[type, ...] | None] = {}
+        publishes: dict[str, tuple[type, ...]] = {}
+        for name, stage in self.stages.items():
+            declared = getattr(stage, "subscribes_to", None)
+            if declared is not None:
+                declared = _types(declared)
+                if declared is None:
+                    problems.append(
+                        f"{name}.subscribes_to is not a type or tuple of types"
+                    )
+                    continue
+            subscribes[name] = declared
+            declared = getattr(stage, "publishes", None)
+            declared = () if declared is None else _types(declared)
+            if declared is None:
+                problems.append(f"{name}.publishes is not a type or tuple of types")
+                continue
+            publishes[name] = declared
+        inputs, outputs = _types(self.inputs), _types(self.outputs)
+        if inputs is None:
+            problems.append("inputs is not a type or tuple of types")
+        if outputs is None:
+            problems.append("outputs is not a type or tuple of types")
+        if problems:
+            return problems
+
+        for name, types in subscribes.items():
+            for t in types or ():
+                fed = _related((t,), inputs) or any(
+                    _related((t,), ts) for p, ts in publishes.items() if p != name
+                )
+                if not fed:
+                    problems.append(
+                        f"{name} subscribes to {t.__name__}, "
+                        "which no other stage publishes"
+                    )
+        for name, types in publishes.items():
+            for t in types:
+                consumed = _related((t,), outputs) or any(
+                    _related((t,), ts)
+                    for c, ts in subscribes.items()
+                    if c != name and ts
+                )
+                if not consumed:
+                    problems.append(
+                        f"{name} publishes {t.__name__}, "
+                        "which no other stage subscribes to"
+                    )
+        return problems
+
+    def build(self) -> None:
+        """Check the graph, raising PipelineError if it doesn't connect, and subscribe every stage."""
+        if self._built:
+            return
+        problems = self.check()
+        if problems:
+            raise PipelineError("; ".join(problems))
+        for stage in self.stages.values():
+            if isinstance(stage, Stage):
+                stage.pubsub = self.pubsub
+            self.pubsub.subscribe(stage)
+        self._built = True
+
+    async def start(self) -> None:
+        """Build the pipeline if needed and start every stage's run()."""
+        self.build()
+        self._started = time.monotonic()
+        for name, stage in self.stages.items():
+            if isinstance(stage, Stage):
+                task = asyncio.create_task(stage.run(), name=f"iftk-pipeline-{name}")
+                task.add_done_callback(self._on_done)
+                self._tasks[name] = task
+
+    def _on_done(self, task: asyncio.Task) -> None:
+        if not task.cancelled() and task.exception() is not None:
+            logger.error(f"{task.get_name()} failed", exc_info=task.exception())
+
+    async def publish(self, event: Any) -> None:
+        """Publish an event from outside the pipeline, e.g., one of inputs."""
+        await self.pubsub.publish(event)
+
+    def _sources(self) -> list[asyncio.Task]:
+        return [
+            task
+            for name, task in self._tasks.items()
+            if not isinstance(self.stages[name], StreamStage)
+        ]
+
+    async def join(self) -> None:
+        """Wait until the sources are done and every stage has handled every event."""
+        await asyncio.gather(*self._sources(), return_exceptions=True)
+        streams = [s for s in self.stages.values() if isinstance(s, StreamStage)]
+        while True:
+            await self.pubsub.drain()
+            for stream in streams:
+                await stream.join()
+            if self.pubsub.idle:
+                return
+
+    async def shutdown(self) -> None:
+        """Stop the sources, let the other stages handle what is queued, and shut them down."""
+        for task in self._sources():
+            task.cancel()
+        await self.join()
+        for task in self._tasks.values():
+            task.cancel()
+        await asyncio.gather(*self._tasks.values(), return_exceptions=True)
+        await self.pubsub.shutdown()
+
+    async def __aenter__(self) -> "Pipeline":
+        await self.start()
+        return self
+
+    async def __aexit__(self, *exc) -> None:
+        await self.shutdown()
+
+    def stats(self) -> dict[str, StageStats]:
+        """Each stage's work so far, by name."""
+        elapsed = time.monotonic() - self._started if self._started is not None else 0.0
+        inboxes = self.pubsub.inbox_stats()
+        stats = {}
+        for name, stage in self.stages.items():
+            inbox = inboxes.get(stage, InboxStats())
+            busy = getattr(stage, "busy", None)
+            if busy is None:
+                busy = inbox.busy - inbox.stalled
+            stats[name] = StageStats(
+                handled=inbox.delivered,
+                busy=busy,
+                utilization=busy / elapsed if elapsed else 0.0,
+                depth=inbox.depth,
+                max_depth=inbox.max_depth,
+                dropped=inbox.dropped + inbox.coalesced,
+            )
+        return stats
+
+    def bottleneck(self) -> str | None:
+        """The name of the most utilized stage, or None before any work."""
+        stats = self.stats()
+        name = max(stats, key=lambda n: stats[n].utilization, default=None)
+        if name is None or not stats[name].busy:
+            return None
+        return name
@@ -0,0 +1,524 @@
+# Copyright (c) Meta Platforms, Inc. and affiliates.
+#
+# This source code is licensed under the MIT license found in the
+# LICENSE file in the root directory of this source tree.
+
+import asyncio
+import logging
+import multiprocessing
+import threading
+from collections.abc import AsyncIterator
+from dataclasses import dataclass, field
+from multiprocessing.connection import Connection
+from multiprocessing.reduction import ForkingPickler
+from multiprocessing.shared_memory import SharedMemory
+from typing import Any, Callable
+
+from .audio import AudioFrame
+from .channel import AsyncChannel
+from .registry import ModelRegistry, ModelSpec, default_registry
+from .system import System
+
+logger = logging.getLogger(__name__)
+
+# three uint64 counters: bytes ever written, bytes ever read, and whether
+# the writer is waiting for room
+_HEADER = 24
+
+
+class SharedRing:
+    """A single-producer, single-consumer byte ring in shared memory.
+
+    One process writes and another reads. Each side only ever advances its
+    own counter, so no lock is needed. Record boundaries are not kept;
+    writers announce each payload's size over a pipe, which also orders
+    the data in memory before the announcement.
+    """
+
+    def __init__(self, capacity: int = 1 << 22, name: str | None = None) -> None:
+        """
+        Args:
+            capacity (int, optional): Size of the ring in bytes, when creating it. Defaults to 4 MiB.
+            name (str, optional): Attach to the existing ring of this name instead of creating one.
+        """
+        if name is None:
+            self.shm = SharedMemory(create=True, size=_HEADER + capacity)
+            self.shm.buf[:_HEADER] = bytes(_HEADER)
+        else:
+            # Workers share the creator's resource tracker, so attaching
+            # doesn't register the memory a second time.
+            self.shm = SharedMemory(name=name)
+        self.capacity = self.shm.size - _HEADER
+        self._counters = self.shm.buf[:_HEADER].cast("Q")
+        self._data = self.shm.buf[_HEADER:]
+
+    @property
+    def name(self) -> str:
+        return self.shm.name
+
+    def __len__(self) -> int:
+        return self._counters[0] - self._counters[1]
+
+    def write(self, data) -> bool:
+        """Copy data in if it fits. Return whether it was written."""
+        data = memoryview(data).cast("B")
+        n = len(data)
+        if n > self.capacity - len(self):
+            if n > self.capacity:
+                raise ValueError(f"{n} bytes don't fit in a ring of {self.capacity}")
+            return False
+        start = self._counters[0] % self.capacity
+        first = min(n, self.capacity - start)
+        self._data[start : start + first] = data[:first]
+        self._data[: n - first] = data[first:]
+        self._counters[0] += n
+        return True
+
+    def read(self, n: int) -> bytes:
+        """Remove and return the next n bytes, which must have been written."""
+        start = self._counters[1] % self.capacity
+        first = min(n, self.capacity - start)
+        data = bytes(self._data[start : start + first])
+        if first < n:
+            data += bytes(self._data[: n - first])
+        self._counters[1] += n
+        return data
+
+    def want_room(self) -> None:
+        """Ask the reader to say when it next makes room. Called by the writer."""
+        self._counters[2] = 1
+
+    def room_wanted(self) -> bool:
+        """Whether the writer waits for room, clearing the request. Called by the reader."""
+        if not self._counters[2]:
+            return False
+        self._counters[2] = 0
+        return True
+
+    def close(self, unlink: bool = False) -> None:
+        self._counters.release()
+        self._data.release()
+        self.shm.close()
+        if unlink:
+            self.shm.unlink()
+
+
+async def _send(
+    writer: "_PipeWriter", ring: SharedRing, x: Any, room: asyncio.Event
+) -> None:
+    """Send x to the other process: audio through ring, anything else pickled.
+
+    When ring is full, wait for the reader to announce room, which sets room.
+    """
+    if isinstance(x, AudioFrame):
+        header = ("frame", len(x), x.sample_rate, x.channels, x.dtype, x.timestamp)
+        data = x.data
+    elif isinstance(x, (bytes, bytearray, memoryview)):
+        header = ("bytes", memoryview(x).nbytes)
+        data = x
+    else:
+        await writer.send(("item", x))
+        return
+    # Headers must announce payloads in the order they are in the ring.
+    async with writer.ring_lock:
+        while not ring.write(data):
+            room.clear()
+            ring.want_room()
+            if ring.write(data):  # The reader made room before seeing the request.
+                break
+            try:
+                # The timeout only covers a request and a read that cross
+                # each other in flight, so that neither side sees the other.
+                await asyncio.wait_for(room.wait(), 0.05)
+            except asyncio.TimeoutError:
+                pass
+        await writer.send(header)
+
+
+def _decode(message: tuple, ring: SharedRing) -> Any:
+    kind = message[0]
+    if kind == "frame":
+        _, n, sample_rate, channels, dtype, timestamp = message
+        return AudioFrame(ring.read(n), sample_rate, channels, dtype, timestamp)
+    if kind == "bytes":
+        return ring.read(message[1])
+    return message[1]
+
+
+async def _receive(message: tuple, ring: SharedRing, writer: "_PipeWriter") -> Any:
+    """Decode message, telling the other process if it waits for room in ring."""
+    x = _decode(message, ring)
+    if message[0] in ("frame", "bytes") and ring.room_wanted():
+        await writer.send(("room",))
+    return x
+
+
+class _PipeReader:
+    """Queue the messages arriving on conn, as the event loop sees them.
+
+    Room announcements aren't queued; they set room instead.
+    """
+
+    def __init__(
+        self, conn: Connection, on_message: Callable[[], None] | None = None
+    ) -> None:
+        self.conn = conn
+        self.on_message = on_message
+        self.queue: asyncio.Queue = asyncio.Queue()
+        self.room = asyncio.Event()  # set when the other process reads our ring
+        self._loop = asyncio.get_running_loop()
+        self._loop.add_reader(conn.fileno(), self._on_readable)
+
+    def _on_readable(self) -> None:
+        try:
+            while self.conn.poll():
+                message = self.conn.recv()
+                if message[0] == "room":
+                    self.room.set()
+                else:
+                    self.queue.put_nowait(message)
+        except (EOFError, OSError):
+            # The other process is gone.
+            self._loop.remove_reader(self.conn.fileno())
+            self.queue.put_nowait(("error", EOFError("worker process exited")))
+        if self.on_message is not None:
+            self.on_message()
+
+    async def get(self) -> tuple:
+        return await self.queue.get()
+
+    def close(self) -> None:
+        try:
+            self._loop.remove_reader(self.conn.fileno())
+        except (OSError, RuntimeError, ValueError):
+            pass  # The loop or the pipe is already closed.
+
+
+class _PipeWriter:
+    """Write messages to conn from a thread, so a full pipe never blocks the loop.
+
+    Both processes send on their pipe while the other may be busy sending
+    too. Were either to block its event loop in Connection.send(), it would
+    stop reading, and once both pipes filled up neither could make room for
+    the other. Messages are pickled by send(), which raises if they can't
+    be, and at most maxsize of them wait to be written.
+    """
+
+    def __init__(
+        self, conn: Connection, lock: threading.Lock, maxsize: int = 64
+    ) -> None:
+        self.conn = conn
+        self.lock = lock  # held while writing a message, so writes don't interleave
+        self.ring_lock = asyncio.Lock()  # held by _send() from ring write to header
+        self.queue: asyncio.Queue = asyncio.Queue(maxsize)
+        self._error: Exception | None = None
+        self._task = asyncio.create_task(self._run())
+
+    async def send(self, message: tuple) -> None:
+        if self._error is not None:
+            raise self._error
+        await self.queue.put(ForkingPickler.dumps(message))
+
+    async def _run(self) -> None:
+        while True:
+            buffers = [await self.queue.get()]
+            while not self.queue.empty():
+                buffers.append(self.queue.get_nowait())
+            if self._error is None:
+                try:
+                    await asyncio.to_thread(self._write, buffers)
+                except OSError as e:
+                    self._error = e  # The other process is gone.
+            for _ in buffers:
+                self.queue.task_done()
+
+    def _write(self, buffers: list) -> None:
+        for buffer in buffers:
+            with self.lock:
+                self.conn.send_bytes(buffer)
+
+    async def flush(self) -> None:
+        """Wait until every message sent so far is written."""
+        await self.queue.join()
+
+    def close(self) -> None:
+        self._task.cancel()
+
+
+@dataclass
+class ProcessStage:
+    """A pipeline stage to host in its own worker process.
+
+    fn is called in the worker as fn(inputs, **kwargs) for each channel,
+    with the channel's writes as an AsyncIterator, and returns an
+    AsyncIterator of outputs, like the helpers do, e.g.,
+    partial(silero_vad_events, sample_rate=16000). models are loaded into
+    the worker's registry by System.load(). Both must be picklable.
+    """
+
+    fn: Callable[..., AsyncIterator]
+    models: list[ModelSpec] = field(default_factory=list)
+
+
+def _worker_main(
+    stage: ProcessStage, conn: Connection, in_name: str, out_name: str
+) -> None:
+    in_ring, out_ring = SharedRing(name=in_name), SharedRing(name=out_name)
+    try:
+        asyncio.run(_serve(stage, conn, in_ring, out_ring))
+    except KeyboardInterrupt:
+        pass
+    finally:
+        in_ring.close()
+        out_ring.close()
+
+
+async def _serve(
+    stage: ProcessStage, conn: Connection, in_ring: SharedRing, out_ring: SharedRing
+) -> None:
+    try:
+        await asyncio.to_thread(default_registry().warm_up, stage.models)
+    except Exception as e:
+        conn.send(("error", e))
+        return
+    conn.send(("ready",))
+    messages = _PipeReader(conn)
+    writer = _PipeWriter(conn, threading.Lock())
+    try:
+        await _serve_channels(stage, messages, writer, in_ring, out_ring)
+    finally:
+        await writer.flush()
+        writer.close()
+
+
+async def _serve_channels(
+    stage: ProcessStage,
+    messages: _PipeReader,
+    writer: _PipeWriter,
+    in_ring: SharedRing,
+    out_ring: SharedRing,
+) -> None:
+    stop = ("shutdown", "error")
+    while True:
+        message = await messages.get()
+        if message[0] in stop:
+            break
+        if message[0] != "open":
+            # Input written after the stage finished.
+            await _receive(message, in_ring, writer)
+            continue
+        end = None  # the message that ended the input
+
+        async def inputs() -> AsyncIterator:
+            nonlocal end
+            while end is None:
+                message = await messages.get()
+                if message[0] in ("close", *stop):
+                    end = message
+                else:
+                    yield await _receive(message, in_ring, writer)
+
+        try:
+            async for x in stage.fn(inputs(), **message[1]):
+                await _send(writer, out_ring, x, messages.room)
+        except Exception as e:
+            logger.exception("process stage failed")
+            try:
+                await writer.send(("error", e))
+            except Exception:  # e.g., an exception that can't be pickled
+                await writer.send(("error", RuntimeError(repr(e))))
+        await writer.send(("end",))
+        # Skip input the stage didn't read, up to the end of the stream.
+        async for _ in inputs():
+            pass
+        if end[0] in stop:
+            break
+
+
+class _Worker:
+    def __init__(
+        self, name: str, stage: ProcessStage, ring_capacity: int, context
+    ) -> None:
+        self.name = name
+        self.in_ring = SharedRing(ring_capacity)
+        self.out_ring = SharedRing(ring_capacity)
+        self.conn, child_conn = context.Pipe()
+        self.process = context.Process(
+            target=_worker_main,
+            args=(stage, child_conn, self.in_ring.name, self.out_ring.name),
+            name=f"iftk-{name}",
+            daemon=True,
+        )
+        self.process.start()
+        child_conn.close()
+        self.send_lock = threading.Lock()
+        self.reader: _PipeReader | None = None
+        self.writer: _PipeWriter | None = None
+        self.channel: "ProcessChannel | None" = None
+
+    def wait_ready(self) -> None:
+        message = self.conn.recv()
+        if message[0] == "error":
+            raise RuntimeError(f"stage {self.name!r} failed to load") from message[1]
+
+    def _notify(self) -> None:
+        if self.channel is not None and self.channel.notify_readable:
+            self.channel.notify_readable()
+
+    def close(self, timeout: float = 5.0) -> None:
+        if self.reader is not None:
+            self.reader.close()
+        if self.writer is not None:
+            self.writer.close()
+        if self.process.is_alive():
+            try:
+                with self.send_lock:
+                    self.conn.send(("shutdown",))
+            except OSError:
+                pass
+            self.process.join(timeout)
+            if self.process.is_alive():
+                self.process.kill()
+                self.process.join()
+        self.conn.close()
+        self.in_ring.close(unlink=True)
+        self.out_ring.close(unlink=True)
+
+
+class ProcessChannel(AsyncChannel):
+    """An AsyncChannel to a stage running in a worker process.
+
+    write() passes inputs to the stage and read() returns its outputs, or
+    None once the stage has finished after close(). AudioFrames and bytes
+    go through shared-memory rings; other values are pickled over a pipe.
+    An exception raised by the stage is raised by read().
+    """
+
+    def __init__(
+        self, worker: _Worker, notify_readable: Callable[[None], None] = None
+    ) -> None:
+        super().__init__(notify_readable)
+        self.worker = worker
+        self._ended = False
+
+    async def write(self, x: Any) -> None:
+        await super().write(x)
+        worker = self.worker
+        await _send(worker.writer, worker.in_ring, x, worker.reader.room)
+
+    async def read(self) -> Any | None:
+        while not self._ended:
+            message = await self.worker.reader.get()
+            kind = message[0]
+            if kind == "end":
+                self._end()
+            elif kind == "error":
+                if isinstance(message[1], EOFError):
+                    self._end()
+                raise message[1]
+            else:
+                return await _receive(message, self.worker.out_ring, self.worker.writer)
+        return None
+
+    def _end(self) -> None:
+        self._ended = True
+        if self.worker.channel is self:
+            self.worker.channel = None
+
+    async def close(self) -> None:
+        if not self._closed:
+            await self.worker.writer.send(("close",))
+        await super().close()
+
+
+class ProcessSystem(System):
+    """A System that runs each stage in its own worker process.
+
+    Stages run outside the main process's GIL, so VAD, ASR and an LLM don't
+    serialize their Python-side work. load() starts every worker and waits
+    until each has loaded its models, all in parallel.
+    create_async_channel(stage=name) then returns a ProcessChannel to that
+    stage's worker. A worker serves one channel at a time, and is reused by
+    the next channel once the stage has finished.
+
+    Workers are started with the "spawn" method by default, so stage
+    functions must be importable from the worker. Uses the event loop's
+    add_reader(), which needs a selector-based loop on Windows.
+    """
+
+    def __init__(
+        self,
+        stages: dict[str, ProcessStage],
+        ring_capacity: int = 1 << 22,
+        start_method: str = "spawn",
+        models: ModelRegistry | None = None,
+    ) -> None:
+        """
+        Args:
+            stages (dict[str, ProcessStage]): The stages, by name.
+            ring_capacity (int, optional): Bytes of audio in flight per direction and stage. Defaults to 4 MiB.
+            start_method (str, optional): The multiprocessing start method. Defaults to "spawn".
+            models (ModelRegistry, optional): The registry of the main process. Defaults to the process-wide registry.
+        """
+        super().__init__(models)
+        self.stages = stages
+        self.ring_capacity = ring_capacity
+        self.context = multiprocessing.get_context(start_method)
+        self.workers: dict[str, _Worker] = {}
+        self._load_lock = threading.Lock()
+
+    def load(self) -> None:
+        """Start the worker of every stage and wait until all have loaded their models."""
+        super().load()
+        with self._load_lock:
+            started = []
+            for name, stage in self.stages.items():
+                if name not in self.workers:
+                    worker = _Worker(name, stage, self.ring_capacity, self.context)
+                    started.append(worker)
+                    self.workers[name] = worker
+            for worker in started:
+                worker.wait_ready()
+
+    async def create_async_channel(
+        self,
+        notify_readable: Callable[[None], None] = None,
+        stage: str | None = None,
+        **kwargs,
+    ) -> ProcessChannel:
+        """Open a channel to stage, passing kwargs to its fn.
+
+        stage may be omitted if there is only one. The workers are started
+        with load(), on a thread, unless that was done already.
+        """
+        if stage is None:
+            if len(self.stages) != 1:
+                raise ValueError("stage must be given when there are several")
+            (stage,) = self.stages
+        if stage not in self.workers:
+            # Starting workers and loading their models takes a while.
+            await asyncio.to_thread(self.load)
+        worker = self.workers[stage]
+        if worker.channel is not None:
+            if not worker.channel._closed:
+                raise RuntimeError(f"stage {stage!r} already has an open channel")
+            # Discard what is left of the previous channel's output.
+            while await worker.channel.read() is not None:
+                pass
+        loop = asyncio.get_running_loop()
+        if worker.reader is None or worker.reader._loop is not loop:
+            if worker.reader is not None:
+                worker.reader.close()
+                worker.writer.close()
+            worker.reader = _PipeReader(worker.conn, worker._notify)
+            worker.writer = _PipeWriter(worker.conn, worker.send_lock)
+        channel = ProcessChannel(worker, notify_readable)
+        worker.channel = channel
+        await worker.writer.send(("open", kwargs))
+        return channel
+
+    def close(self) -> None:
+        """Stop all workers and free their shared memory."""
+        for worker in self.workers.values():
+            worker.close()
+        self.workers.clear()
@@ -5,17 +5,43 @@
 
 import asyncio
 import concurrent.futures
+import contextvars
 import logging
+import time
+from collections import deque
+from dataclasses import dataclass
+from enum import Enum
 from typing import Any, Callable
 
-from .channel import AsyncChannel, DequeChannel
+from . import tracing
+from .channel import AsyncChannel, Channel, DequeChannel
 
 logger = logging.getLogger(__name__)
 
 
+class OverflowPolicy(str, Enum):
+    """What a concurrent PubSub does when a subscriber's inbox is full.
+
+    - BLOCK: publish() waits until the subscriber has room
+    - DROP_OLDEST: discard the oldest queued event to make room
+    - DROP_NEWEST: discard the event being published
+    - COALESCE: discard the oldest queued event of the same type as the one
+      being published (falling back to DROP_OLDEST if there is none), so
+      only the latest of a stream of e.g. partial transcripts is kept
+    """
+
+    BLOCK = "block"
+    DROP_OLDEST = "drop_oldest"
+    DROP_NEWEST = "drop_newest"
+    COALESCE = "coalesce"
+
+
 class BaseSubscriber:
     publishes = None
     subscribes_to = None
+    # Per-subscriber overrides of the PubSub inbox defaults in concurrent mode.
+    inbox_size: int | None = None
+    overflow: OverflowPolicy | None = None
 
     async def on_event(self, event: Any) -> None:
         pass
@@ -24,21 +50,250 @@ class BaseSubscriber:
         pass
 
 
+@dataclass
+class InboxStats:
+    """Delivery counters for one subscriber of a concurrent PubSub.
+
+    busy is the time in seconds spent in on_event(), of which stalled is the
+    time spent waiting for room in other subscribers' full inboxes, i.e.,
+    held up by a slower stage downstream.
+    """
+
+    depth: int = 0
+    max_depth: int = 0
+    delivered: int = 0
+    dropped: int = 0
+    coalesced: int = 0
+    busy: float = 0.0
+    stalled: float = 0.0
+
+
+# The stats of the inbox whose worker is delivering, to charge it for the
+# time its subscriber waits on full inboxes.
+_delivering: contextvars.ContextVar[InboxStats | None] = contextvars.ContextVar(
+    "_delivering", default=None
+)
+
+
+class _Traced:
+    """An event queued while tracing, with the turn it belongs to."""
+
+    __slots__ = ("event", "turn")
+
+    def __init__(self, event: Any, turn: Any) -> None:
+        self.event = event
+        self.turn = turn
+
+
+async def _deliver_traced(
+    subscriber: BaseSubscriber, event: Any, tracer: tracing.Tracer
+) -> None:
+    start = time.monotonic()
+    try:
+        await subscriber.on_event(event)
+    finally:
+        tracer.span(type(subscriber).__name__, start, time.monotonic())
+
+
+class _Inbox:
+    """A bounded FIFO of events drained by a single worker task.
+
+    One worker per subscriber keeps delivery to that subscriber in publish
+    order while letting different subscribers run concurrently.
+    """
+
+    def __init__(
+        self,
+        subscriber: BaseSubscriber,
+        maxsize: int,
+        overflow: OverflowPolicy,
+        loop: asyncio.AbstractEventLoop,
+    ) -> None:
+        self.subscriber = subscriber
+        self.maxsize = maxsize
+        self.overflow = OverflowPolicy(overflow)
+        self.loop = loop
+        self.stats = InboxStats()
+        self._events: deque = deque()
+        self._nonempty = asyncio.Event()
+        self._nonfull = asyncio.Event()
+        self._idle = asyncio.Event()
+        self._idle.set()
+        self._task: asyncio.Task | None = None
+
+    async def put(self, event: Any) -> None:
+        events = self._events
+        if len(events) >= self.maxsize:
+            if self.overflow is OverflowPolicy.BLOCK:
+                start = time.monotonic()
+                while len(events) >= self.maxsize:
+                    self._nonfull.clear()
+                    await self._nonfull.wait()
+                publisher = _delivering.get()
+                if publisher is not None:
+                    publisher.stalled += time.monotonic() - start
+            elif self.overflow is OverflowPolicy.DROP_NEWEST:
+                self.stats.dropped += 1
+                return
+            elif self.overflow is OverflowPolicy.COALESCE and self._coalesce(event):
+                self.stats.coalesced += 1
+            else:
+                events.popleft()
+                self.stats.dropped += 1
+        events.append(event)
+        self.stats.depth = len(events)
+        if self.stats.depth > self.stats.max_depth:
+            self.stats.max_depth = self.stats.depth
+        self._idle.clear()
+        self._nonempty.set()
+        if self._task is None:
+            self._task = self.loop.create_task(self._run())
+
+    def _coalesce(self, event: Any) -> bool:
+        event_type = type(event.event if type(event) is _Traced else event)
+        for i, queued in enumerate(self._events):
+            if type(queued.event if type(queued) is _Traced else queued) is event_type:
+                del self._events[i]
+                return True
+        return False
+
+    async def _run(self) -> None:
+        events = self._events
+        stats = self.stats
+        _delivering.set(stats)
+        while True:
+            while not events:
+                self._idle.set()
+                self._nonempty.clear()
+                await self._nonempty.wait()
+            event = events.popleft()
+            stats.depth = len(events)
+            self._nonfull.set()
+            start = time.monotonic()
+            try:
+                if type(event) is _Traced:
+                    await self._deliver_traced(event)
+                else:
+                    await self.subscriber.on_event(event)
+            except Exception:
+                logger.exception(f"on_event() failed in {type(self.subscriber)}")
+            stats.busy += time.monotonic() - start
+            stats.delivered += 1
+
+    async def _deliver_traced(self, traced: _Traced) -> None:
+        # The worker task outlives turns, so take the turn from the event.
+        token = tracing.current_turn.set(traced.turn)
+        try:
+            tracer = tracing.get_tracer()
+            if tracer is None:
+                await self.subscriber.on_event(traced.event)
+            else:
+                await _deliver_traced(self.subscriber, traced.event, tracer)
+        finally:
+            tracing.current_turn.reset(token)
+
+    @property
+    def idle(self) -> bool:
+        return self._idle.is_set()
+
+    async def join(self) -> None:
+        await self._idle.wait()
+
+    async def close(self) -> None:
+        if self._task is not None:
+            self._task.cancel()
+            try:
+                await self._task
+            except asyncio.CancelledError:
+                pass
+            self._task = None
+
+
 class PubSub:
-    def __init__(self, loop: asyncio.AbstractEventLoop = None) -> None:
+    """An event bus delivering each published event to interested subscribers.
+
+    By default publish() awaits each subscriber's on_event() in turn. With
+    concurrent=True, every subscriber instead gets its own bounded inbox and
+    worker task, and publish() returns once the event is enqueued, so a slow
+    subscriber cannot hold up the others. Events still reach any one
+    subscriber in publish order. inbox_size and overflow set the defaults for
+    all subscribers, and a subscriber may override them with the attributes
+    of the same name.
+
+    While tracing is enabled (see iftk.tracing), every event and each
+    subscriber's on_event() are recorded with the current turn, which
+    subscribers in concurrent mode see as their own.
+    """
+
+    def __init__(
+        self,
+        loop: asyncio.AbstractEventLoop = None,
+        concurrent: bool = False,
+        inbox_size: int = 64,
+        overflow: OverflowPolicy = OverflowPolicy.BLOCK,
+    ) -> None:
         self.loop = loop if loop is not None else asyncio.get_running_loop()
         self.subscribers: list[BaseSubscriber] = []
+        self.concurrent = concurrent
+        self.inbox_size = inbox_size
+        self.overflow = OverflowPolicy(overflow)
+        # Concrete event type -> subscribers interested in it, in subscription
+        # order. Filled lazily by _resolve() and cleared by subscribe().
+        self._dispatch: dict[type, tuple[BaseSubscriber, ...]] = {}
+        self._inboxes: dict[int, _Inbox] = {}
 
     def subscribe(self, subscriber: BaseSubscriber) -> None:
         self.subscribers.append(subscriber)
+        self._dispatch.clear()
+        if self.concurrent:
+            inbox_size = getattr(subscriber, "inbox_size", None)
+            overflow = getattr(subscriber, "overflow", None)
+            self._inboxes[id(subscriber)] = _Inbox(
+                subscriber,
+                inbox_size if inbox_size is not None else self.inbox_size,
+                overflow if overflow is not None else self.overflow,
+                self.loop,
+            )
 
-    async def publish(self, event) -> None:
-        # logger.debug(f"publishing {event} to {len(self._subscribers)} subscribers")
+    def _resolve(self, event_type: type) -> tuple[BaseSubscriber, ...]:
+        """Compute (and cache) the subscribers that receive events of event_type."""
+        matched = []
         for subscriber in self.subscribers:
             subscribes_to = getattr(subscriber, "subscribes_to", None)
-            if subscribes_to is None or isinstance(event, subscribes_to):
+            if subscribes_to is None or issubclass(event_type, subscribes_to):
+                matched.append(subscriber)
+        matched = tuple(matched)
+        self._dispatch[event_type] = matched
+        return matched
+
+    async def publish(self, event) -> None:
+        # logger.debug(f"publishing {event} to {len(self._subscribers)} subscribers")
+        subscribers = self._dispatch.get(type(event))
+        if subscribers is None:
+            subscribers = self._resolve(type(event))
+        tracer = tracing._active
+        if tracer is not None:
+            tracer.on_event(event)
+            await self._publish_traced(event, subscribers, tracer)
+        elif self.concurrent:
+            inboxes = self._inboxes
+            for subscriber in subscribers:
+                await inboxes[id(subscriber)].put(event)
+        else:
+            for subscriber in subscribers:
                 await subscriber.on_event(event)
 
+    async def _publish_traced(
+        self, event, subscribers: tuple[BaseSubscriber, ...], tracer: tracing.Tracer
+    ) -> None:
+        if self.concurrent:
+            traced = _Traced(event, tracing.current_turn.get())
+            for subscriber in subscribers:
+                await self._inboxes[id(subscriber)].put(traced)
+        else:
+            for subscriber in subscribers:
+                await _deliver_traced(subscriber, event, tracer)
+
     def publish_threadsafe(self, event) -> concurrent.futures.Future:
         """Run publish() on the event loop this instance was created on. Thread-safe.
 
@@ -48,7 +303,33 @@ class PubSub:
         """
         return asyncio.run_coroutine_threadsafe(self.publish(event), self.loop)
 
+    def inbox_stats(self) -> dict[BaseSubscriber, InboxStats]:
+        """Return delivery counters, including queue depth and busy time, per subscriber.
+
+        Only populated in concurrent mode.
+        """
+        return {inbox.subscriber: inbox.stats for inbox in self._inboxes.values()}
+
+    @property
+    def idle(self) -> bool:
+        """Whether every subscriber has handled all events published so far."""
+        return all(inbox.idle for inbox in self._inboxes.values())
+
+    async def drain(self) -> None:
+        """Wait until every subscriber has handled all events published so far."""
+        # Subscribers may publish while handling an event, so repeat until no
+        # inbox has work left.
+        while True:
+            busy = [inbox for inbox in self._inboxes.values() if not inbox.idle]
+            if not busy:
+                return
+            for inbox in busy:
+                await inbox.join()
+
     async def shutdown(self):
+        await self.drain()
+        for inbox in self._inboxes.values():
+            await inbox.close()
         for subscriber in self.subscribers:
             await subscriber.shutdown()
 
@@ -75,21 +356,52 @@ class Subscriber(BaseSubscriber):
 
 
 class PubSubChannel(AsyncChannel):
+    """Fit a PubSub to the Channel interface.
+
+    write() publishes to the bus, and events on the bus matching subscribes_to
+    (all events by default, including the ones written here) are buffered for
+    read(). Pass a bounded AsyncChannel such as RingChannel as output_channel
+    to make read() wait for events and to apply backpressure to the bus when
+    the reader falls behind; the default DequeChannel never blocks.
+    """
+
     def __init__(
         self,
         pubsub: PubSub,
         notify_readable: Callable[[None], None] = None,
+        output_channel: Channel | None = None,
+        subscribes_to: type | tuple[type, ...] | None = None,
     ):
         super().__init__()
-        self.output_channel = DequeChannel(notify_readable)
+        if output_channel is None:
+            output_channel = DequeChannel(notify_readable)
+        elif notify_readable is not None:
+            output_channel.notify_readable = notify_readable
+        self.output_channel = output_channel
+        self.subscribes_to = subscribes_to
         self.pubsub: PubSub = pubsub
         pubsub.subscribe(self)
 
+    async def on_event(self, event: Any) -> None:
+        if isinstance(self.output_channel, AsyncChannel):
+            await self.output_channel.write(event)
+        else:
+            self.output_channel.write(event)
+
+    async def shutdown(self) -> None:
+        pass
+
     async def close(self) -> None:
         await super().close()
         await self.pubsub.shutdown()
+        if isinstance(self.output_channel, AsyncChannel):
+            await self.output_channel.close()
+        else:
+            self.output_channel.close()
 
     async def read(self) -> Any | None:
+        if isinstance(self.output_channel, AsyncChannel):
+            return await self.output_channel.read()
         return self.output_channel.read()
 
     async def write(self, event: Any) -> None:
@@ -0,0 +1,286 @@
+# Copyright (c) Meta Platforms, Inc. and affiliates.
+#
+# This source code is licensed under the MIT license found in the
+# LICENSE file in the root directory of this source tree.
+
+import asyncio
+import logging
+import mmap
+import os
+import pickle
+import struct
+import time
+from collections import Counter
+from collections.abc import Iterator
+from dataclasses import dataclass, is_dataclass, replace
+from typing import Any, NamedTuple
+
+from .audio import AudioFrame
+from .pubsub import BaseSubscriber, PubSub
+
+logger = logging.getLogger(__name__)
+
+# Event log: a header, then one record per event, each a fixed-size head
+# followed by its payload.
+_MAGIC = b"IFTKLOG1"
+# magic, and time.time() and time.monotonic() at the start of the recording
+_HEADER = struct.Struct("<8sdd")
+_RECORD = struct.Struct("<BdI")  # kind, seconds since the start, payload size
+# Audio payload: offset and size in the PCM file, sample rate, channels and
+# capture time relative to the start, followed by the dtype name.
+_AUDIO = struct.Struct("<QIIHd")
+_PICKLED, _AUDIO_FRAME = 0, 1
+
+
+def pcm_path(path: str) -> str:
+    """Where the raw PCM of the event log at path is kept."""
+    return path + ".pcm"
+
+
+class EventRecorder(BaseSubscriber):
+    """Append every event on a PubSub to a binary log, for replay with replay().
+
+    Each event is written with the time it reached the recorder. AudioFrame
+    samples go, as raw PCM aligned to 8 bytes, to a separate file
+    (see pcm_path()), which EventLog memory-maps so replayed frames are views
+    of it rather than copies. Other events are pickled into the log itself;
+    events that can't be pickled are counted in skipped and left out.
+
+    Both files are only ever appended to and are flushed by flush() and
+    close(), so a recording cut short by a crash is readable up to its last
+    complete record. Only replay logs you trust, as unpickling runs code.
+    """
+
+    def __init__(
+        self,
+        pubsub: PubSub,
+        path: str,
+        subscribes_to: type | tuple[type, ...] | None = None,
+        buffer_size: int = 1 << 20,
+    ) -> None:
+        """
+        Args:
+            pubsub (PubSub): The bus to record.
+            path (str): Where to write the event log. The audio goes to pcm_path(path).
+            subscribes_to (type | tuple[type, ...], optional): The events to record. Defaults to all.
+            buffer_size (int, optional): Bytes buffered per file between writes to disk. Defaults to 1MB.
+        """
+        self.path = path
+        self.subscribes_to = subscribes_to
+        # events recorded, by type name
+        self.recorded: Counter = Counter()
+        # events that couldn't be pickled, by type name
+        self.skipped: Counter = Counter()
+        self._start = time.monotonic()
+        self._log = open(path, "wb", buffering=buffer_size)
+        self._pcm = open(pcm_path(path), "wb", buffering=buffer_size)
+        self._pcm_size = 0
+        self._log.write(_HEADER.pack(_MAGIC, time.time(), self._start))
+        pubsub.subscribe(self)
+
+    async def on_event(self, event: Any) -> None:
+        if self._log.closed:
+            return
+        now = time.monotonic() - self._start
+        if isinstance(event, AudioFrame):
+            payload = self._write_audio(event)
+            kind = _AUDIO_FRAME
+        else:
+            try:
+                payload = pickle.dumps(event, protocol=pickle.HIGHEST_PROTOCOL)
+            except Exception:
+                name = type(event).__name__
+                if not self.skipped[name]:
+                    logger.warning(f"can't record {name} events; skipping them")
+                self.skipped[name] += 1
+                return
+            kind = _PICKLED
+        self._log.write(_RECORD.pack(kind, now, len(payload)))
+        self._log.write(payload)
+        self.recorded[type(event).__name__] += 1
+
+    def _write_audio(self, frame: AudioFrame) -> bytes:
+        data = memoryview(frame.data).cast("B")
+        padding = -self._pcm_size % 8
+        if padding:
+            self._pcm.write(bytes(padding))
+            self._pcm_size += padding
+        offset = self._pcm_size
+        self._pcm.write(data)
+        self._pcm_size += data.nbytes
+        audio = _AUDIO.pack(
+            offset,
+            data.nbytes,
+            frame.sample_rate,
+            frame.channels,
+            frame.timestamp - self._start,
+        )
+        return audio + frame.dtype.encode()
+
+    def flush(self) -> None:
+        """Write everything recorded so far to disk (the OS's cache, at least)."""
+        if not self._log.closed:
+            self._pcm.flush()
+            self._log.flush()
+
+    def close(self) -> None:
+        if not self._log.closed:
+            # Audio first, so every frame in the log has its samples.
+            self._pcm.close()
+            self._log.close()
+
+    async def shutdown(self) -> None:
+        self.close()
+
+
+class LogRecord(NamedTuple):
+    """An event from an EventLog and the seconds since the start of the recording it arrived at."""
+
+    time: float
+    event: Any
+
+
+class EventLog:
+    """Read an event log written by EventRecorder.
+
+    Both files are memory-mapped, and records are parsed as they are
+    iterated, so a long recording isn't read into memory up front. The
+    AudioFrames read back are views of the PCM file, so they are only valid
+    while the log is open. All times, including the timestamp attributes of
+    events such as AudioFrame and SpeechEvent, are in seconds since the
+    start of the recording.
+    """
+
+    def __init__(self, path: str) -> None:
+        self.path = path
+        if os.path.getsize(path) < _HEADER.size:
+            raise ValueError(f"{path} is not an event log")
+        with open(path, "rb") as f:
+            self._log = mmap.mmap(f.fileno(), 0, access=mmap.ACCESS_READ)
+        magic, self.wall_time, self._start = _HEADER.unpack_from(self._log)
+        if magic != _MAGIC:
+            self._log.close()
+            raise ValueError(f"{path} is not an event log")
+        self._pcm: mmap.mmap | None = None
+        pcm = pcm_path(path)
+        if os.path.exists(pcm) and os.path.getsize(pcm):
+            with open(pcm, "rb") as f:
+                self._pcm = mmap.mmap(f.fileno(), 0, access=mmap.ACCESS_READ)
+
+    def __iter__(self) -> Iterator[LogRecord]:
+        # Records are read from the log by slicing, which copies, so that no
+        # view keeps it from being unmapped on close().
+        log, offset = self._log, _HEADER.size
+        pcm = memoryview(self._pcm) if self._pcm is not None else memoryview(b"")
+        while offset + _RECORD.size <= len(log):
+            kind, at, size = _RECORD.unpack_from(log, offset)
+            offset += _RECORD.size
+            end = offset + size
+            if end > len(log):
+                break  # cut short while it was being written
+            if kind == _AUDIO_FRAME:
+                start, nbytes, sample_rate, channels, timestamp = _AUDIO.unpack_from(
+                    log, offset
+                )
+                if start + nbytes > len(pcm):
+                    break
+                dtype = log[offset + _AUDIO.size : end].decode()
+                event = AudioFrame(
+                    pcm[start : start + nbytes], sample_rate, channels, dtype, timestamp
+                )
+            else:
+                event = pickle.loads(log[offset:end])
+                timestamp = getattr(event, "timestamp", None)
+                if isinstance(timestamp, float):
+                    event = _with_timestamp(event, timestamp - self._start)
+            offset = end
+            yield LogRecord(at, event)
+
+    def close(self) -> None:
+        self._log.close()
+        if self._pcm is not None:
+            try:
+                self._pcm.close()
+            except BufferError:
+                pass  # Frames still refer to it; it's unmapped once they are gone.
+            self._pcm = None
+
+    def __enter__(self) -> "EventLog":
+        return self
+
+    def __exit__(self, *exc) -> None:
+        self.close()
+
+
+def _with_timestamp(event: Any, timestamp: float) -> Any:
+    """event with the given timestamp, copying dataclasses, which may be frozen."""
+    if is_dataclass(event):
+        return replace(event, timestamp=timestamp)
+    event.timestamp = timestamp
+    return event
+
+
+@dataclass
+class ReplayStats:
+    """What replay() published, and how far behind the recording's timing it fell.
+
+    max_lag is the most an event was published after its time in the
+    recording, in seconds, once scaled by speed.
+    """
+
+    events: int = 0
+    duration: float = 0.0
+    max_lag: float = 0.0
+
+
+async def replay(
+    log: EventLog | str,
+    pubsub: PubSub,
+    speed: float | None = 1.0,
+    only: type | tuple[type, ...] | None = None,
+) -> ReplayStats:
+    """Publish the events of a recording to pubsub, keeping their timing.
+
+    The timestamp attributes of AudioFrame and of events such as
+    SpeechEvent are moved to the replay's clock, so that latencies measured
+    from capture time stay meaningful in real time.
+
+    Args:
+        log (EventLog | str): The recording, or the path of its event log.
+        pubsub (PubSub): Where to publish, e.g., the fresh bus of a pipeline under test.
+        speed (float | None, optional): 1.0 is real time, 2.0 twice as fast, and None as fast as
+                                        possible. Defaults to 1.0.
+        only (type | tuple[type, ...], optional): Replay only these events, e.g., AudioFrame to feed a
+                                                  pipeline the recorded audio. Defaults to all.
+
+    Returns:
+        ReplayStats: How many events were published and how late.
+    """
+    owned = isinstance(log, str)
+    if owned:
+        log = EventLog(log)
+    stats = ReplayStats()
+    start = time.monotonic()
+    try:
+        for at, event in log:
+            if only is not None and not isinstance(event, only):
+                continue
+            if speed is None:
+                due = time.monotonic()
+            else:
+                due = start + at / speed
+                delay = due - time.monotonic()
+                if delay > 0:
+                    await asyncio.sleep(delay)
+                stats.max_lag = max(stats.max_lag, time.monotonic() - due)
+            timestamp = getattr(event, "timestamp", None)
+            if isinstance(timestamp, float):
+                # Keep the capture delay the event had when it was recorded.
+                event = _with_timestamp(event, due - (at - timestamp) / (speed or 1.0))
+            await pubsub.publish(event)
+            stats.events += 1
+    finally:
+        if owned:
+            log.close()
+    stats.duration = time.monotonic() - start
+    return stats
@@ -0,0 +1,158 @@
+# Copyright (c) Meta Platforms, Inc. and affiliates.
+#
+# This source code is licensed under the MIT license found in the
+# LICENSE file in the root directory of this source tree.
+
+import asyncio
+import concurrent.futures
+import logging
+import threading
+from collections import OrderedDict
+from collections.abc import Iterable
+from dataclasses import dataclass, field
+from typing import Any, Callable
+
+logger = logging.getLogger(__name__)
+
+
+@dataclass(frozen=True)
+class ModelSpec:
+    """How to load a model, and the key it is shared under.
+
+    Two specs with the same model_id, quantization and device refer to the
+    same loaded model; loader is only called for the first of them.
+    """
+
+    model_id: str
+    loader: Callable[[], Any] = field(compare=False, repr=False)
+    quantization: str | None = None
+    device: str | None = None
+
+    @property
+    def key(self) -> tuple:
+        return (self.model_id, self.quantization, self.device)
+
+
+def estimate_size(model: Any) -> int:
+    """Best-effort size in bytes of a loaded model (or tuple of models)."""
+    if isinstance(model, (tuple, list)):
+        return sum(estimate_size(m) for m in model)
+    get_memory_footprint = getattr(model, "get_memory_footprint", None)
+    if callable(get_memory_footprint):
+        return get_memory_footprint()
+    parameters = getattr(model, "parameters", None)
+    if callable(parameters):
+        size = sum(p.numel() * p.element_size() for p in parameters())
+        buffers = getattr(model, "buffers", None)
+        if callable(buffers):
+            size += sum(b.numel() * b.element_size() for b in buffers())
+        return size
+    return 0
+
+
+class ModelRegistry:
+    """Load each model once per process and share it between helpers.
+
+    Models are looked up by ModelSpec.key. Concurrent requests for a model
+    that is not loaded yet, whether from threads or coroutines, wait for a
+    single load. When memory_budget (in bytes, as measured by size_of) is set,
+    the least recently acquired models are dropped from the registry to stay
+    within it. Callers still holding an evicted model keep it alive until they
+    release it.
+    """
+
+    def __init__(
+        self,
+        memory_budget: int | None = None,
+        size_of: Callable[[Any], int] = estimate_size,
+    ) -> None:
+        self.memory_budget = memory_budget
+        self.size_of = size_of
+        self._models: OrderedDict[tuple, tuple[Any, int]] = OrderedDict()
+        self._loading: dict[tuple, threading.Lock] = {}
+        self._lock = threading.Lock()
+
+    def __contains__(self, spec: ModelSpec) -> bool:
+        return spec.key in self._models
+
+    def __len__(self) -> int:
+        return len(self._models)
+
+    @property
+    def memory_usage(self) -> int:
+        return sum(size for _, size in self._models.values())
+
+    def _lookup(self, key: tuple) -> Any | None:
+        with self._lock:
+            entry = self._models.get(key)
+            if entry is None:
+                return None
+            self._models.move_to_end(key)
+            return entry[0]
+
+    def get(self, spec: ModelSpec) -> Any:
+        """Return the model for spec, loading it on this thread if needed."""
+        model = self._lookup(spec.key)
+        if model is not None:
+            return model
+        with self._lock:
+            key_lock = self._loading.setdefault(spec.key, threading.Lock())
+        with key_lock:
+            # Another thread may have finished loading while we waited.
+            model = self._lookup(spec.key)
+            if model is not None:
+                return model
+            logger.info(f"loading model {spec.key}")
+            model = spec.loader()
+            size = self.size_of(model)
+            with self._lock:
+                self._models[spec.key] = (model, size)
+                self._loading.pop(spec.key, None)
+                self._evict(keep=spec.key)
+        return model
+
+    async def acquire(self, spec: ModelSpec) -> Any:
+        """Return the model for spec, loading it on a worker thread if needed."""
+        model = self._lookup(spec.key)
+        if model is not None:
+            return model
+        return await asyncio.to_thread(self.get, spec)
+
+    def warm_up(
+        self, specs: Iterable[ModelSpec], max_workers: int | None = None
+    ) -> None:
+        """Load several models in parallel, e.g., from System.load()."""
+        with concurrent.futures.ThreadPoolExecutor(max_workers) as executor:
+            for future in [executor.submit(self.get, spec) for spec in specs]:
+                future.result()
+
+    def evict(self, spec: ModelSpec) -> bool:
+        """Drop the model for spec from the registry. Return whether it was loaded."""
+        with self._lock:
+            return self._models.pop(spec.key, None) is not None
+
+    def _evict(self, keep: tuple) -> None:
+        if self.memory_budget is None:
+            return
+        usage = self.memory_usage
+        for key in list(self._models):
+            if usage <= self.memory_budget:
+                break
+            if key == keep:
+                continue
+            _, size = self._models.pop(key)
+            usage -= size
+            logger.info(f"evicted model {key} to fit memory budget")
+
+
+_default_registry: ModelRegistry | None = None
+_default_registry_lock = threading.Lock()
+
+
+def default_registry() -> ModelRegistry:
+    """The process-wide registry used by helpers when none is given."""
+    global _default_registry
+    with _default_registry_lock:
+        if _default_registry is None:
+            _default_registry = ModelRegistry()
+        return _default_registry
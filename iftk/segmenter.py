@@ -0,0 +1,183 @@
+# Copyright (c) Meta Platforms, Inc. and affiliates.
+#
+# This source code is licensed under the MIT license found in the
+# LICENSE file in the root directory of this source tree.
+
+from collections.abc import AsyncIterator
+from enum import Enum
+
+TERMINATORS = ".?!…"
+CLAUSE_PUNCTUATION = ",;:"
+# Characters that may trail a terminator and belong to the same sentence.
+CLOSERS = "\"')]}”’"
+
+DEFAULT_ABBREVIATIONS = frozenset(
+    [
+        "dr",
+        "mr",
+        "mrs",
+        "ms",
+        "prof",
+        "sr",
+        "jr",
+        "st",
+        "vs",
+        "etc",
+        "e.g",
+        "i.e",
+        "inc",
+        "ltd",
+        "no",
+        "approx",
+        "fig",
+    ]
+)
+
+
+class SegmentPolicy(str, Enum):
+    """Where a Segmenter splits text.
+
+    - SENTENCE: at sentence ends (., ?, !, …) and newlines
+    - CLAUSE: additionally at , ; and : once the clause has min_clause_words
+    - FIRST_CHUNK: like SENTENCE, but the first segment is emitted as soon as
+      it has first_chunk_words words, to start speech synthesis early
+    """
+
+    SENTENCE = "sentence"
+    CLAUSE = "clause"
+    FIRST_CHUNK = "first_chunk"
+
+
+class Segmenter:
+    """Split incrementally arriving text (e.g., LLM tokens) into speakable segments.
+
+    Call push() with each piece of text to get the segments it completes, and
+    flush() at the end of the stream for whatever is left. A period only ends
+    a sentence when followed by whitespace and not part of a decimal number
+    ("3.5"), an abbreviation ("Dr.") or an initial ("J."), so a terminator at
+    the very end of the pushed text is held until the next piece arrives.
+
+    Pieces without punctuation or newlines are only appended to a list, so the
+    cost per piece does not grow with the length of the pending segment.
+    """
+
+    def __init__(
+        self,
+        policy: SegmentPolicy = SegmentPolicy.SENTENCE,
+        first_chunk_words: int = 4,
+        min_clause_words: int = 3,
+        abbreviations: frozenset[str] = DEFAULT_ABBREVIATIONS,
+    ) -> None:
+        self.policy = SegmentPolicy(policy)
+        self.first_chunk_words = first_chunk_words
+        self.min_clause_words = min_clause_words
+        self.abbreviations = abbreviations
+        self._triggers = TERMINATORS + "\n"
+        if self.policy is SegmentPolicy.CLAUSE:
+            self._triggers += CLAUSE_PUNCTUATION
+        self._parts: list[str] = []
+        self._scan_from = 0  # offset in the pending text where scanning resumes
+        self._undecided = False  # pending text ends in a possible boundary
+        self._first = self.policy is SegmentPolicy.FIRST_CHUNK
+
+    def push(self, text: str) -> list[str]:
+        """Add text, returning the segments it completes."""
+        self._parts.append(text)
+        if not (
+            self._undecided or self._first or any(c in self._triggers for c in text)
+        ):
+            return []
+        return self._scan()
+
+    def flush(self) -> list[str]:
+        """Return the remaining text as a final segment, if there is any."""
+        text = "".join(self._parts).strip()
+        self._parts = []
+        self._scan_from = 0
+        self._undecided = False
+        return [text] if text else []
+
+    def _scan(self) -> list[str]:
+        text = "".join(self._parts)
+        segments = []
+        start = 0
+        i = self._scan_from
+        self._undecided = False
+        n = len(text)
+        while i < n:
+            c = text[i]
+            end = None
+            if c == "\n":
+                end = i + 1
+            elif c in TERMINATORS or (
+                c in CLAUSE_PUNCTUATION and self.policy is SegmentPolicy.CLAUSE
+            ):
+                j = i + 1
+                while j < n and (text[j] in TERMINATORS or text[j] in CLOSERS):
+                    j += 1
+                if j == n:
+                    # Can't tell "3." from "3.5" yet.
+                    self._undecided = True
+                    break
+                if text[j].isspace() and self._is_boundary(text, start, i):
+                    end = j
+                i = j - 1
+            elif self._first and c.isspace():
+                if len(text[start:i].split()) >= self.first_chunk_words:
+                    end = i
+            if end is not None:
+                segment = text[start:end].strip()
+                if segment:
+                    segments.append(segment)
+                    self._first = False
+                start = end
+            i += 1
+        rest = text[start:]
+        self._parts = [rest] if rest else []
+        self._scan_from = i - start
+        return segments
+
+    def _is_boundary(self, text: str, start: int, i: int) -> bool:
+        """Whether the punctuation at text[i] ends the segment starting at start."""
+        c = text[i]
+        segment = text[start:i]
+        if c in CLAUSE_PUNCTUATION:
+            return len(segment.split()) >= self.min_clause_words
+        if c != ".":
+            return True
+        word_start = max(segment.rfind(" "), segment.rfind("\n")) + 1
+        word = segment[word_start:].lstrip("\"'([{“‘")
+        if word.lower() in self.abbreviations:
+            return False
+        if len(word) == 1 and word.isupper():  # an initial, as in "J. Smith"
+            return False
+        letters = word.split(".")
+        if len(letters) > 1 and all(len(x) == 1 and x.isalpha() for x in letters):
+            return False  # an acronym, as in "U.S."
+        if word.isdigit() and not segment[:word_start].strip():
+            return False  # a list item, as in "1. First"
+        return True
+
+
+async def segment_stream(
+    tokens: AsyncIterator[str],
+    policy: SegmentPolicy = SegmentPolicy.SENTENCE,
+    **kwargs,
+) -> AsyncIterator[str]:
+    """Segment an AsyncIterator of text pieces, e.g., LLM tokens, into speakable segments.
+
+    Args:
+        tokens (AsyncIterator[str]): Pieces of text, such as transformer_stream output or groq deltas.
+        policy (SegmentPolicy, optional): Where to split. Defaults to SegmentPolicy.SENTENCE.
+        **kwargs: Other Segmenter options.
+
+    Yields:
+        str: A segment of text, stripped of surrounding whitespace.
+    """
+    segmenter = Segmenter(policy, **kwargs)
+    async for token in tokens:
+        if token:
+            for segment in segmenter.push(token):
+                yield segment
+    for segment in segmenter.flush():
+        yield segment
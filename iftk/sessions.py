@@ -0,0 +1,372 @@
+# Copyright (c) Meta Platforms, Inc. and affiliates.
+#
+# This source code is licensed under the MIT license found in the
+# LICENSE file in the root directory of this source tree.
+
+import asyncio
+import contextvars
+import inspect
+import logging
+import threading
+import time
+import uuid
+from collections import Counter, OrderedDict, deque
+from collections.abc import Hashable
+from concurrent.futures import Executor, Future
+from dataclasses import dataclass
+from typing import Any, Awaitable, Callable
+
+from .channel import AsyncChannel, ChannelClosedEvent, RingChannel
+from .pubsub import OverflowPolicy, PubSub, PubSubChannel
+from .registry import ModelRegistry
+from .system import System
+
+logger = logging.getLogger(__name__)
+
+# The id of the session whose event is being handled. Set while a Session
+# publishes, and inherited by the tasks and executor calls that follow.
+current_session: contextvars.ContextVar[Hashable | None] = contextvars.ContextVar(
+    "current_session", default=None
+)
+
+
+class SessionLimitError(RuntimeError):
+    """Raised when a SessionManager has no room for another session."""
+
+
+class FairExecutor(Executor):
+    """A thread pool that takes turns between sessions.
+
+    A ThreadPoolExecutor runs calls in submission order, so a session that
+    queues a burst of work (a long reply to synthesize, say) delays every
+    other session behind it. FairExecutor keeps a queue per session, keyed by
+    current_session at submit time, and its threads take one call from each
+    waiting session in turn. Fairness is per call, so it works best with many
+    short calls, e.g., one per chunk or per batch.
+
+    Share one instance per model across sessions, e.g.,
+    XttsSynthesizer(..., executor=fair) or run_in_executor(fair, fn).
+    """
+
+    def __init__(self, max_workers: int = 1, name: str = "fair") -> None:
+        self._queues: OrderedDict[Hashable | None, deque] = OrderedDict()
+        self._cond = threading.Condition()
+        self._shutdown = False
+        self.completed: Counter = Counter()  # calls run, per session
+        self._threads = [
+            threading.Thread(target=self._work, name=f"iftk-{name}_{i}", daemon=True)
+            for i in range(max_workers)
+        ]
+        for thread in self._threads:
+            thread.start()
+
+    def submit(self, fn: Callable, /, *args, **kwargs) -> Future:
+        future = Future()
+        key = current_session.get()
+        with self._cond:
+            if self._shutdown:
+                raise RuntimeError("cannot schedule new futures after shutdown")
+            queue = self._queues.get(key)
+            if queue is None:
+                queue = self._queues[key] = deque()
+            queue.append((future, fn, args, kwargs))
+            self._cond.notify()
+        return future
+
+    def pending(self) -> dict[Hashable | None, int]:
+        """The number of queued calls, per session."""
+        with self._cond:
+            return {key: len(queue) for key, queue in self._queues.items()}
+
+    def _next(self) -> tuple | None:
+        with self._cond:
+            while not self._queues:
+                if self._shutdown:
+                    return None
+                self._cond.wait()
+            key, queue = self._queues.popitem(last=False)
+            item = queue.popleft()
+            if queue:
+                self._queues[key] = queue  # back of the line
+            return key, item
+
+    def _work(self) -> None:
+        while (work := self._next()) is not None:
+            key, (future, fn, args, kwargs) = work
+            if not future.set_running_or_notify_cancel():
+                continue
+            try:
+                result = fn(*args, **kwargs)
+            except BaseException as e:
+                future.set_exception(e)
+            else:
+                future.set_result(result)
+            with self._cond:
+                self.completed[key] += 1
+
+    def shutdown(self, wait: bool = True, *, cancel_futures: bool = False) -> None:
+        with self._cond:
+            self._shutdown = True
+            if cancel_futures:
+                for queue in self._queues.values():
+                    for future, *_ in queue:
+                        future.cancel()
+                self._queues.clear()
+            self._cond.notify_all()
+        if wait:
+            for thread in self._threads:
+                thread.join()
+
+
+class Session(PubSubChannel):
+    """One conversation served by a SessionManager.
+
+    A PubSubChannel over the session's own concurrent PubSub, so events and
+    subscriber state never leak between sessions. state holds whatever the
+    pipeline keeps per conversation, e.g., the LLM message history.
+    """
+
+    def __init__(
+        self,
+        manager: "SessionManager",
+        id: Hashable,
+        pubsub: PubSub,
+        notify_readable: Callable[[None], None] = None,
+        output_channel: AsyncChannel | None = None,
+        subscribes_to: type | tuple[type, ...] | None = None,
+    ) -> None:
+        super().__init__(pubsub, notify_readable, output_channel, subscribes_to)
+        self.manager = manager
+        self.id = id
+        self.state: dict[str, Any] = {}
+        self.last_active = time.monotonic()
+        self._discarding = False
+
+    @property
+    def idle_time(self) -> float:
+        """Seconds since the session last read, wrote or produced output."""
+        return time.monotonic() - self.last_active
+
+    async def on_event(self, event: Any) -> None:
+        if self._discarding:
+            return
+        self.last_active = time.monotonic()
+        try:
+            await super().on_event(event)
+        except ChannelClosedEvent:
+            if not self._discarding:
+                raise
+
+    async def read(self) -> Any | None:
+        if self._discarding:
+            return None
+        event = await super().read()
+        self.last_active = time.monotonic()
+        return event
+
+    async def write(self, event: Any) -> None:
+        self.last_active = time.monotonic()
+        token = current_session.set(self.id)
+        try:
+            await super().write(event)
+        finally:
+            current_session.reset(token)
+
+    async def close(self) -> None:
+        """Stop accepting input and wait for the pipeline to finish.
+
+        Output produced meanwhile can still be read until read() returns None.
+        """
+        if self._closed:
+            return
+        try:
+            await super().close()
+        finally:
+            self.manager._release(self)
+
+    async def abort(self) -> None:
+        """Tear the session down without waiting for a reader; unread output is discarded."""
+        if self._closed:
+            return
+        self._discarding = True
+        # Release a subscriber blocked on a full output channel.
+        await self.output_channel.close()
+        await self.close()
+
+
+@dataclass
+class SessionStats:
+    """Admission counters of a SessionManager."""
+
+    opened: int = 0
+    rejected: int = 0
+    expired: int = 0  # sessions torn down for being idle
+
+
+class SessionManager(System):
+    """Serve many concurrent sessions of one pipeline in a single process.
+
+    create_async_channel() admits a new Session, with its own concurrent
+    PubSub, and calls setup(session, **kwargs) to subscribe the pipeline's
+    stages to it. Stages should share heavy resources through self.models
+    and shared executors (ideally a FairExecutor per model), so a new
+    session costs a few subscribers rather than another copy of each model.
+
+    Admission control: at most max_sessions are open at once, and
+    create_async_channel() waits up to admission_timeout seconds for one to
+    close before raising SessionLimitError. Each subscriber's inbox holds
+    inbox_size events, handled by overflow when full, and each session
+    buffers output_size events for its reader.
+
+    Sessions that haven't read, written or produced output for idle_timeout
+    seconds are aborted in the background, including ones whose pipeline is
+    stuck behind a reader that went away.
+    """
+
+    def __init__(
+        self,
+        setup: Callable[..., Awaitable[None] | None],
+        models: ModelRegistry | None = None,
+        max_sessions: int = 16,
+        admission_timeout: float = 0.0,
+        inbox_size: int = 64,
+        overflow: OverflowPolicy = OverflowPolicy.BLOCK,
+        output_size: int = 64,
+        outputs: type | tuple[type, ...] | None = None,
+        idle_timeout: float | None = 300.0,
+    ) -> None:
+        """
+        Args:
+            setup (Callable): Called as setup(session, **kwargs) to build each session's pipeline. May be async.
+            models (ModelRegistry, optional): The registry shared by all sessions. Defaults to the process-wide registry.
+            max_sessions (int, optional): The most sessions open at once. Defaults to 16.
+            admission_timeout (float, optional): Seconds to wait for a free slot. Defaults to 0, rejecting immediately.
+            inbox_size (int, optional): Events queued per subscriber and session. Defaults to 64.
+            overflow (OverflowPolicy, optional): What a full inbox does. Defaults to BLOCK.
+            output_size (int, optional): Events buffered for each session's reader. Defaults to 64.
+            outputs (type | tuple[type, ...], optional): Event types read() returns. Defaults to all events.
+            idle_timeout (float, optional): Seconds after which an idle session is aborted. None never expires sessions.
+        """
+        super().__init__(models)
+        self.setup = setup
+        self.max_sessions = max_sessions
+        self.admission_timeout = admission_timeout
+        self.inbox_size = inbox_size
+        self.overflow = OverflowPolicy(overflow)
+        self.output_size = output_size
+        self.outputs = outputs
+        self.idle_timeout = idle_timeout
+        self.sessions: dict[Hashable, Session] = {}
+        self.stats = SessionStats()
+        self._slot_freed: asyncio.Event | None = None
+        self._reaper: asyncio.Task | None = None
+
+    def __len__(self) -> int:
+        return len(self.sessions)
+
+    def get(self, session_id: Hashable) -> Session | None:
+        return self.sessions.get(session_id)
+
+    async def _admit(self) -> None:
+        if self._slot_freed is None:
+            self._slot_freed = asyncio.Event()
+        loop = asyncio.get_running_loop()
+        deadline = loop.time() + self.admission_timeout
+        while len(self.sessions) >= self.max_sessions:
+            timeout = deadline - loop.time()
+            if timeout <= 0:
+                self.stats.rejected += 1
+                raise SessionLimitError(f"all {self.max_sessions} sessions are in use")
+            self._slot_freed.clear()
+            try:
+                await asyncio.wait_for(self._slot_freed.wait(), timeout)
+            except asyncio.TimeoutError:
+                pass
+
+    def _release(self, session: Session) -> None:
+        if self.sessions.get(session.id) is session:
+            del self.sessions[session.id]
+            if self._slot_freed is not None:
+                self._slot_freed.set()
+
+    async def create_async_channel(
+        self,
+        notify_readable: Callable[[None], None] = None,
+        session_id: Hashable | None = None,
+        **kwargs,
+    ) -> Session:
+        """Admit a new session and build its pipeline with setup(session, **kwargs).
+
+        Raises SessionLimitError if no slot frees up within admission_timeout.
+        """
+        if session_id is None:
+            session_id = uuid.uuid4().hex
+        elif session_id in self.sessions:
+            raise ValueError(f"session {session_id!r} already exists")
+        await self._admit()
+        if session_id in self.sessions:
+            # Another call took the id while this one waited for a slot.
+            raise ValueError(f"session {session_id!r} already exists")
+        token = current_session.set(session_id)
+        try:
+            pubsub = PubSub(
+                concurrent=True, inbox_size=self.inbox_size, overflow=self.overflow
+            )
+            session = Session(
+                self,
+                session_id,
+                pubsub,
+                notify_readable,
+                RingChannel(self.output_size),
+                self.outputs,
+            )
+            self.sessions[session_id] = session
+            self.stats.opened += 1
+            try:
+                result = self.setup(session, **kwargs)
+                if inspect.isawaitable(result):
+                    await result
+            except BaseException:
+                await session.abort()
+                raise
+        finally:
+            current_session.reset(token)
+        if self.idle_timeout is not None and self._reaper is None:
+            self._reaper = asyncio.create_task(self._reap())
+        return session
+
+    async def expire_idle(self) -> int:
+        """Abort every session idle for idle_timeout seconds. Return how many were."""
+        if self.idle_timeout is None:
+            return 0
+        expired = [
+            session
+            for session in list(self.sessions.values())
+            if session.idle_time >= self.idle_timeout
+        ]
+        for session in expired:
+            logger.info(f"closing idle session {session.id!r}")
+            await session.abort()
+        self.stats.expired += len(expired)
+        return len(expired)
+
+    async def _reap(self) -> None:
+        interval = min(self.idle_timeout / 2, 5.0)
+        while True:
+            await asyncio.sleep(interval)
+            try:
+                await self.expire_idle()
+            except Exception:
+                logger.exception("failed to close idle sessions")
+
+    async def shutdown(self) -> None:
+        """Abort every session and stop expiring idle ones."""
+        if self._reaper is not None:
+            self._reaper.cancel()
+            try:
+                await self._reaper
+            except asyncio.CancelledError:
+                pass
+            self._reaper = None
+        for session in list(self.sessions.values()):
+            await session.abort()
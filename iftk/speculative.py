@@ -0,0 +1,164 @@
+# Copyright (c) Meta Platforms, Inc. and affiliates.
+#
+# This source code is licensed under the MIT license found in the
+# LICENSE file in the root directory of this source tree.
+
+import asyncio
+import string
+from collections.abc import AsyncIterator
+from dataclasses import dataclass
+from typing import Callable, Generic, TypeVar
+
+from ._iter_utils import _read_until_sentinel, _sentinel
+from .events import TranscriptEvent
+
+T = TypeVar("T")
+
+_PUNCTUATION = str.maketrans("", "", string.punctuation)
+
+
+def _normalize(text: str) -> str:
+    """Lowercase text without punctuation, so "Hello," and "hello" match."""
+    return " ".join(text.translate(_PUNCTUATION).lower().split())
+
+
+@dataclass
+class SpeculationStats:
+    """How often speculative responses were used.
+
+    started counts responses started, hits those whose text matched the
+    final transcript and misses those cancelled by a final transcript that
+    differed. Responses restarted on a newer partial transcript count as
+    started but are neither hits nor misses.
+    """
+
+    started: int = 0
+    hits: int = 0
+    misses: int = 0
+
+
+class Speculator(Generic[T]):
+    """Start a response on a stable partial transcript, before the final one.
+
+    Call update() with the text of the utterance so far whenever a partial
+    transcript arrives. Once the same text has been seen stable_updates times
+    in a row, respond(text) is started in the background and its output is
+    buffered. finalize() with the final text returns that output if the texts
+    match, ignoring case and punctuation, and otherwise cancels it and starts
+    over on the final text. Nothing is returned before finalize(), so a
+    mistaken speculation is never spoken.
+    """
+
+    def __init__(
+        self,
+        respond: Callable[[str], AsyncIterator[T]],
+        stable_updates: int = 2,
+        normalize: Callable[[str], str] = _normalize,
+    ) -> None:
+        self.respond = respond
+        self.stable_updates = stable_updates
+        self.normalize = normalize
+        self.stats = SpeculationStats()
+        self._key: str | None = None  # normalized text of the running response
+        self._queue: asyncio.Queue | None = None
+        self._task: asyncio.Task | None = None
+        self._last: str | None = None
+        self._repeats = 0
+
+    async def _drain(self, text: str, queue: asyncio.Queue) -> None:
+        try:
+            async for x in self.respond(text):
+                queue.put_nowait(x)
+        finally:
+            queue.put_nowait(_sentinel)
+
+    def _start(self, text: str, key: str) -> None:
+        self.cancel()
+        self._key = key
+        self._queue = asyncio.Queue()
+        self._task = asyncio.create_task(self._drain(text, self._queue))
+        self.stats.started += 1
+
+    def update(self, text: str) -> None:
+        """Note the partial text of the utterance, speculating once it is stable."""
+        key = self.normalize(text)
+        if key == self._last:
+            self._repeats += 1
+        else:
+            self._last = key
+            self._repeats = 1
+        if key and key != self._key and self._repeats >= self.stable_updates:
+            self._start(text, key)
+
+    def finalize(self, text: str) -> AsyncIterator[T]:
+        """Return the response for the final text, reusing the speculation if it matches."""
+        key = self.normalize(text)
+        if self._task is not None and key == self._key:
+            self.stats.hits += 1
+        else:
+            if self._task is not None:
+                self.stats.misses += 1
+            self._start(text, key)
+        queue, task = self._queue, self._task
+        self._task = self._queue = self._key = self._last = None
+        self._repeats = 0
+        return _owned_stream(queue, task)
+
+    def cancel(self) -> None:
+        """Cancel the running speculative response, if any."""
+        if self._task is not None:
+            self._task.cancel()
+        self._task = self._queue = self._key = None
+
+
+async def _owned_stream(queue: asyncio.Queue, task: asyncio.Task) -> AsyncIterator[T]:
+    """Read task's output, cancelling the task if the reader stops early."""
+    try:
+        async for x in _read_until_sentinel(queue, task):
+            yield x
+    finally:
+        task.cancel()
+
+
+async def speculative_responses(
+    transcripts: AsyncIterator[TranscriptEvent],
+    respond: Callable[[str], AsyncIterator[T]],
+    stable_updates: int = 2,
+) -> AsyncIterator[tuple[str, AsyncIterator[T]]]:
+    """Respond to each utterance, starting on stable partial transcripts.
+
+    An utterance is the final transcripts up to one with speech_final set,
+    as produced by deepgram_events(interim_results=True). Partial transcripts
+    in between are passed to a Speculator, which starts respond() early when
+    they settle, trading some wasted compute for a faster response.
+
+    Args:
+        transcripts (AsyncIterator[TranscriptEvent]): Partial and final transcripts. Other events are skipped.
+        respond (Callable[[str], AsyncIterator[T]]): Start a response to an utterance, e.g., an LLM stream.
+        stable_updates (int, optional): Identical partial transcripts needed to speculate. Defaults to 2.
+
+    Yields:
+        tuple[str, AsyncIterator[T]]: The final text of each utterance and the response to it.
+    """
+    speculator = Speculator(respond, stable_updates)
+    finals: list[str] = []
+    try:
+        async for event in transcripts:
+            if not isinstance(event, TranscriptEvent):
+                continue  # e.g., SpeechStartEvent from deepgram_events(vad_events=True)
+            if event.is_final and event.text:
+                finals.append(event.text)
+            parts = (
+                finals if event.is_final or not event.text else [*finals, event.text]
+            )
+            text = " ".join(parts)
+            if event.speech_final:
+                finals = []
+                if text:
+                    yield text, speculator.finalize(text)
+                else:
+                    speculator.cancel()
+            elif text:
+                speculator.update(text)
+    finally:
+        speculator.cancel()
@@ -3,14 +3,32 @@
 # This source code is licensed under the MIT license found in the
 # LICENSE file in the root directory of this source tree.
 
-from typing import Callable
+from typing import Callable, Sequence
 
 from .channel import AsyncChannel
+from .registry import ModelRegistry, ModelSpec, default_registry
 
 
 class System:
-    def load(self):
-        pass
+    """Separates model loading, which happens once, from channel creation.
+
+    Models are loaded through `models`, the process-wide ModelRegistry unless
+    another is given, so channels created later (and helpers called from them)
+    share the instances loaded by load().
+
+    Subclasses list the models they use in model_specs, and load() warms
+    them up, in parallel.
+    """
+
+    model_specs: Sequence[ModelSpec] = ()
+
+    def __init__(self, models: ModelRegistry | None = None) -> None:
+        self.models = models if models is not None else default_registry()
+
+    def load(self) -> None:
+        """Load model_specs into self.models ahead of channel creation."""
+        if self.models is not None and self.model_specs:
+            self.models.warm_up(self.model_specs)
 
     async def create_async_channel(
         self,
@@ -0,0 +1,357 @@
+# Copyright (c) Meta Platforms, Inc. and affiliates.
+#
+# This source code is licensed under the MIT license found in the
+# LICENSE file in the root directory of this source tree.
+
+import contextvars
+import functools
+import itertools
+import json
+import time
+from collections import defaultdict, deque
+from collections.abc import AsyncIterator, Hashable
+from typing import Any, Callable, NamedTuple
+
+from .events import SpeechStartEvent
+
+# The turn (or other correlation id) of the work being done. Set by
+# start_turn(), and inherited by the tasks and events that follow.
+current_turn: contextvars.ContextVar[Hashable | None] = contextvars.ContextVar(
+    "current_turn", default=None
+)
+
+# The event that started the current turn, so that the same event seen
+# again (e.g., published after a stream produced it) doesn't start another.
+_turn_event: contextvars.ContextVar[Any] = contextvars.ContextVar(
+    "_turn_event", default=None
+)
+
+_turn_ids = itertools.count(1)
+_active: "Tracer | None" = None
+
+
+class TraceRecord(NamedTuple):
+    """One traced moment (duration is None) or span, in time.monotonic() seconds."""
+
+    name: str
+    track: str
+    start: float
+    duration: float | None
+    turn: Hashable | None
+    args: dict | None = None
+
+
+class Histogram:
+    """A set of latency samples in seconds."""
+
+    def __init__(self, samples=()) -> None:
+        self.samples = sorted(samples)
+
+    def __len__(self) -> int:
+        return len(self.samples)
+
+    @property
+    def mean(self) -> float:
+        return sum(self.samples) / len(self.samples) if self.samples else 0.0
+
+    def percentile(self, p: float) -> float:
+        """The p-th percentile (0-100) of the samples."""
+        if not self.samples:
+            return 0.0
+        return self.samples[
+            min(len(self.samples) - 1, int(p / 100 * len(self.samples)))
+        ]
+
+    def buckets(
+        self, first: float = 0.001, factor: float = 2.0
+    ) -> list[tuple[float, int]]:
+        """Counts of samples up to each of the upper bounds first, first * factor, ..."""
+        buckets = []
+        bound, i = first, 0
+        while i < len(self.samples):
+            n = i
+            while n < len(self.samples) and self.samples[n] <= bound:
+                n += 1
+            buckets.append((bound, n - i))
+            bound, i = bound * factor, n
+        return buckets
+
+    def summary(self) -> dict[str, float]:
+        return {
+            "count": len(self.samples),
+            "mean": self.mean,
+            "p50": self.percentile(50),
+            "p95": self.percentile(95),
+            "p99": self.percentile(99),
+            "max": self.samples[-1] if self.samples else 0.0,
+        }
+
+
+class Tracer:
+    """Collects timestamped, turn-tagged records from a running pipeline.
+
+    While enabled (see enable_tracing()), PubSub.publish() records every
+    event, concurrent PubSub inboxes record each subscriber's time in
+    on_event() and the helpers' streams record the time taken to produce
+    each item, not counting time spent waiting for their input. The first
+    item a stream produces in each turn is also recorded as "<stream>:first".
+
+    Turns start with start_turn(), or when a SpeechStartEvent is published
+    or produced by a traced stream. Each record carries the current turn,
+    so histograms() can derive per-turn latencies such as end of speech to
+    first audio ("SpeechEndEvent->xtts:first").
+    """
+
+    def __init__(
+        self,
+        max_records: int = 1_000_000,
+        turn_start: type | tuple[type, ...] = SpeechStartEvent,
+    ) -> None:
+        """
+        Args:
+            max_records (int, optional): Most records kept; the oldest are dropped. Defaults to 1M.
+            turn_start (type | tuple[type, ...], optional): Event types that start a new turn.
+                                                            Defaults to SpeechStartEvent.
+        """
+        self.records: deque[TraceRecord] = deque(maxlen=max_records)
+        self.turn_start = turn_start
+
+    def _maybe_start_turn(self, event: Any) -> None:
+        # A stream's SpeechStartEvent is often published afterwards; that
+        # is still the same turn.
+        if isinstance(event, self.turn_start) and event is not _turn_event.get():
+            _turn_event.set(event)
+            start_turn()
+
+    def clear(self) -> None:
+        self.records.clear()
+
+    def instant(
+        self, name: str, track: str = "events", at: float | None = None, **args
+    ) -> None:
+        """Record that name happened, now or at the time.monotonic() at."""
+        if at is None:
+            at = time.monotonic()
+        self.records.append(
+            TraceRecord(name, track, at, None, current_turn.get(), args or None)
+        )
+
+    def span(self, name: str, start: float, end: float, **args) -> None:
+        """Record that name ran from start to end, on its own track."""
+        self.records.append(
+            TraceRecord(
+                name, name, start, end - start, current_turn.get(), args or None
+            )
+        )
+
+    def on_event(self, event: Any) -> None:
+        """Record a published event, starting a turn first if it is a turn_start type.
+
+        Events with a capture time (such as SpeechEvent or AudioFrame) are
+        placed at the time they were captured.
+        """
+        self._maybe_start_turn(event)
+        at = getattr(event, "timestamp", None)
+        if isinstance(at, float):
+            self.instant(type(event).__name__, at=at, published=time.monotonic())
+        else:
+            self.instant(type(event).__name__)
+
+    def service_times(self) -> dict[str, Histogram]:
+        """Per-item service time of each stream and subscriber, by name."""
+        samples = defaultdict(list)
+        for r in self.records:
+            if r.duration is not None:
+                service = r.args.get("service") if r.args else None
+                samples[r.name].append(r.duration if service is None else service)
+        return {name: Histogram(s) for name, s in samples.items()}
+
+    def latency(self, start: str, end: str) -> Histogram:
+        """Per turn, the time from the first start record to the first end record after it."""
+        starts: dict[Hashable, float] = {}
+        latencies: dict[Hashable, float] = {}
+        for r in sorted(self.records, key=lambda r: r.start):
+            if r.turn is None or r.turn in latencies:
+                continue
+            if r.name == start and r.turn not in starts:
+                starts[r.turn] = r.start
+            elif r.name == end and r.turn in starts:
+                latencies[r.turn] = r.start - starts[r.turn]
+        return Histogram(latencies.values())
+
+    def histograms(self, start: str = "SpeechEndEvent") -> dict[str, Histogram]:
+        """Service times by stage, plus the latency from start to each "<stream>:first"."""
+        histograms = {f"service/{name}": h for name, h in self.service_times().items()}
+        firsts = sorted({r.name for r in self.records if r.name.endswith(":first")})
+        for end in firsts:
+            latency = self.latency(start, end)
+            if latency:
+                histograms[f"{start}->{end}"] = latency
+        return histograms
+
+    def summary(self) -> dict[str, dict[str, float]]:
+        """histograms() as JSON-serializable percentiles, in seconds."""
+        return {name: h.summary() for name, h in self.histograms().items()}
+
+    def chrome_trace(self) -> dict:
+        """The records in Chrome's trace event format, for chrome://tracing or Perfetto."""
+        tracks: dict[str, int] = {}
+        events = []
+        turns: dict[Hashable, list[float]] = {}
+        for r in self.records:
+            tid = tracks.setdefault(r.track, len(tracks) + 1)
+            args = {"turn": str(r.turn)} if r.turn is not None else {}
+            if r.args:
+                args.update(r.args)
+            event = {
+                "name": r.name,
+                "pid": 1,
+                "tid": tid,
+                "ts": r.start * 1e6,
+                "args": args,
+            }
+            if r.duration is None:
+                event.update(ph="i", s="t")
+                end = r.start
+            else:
+                event.update(ph="X", dur=r.duration * 1e6)
+                end = r.start + r.duration
+            events.append(event)
+            if r.turn is not None:
+                bounds = turns.setdefault(r.turn, [r.start, end])
+                bounds[0], bounds[1] = min(bounds[0], r.start), max(bounds[1], end)
+        turn_tid = tracks.setdefault("turns", len(tracks) + 1)
+        for turn, (start, end) in turns.items():
+            events.append(
+                {
+                    "name": f"turn {turn}",
+                    "ph": "X",
+                    "pid": 1,
+                    "tid": turn_tid,
+                    "ts": start * 1e6,
+                    "dur": (end - start) * 1e6,
+                }
+            )
+        for track, tid in tracks.items():
+            events.append(
+                {
+                    "name": "thread_name",
+                    "ph": "M",
+                    "pid": 1,
+                    "tid": tid,
+                    "args": {"name": track},
+                }
+            )
+        return {"traceEvents": events, "displayTimeUnit": "ms"}
+
+    def write_chrome_trace(self, path: str) -> None:
+        with open(path, "w") as f:
+            json.dump(self.chrome_trace(), f)
+
+    async def trace_stream(
+        self, name: str, fn: Callable[..., AsyncIterator], args: tuple, kwargs: dict
+    ) -> AsyncIterator:
+        """Iterate fn(*args, **kwargs), recording each item as a span of name."""
+        waited = 0.0  # seconds spent waiting for input since the last item
+
+        async def timed(stream) -> AsyncIterator:
+            nonlocal waited
+            iterator = aiter(stream)
+            while True:
+                start = time.monotonic()
+                try:
+                    x = await anext(iterator)
+                except StopAsyncIteration:
+                    return
+                finally:
+                    waited += time.monotonic() - start
+                yield x
+
+        # Time the async iterable inputs, e.g., the audio or text stream.
+        args = [timed(a) if hasattr(a, "__aiter__") else a for a in args]
+        kwargs = {
+            k: timed(v) if hasattr(v, "__aiter__") else v for k, v in kwargs.items()
+        }
+        stream = fn(*args, **kwargs)
+        first_turn = object()  # the last turn that had its first item
+        try:
+            while True:
+                waited = 0.0
+                start = time.monotonic()
+                try:
+                    item = await anext(stream)
+                except StopAsyncIteration:
+                    return
+                end = time.monotonic()
+                self._maybe_start_turn(item)
+                turn = current_turn.get()
+                self.records.append(
+                    TraceRecord(
+                        name,
+                        name,
+                        start,
+                        end - start,
+                        turn,
+                        # Inputs read concurrently can wait longer in total.
+                        {"service": max(0.0, end - start - waited)},
+                    )
+                )
+                if turn != first_turn:
+                    first_turn = turn
+                    self.instant(f"{name}:first", name, end)
+                yield item
+        finally:
+            aclose = getattr(stream, "aclose", None)
+            if aclose is not None:
+                await aclose()
+
+
+def get_tracer() -> Tracer | None:
+    """The enabled Tracer, or None if tracing is disabled."""
+    return _active
+
+
+def enable_tracing(tracer: Tracer | None = None) -> Tracer:
+    """Start recording into tracer (a new Tracer by default) and return it.
+
+    Streams created and events published from now on are traced.
+    """
+    global _active
+    _active = tracer if tracer is not None else Tracer()
+    return _active
+
+
+def disable_tracing() -> Tracer | None:
+    """Stop recording, and return the Tracer that was enabled."""
+    global _active
+    tracer, _active = _active, None
+    return tracer
+
+
+def start_turn(turn: Hashable | None = None) -> Hashable:
+    """Tag what the current task does from now on with turn (a new id by default)."""
+    if turn is None:
+        turn = next(_turn_ids)
+    current_turn.set(turn)
+    if _active is not None:
+        _active.instant("turn", "turns")
+    return turn
+
+
+def traced_stream(name: str) -> Callable:
+    """Decorate a helper that returns an AsyncIterator so it is traced as name.
+
+    Without an enabled Tracer, the helper's stream is returned as is, so
+    the only cost is one check when the stream is created.
+    """
+
+    def decorate(fn: Callable[..., AsyncIterator]) -> Callable[..., AsyncIterator]:
+        @functools.wraps(fn)
+        def wrapper(*args, **kwargs) -> AsyncIterator:
+            if _active is None:
+                return fn(*args, **kwargs)
+            return _active.trace_stream(name, fn, args, kwargs)
+
+        return wrapper
+
+    return decorate
@@ -0,0 +1,255 @@
+# Copyright (c) Meta Platforms, Inc. and affiliates.
+#
+# This source code is licensed under the MIT license found in the
+# LICENSE file in the root directory of this source tree.
+
+import asyncio
+import json
+import os
+import sys
+import time
+import unittest
+
+import websockets
+
+sys.path.insert(0, os.path.abspath(os.path.join(os.path.dirname(__file__), "../..")))
+
+from iftk.audio import AudioFrame
+from iftk.events import SpeechStartEvent
+from iftk.helpers.deepgram import (
+    DeepgramConnection,
+    DeepgramPool,
+    deepgram_events,
+    deepgram_stream,
+    deepgram_url,
+)
+from iftk.speculative import speculative_responses
+
+BYTES_PER_SECOND = 32000
+CHUNK_BYTES = BYTES_PER_SECOND // 10
+RESULT_BYTES = BYTES_PER_SECOND // 2
+
+
+class FakeDeepgram:
+    """A local stand-in for the Deepgram listen endpoint.
+
+    Every half second of audio is "transcribed" as the value of its first
+    byte, in a final Results message with Deepgram's schema. With interim,
+    every chunk of audio in between gets a partial Results message. With
+    vad, the first chunk of each half second gets a SpeechStarted message.
+    """
+
+    def __init__(
+        self, drop_after: int | None = None, interim: bool = False, vad: bool = False
+    ) -> None:
+        self.drop_after = drop_after  # bytes after which the first socket fails
+        self.interim = interim
+        self.vad = vad
+        self.connections = 0
+        self.keep_alives = 0
+        self.server = None
+
+    @property
+    def url(self) -> str:
+        port = self.server.sockets[0].getsockname()[1]
+        return f"ws://localhost:{port}/v1/listen"
+
+    async def __aenter__(self):
+        self.server = await websockets.serve(self.handler, "localhost", 0)
+        return self
+
+    async def __aexit__(self, *exc):
+        self.server.close()
+        await self.server.wait_closed()
+
+    async def handler(self, ws):
+        self.connections += 1
+        first = self.connections == 1
+        audio = bytearray()
+        start = 0
+        async for message in ws:
+            if isinstance(message, str):
+                message = json.loads(message)
+                if message["type"] == "KeepAlive":
+                    self.keep_alives += 1
+                elif message["type"] == "CloseStream":
+                    if start < len(audio):
+                        await ws.send(self.result(audio, start, len(audio)))
+                    await ws.close()
+                    return
+                continue
+            if self.vad and start == len(audio):
+                await ws.send(
+                    json.dumps(
+                        {
+                            "type": "SpeechStarted",
+                            "channel": [0],
+                            "timestamp": start / BYTES_PER_SECOND,
+                        }
+                    )
+                )
+            audio += message
+            while len(audio) - start >= RESULT_BYTES:
+                await ws.send(self.result(audio, start, start + RESULT_BYTES))
+                start += RESULT_BYTES
+            if self.interim and start < len(audio):
+                await ws.send(self.result(audio, start, len(audio), is_final=False))
+            if first and self.drop_after and len(audio) >= self.drop_after:
+                await ws.close(code=1011)
+                return
+
+    def result(
+        self, audio: bytearray, start: int, end: int, is_final: bool = True
+    ) -> str:
+        return json.dumps(
+            {
+                "type": "Results",
+                "channel": {"alternatives": [{"transcript": str(audio[start])}]},
+                "start": start / BYTES_PER_SECOND,
+                "duration": (end - start) / BYTES_PER_SECOND,
+                "is_final": is_final,
+                "speech_final": is_final,
+            }
+        )
+
+
+async def numbered_chunks(count: int):
+    for i in range(count):
+        yield bytes([i]) * CHUNK_BYTES
+        await asyncio.sleep(0.005)
+
+
+class TestDeepgramPool(unittest.IsolatedAsyncioTestCase):
+    async def test_stream_uses_pre_opened_connection(self):
+        async with FakeDeepgram() as server:
+            pool = DeepgramPool("key", url=server.url, size=2)
+            await pool.start()
+            self.assertEqual(server.connections, 2)
+
+            results = [
+                text async for text in deepgram_stream("key", numbered_chunks(20), pool)
+            ]
+            self.assertEqual(results, ["0", "5", "10", "15"])
+            # The connection handed out was replaced in the background.
+            self.assertEqual(server.connections, 3)
+            await pool.close()
+
+    async def test_shared_keep_alive(self):
+        async with FakeDeepgram() as server:
+            pool = DeepgramPool("key", url=server.url, size=3, keep_alive_interval=0.05)
+            await pool.start()
+            await asyncio.sleep(0.3)
+            await pool.close()
+            self.assertGreaterEqual(server.keep_alives, 3)
+
+    async def test_reconnect_replays_unacknowledged_audio(self):
+        async with FakeDeepgram(drop_after=int(0.75 * BYTES_PER_SECOND)) as server:
+            pool = DeepgramPool("key", url=server.url, size=0)
+            async with pool.connection() as connection:
+
+                async def send():
+                    async for chunk in numbered_chunks(20):
+                        await connection.send(chunk)
+                    await connection.finish()
+
+                sender = asyncio.create_task(send())
+                results = [
+                    (m["channel"]["alternatives"][0]["transcript"], m["start"])
+                    async for m in connection.messages()
+                ]
+                await sender
+                self.assertEqual(connection.reconnects, 1)
+            await pool.close()
+
+        self.assertEqual(server.connections, 2)
+        self.assertEqual(results, [("0", 0.0), ("5", 0.5), ("10", 1.0), ("15", 1.5)])
+
+
+class TestDeepgramEvents(unittest.IsolatedAsyncioTestCase):
+    def test_url(self):
+        url = deepgram_url(
+            endpointing=False, interim_results=True, utterance_end_ms=1000
+        )
+        self.assertIn("endpointing=false", url)
+        self.assertIn("interim_results=true", url)
+        self.assertIn("utterance_end_ms=1000", url)
+
+    def test_bytes_per_second_follows_url(self):
+        for sample_rate, channels, expected in [
+            (16000, 1, 32000),
+            (24000, 1, 48000),
+            (8000, 2, 32000),
+        ]:
+            url = deepgram_url(sample_rate=sample_rate, channels=channels)
+            connection = DeepgramConnection(url, {})
+            self.assertEqual(connection.bytes_per_second, expected)
+
+    async def test_interim_and_final_events(self):
+        async with FakeDeepgram(interim=True) as server:
+            url = deepgram_url(interim_results=True, url=server.url)
+            pool = DeepgramPool("key", url=url, size=0)
+            events = [
+                e async for e in deepgram_events("key", numbered_chunks(10), pool)
+            ]
+            await pool.close()
+
+        self.assertEqual(
+            [(e.text, e.is_final, e.speech_final) for e in events],
+            [("0", False, False)] * 4
+            + [("0", True, True)]
+            + [("5", False, False)] * 4
+            + [("5", True, True)],
+        )
+        self.assertAlmostEqual(events[4].start, 0.0)
+        self.assertAlmostEqual(events[4].end, 0.5)
+        self.assertAlmostEqual(events[-1].start, 0.5)
+
+    async def test_vad_events(self):
+        async def frames(count: int, start: float):
+            async for chunk in numbered_chunks(count):
+                yield AudioFrame(chunk, 8000, channels=2, timestamp=start)
+                start += 0.1
+
+        captured = time.monotonic() - 10.0
+        async with FakeDeepgram(vad=True) as server:
+            # The same bytes per second as the fake expects.
+            url = deepgram_url(sample_rate=8000, channels=2, url=server.url)
+            pool = DeepgramPool("key", url=url, size=0)
+            events = [
+                e async for e in deepgram_events("key", frames(10, captured), pool)
+            ]
+            await pool.close()
+
+        starts = [e for e in events if isinstance(e, SpeechStartEvent)]
+        # The rate comes from the url, and times from when the audio was captured.
+        self.assertEqual(
+            [(e.sample, e.sample_rate) for e in starts], [(0, 8000), (4000, 8000)]
+        )
+        self.assertAlmostEqual(starts[0].timestamp, captured)
+        self.assertAlmostEqual(starts[1].timestamp, captured + 0.5)
+        # Speech start comes ahead of the transcript of that speech.
+        self.assertIs(events[0], starts[0])
+
+    async def test_transcript_consumers_skip_vad_events(self):
+        async def respond(text):
+            yield text
+
+        async with FakeDeepgram(vad=True) as server:
+            pool = DeepgramPool(
+                "key", url=deepgram_url(vad_events=True, url=server.url), size=0
+            )
+            results = [
+                text async for text in deepgram_stream("key", numbered_chunks(10), pool)
+            ]
+            self.assertEqual(results, ["0", "5"])
+
+            events = deepgram_events("key", numbered_chunks(10), pool)
+            utterances = [
+                text async for text, _ in speculative_responses(events, respond)
+            ]
+            self.assertEqual(utterances, ["0", "5"])
+            await pool.close()
+
+
+if __name__ == "__main__":
+    unittest.main()
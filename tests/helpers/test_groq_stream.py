@@ -26,12 +26,24 @@ class TestGroq(unittest.IsolatedAsyncioTestCase):
         llm_stream = await client.chat.completions.create(
             messages=messages, model=model_id, stream=True
         )
-        async for sentence in groq_sentence_stream(llm_stream):
+        tokens = []
+
+        async def recorded():
+            async for chunk in llm_stream:
+                tokens.append(chunk.choices[0].delta.content or "")
+                yield chunk
+
+        sentences = [s async for s in groq_sentence_stream(recorded())]
+        self.assertTrue(sentences)
+        for sentence in sentences:
             self.assertIsInstance(sentence, str)
-            assert sentence
-            assert (
-                sentence[-1] == "." or sentence[-1] == "?"
-            )  # sentences must end on period or question mark
+            self.assertTrue(sentence)
+            self.assertEqual(sentence, sentence.strip())
+        # Segments may end in a quote, a bracket or nothing at all, but no
+        # text is lost or added between them.
+        self.assertEqual(
+            "".join("".join(sentences).split()), "".join("".join(tokens).split())
+        )
 
 
 if __name__ == "__main__":
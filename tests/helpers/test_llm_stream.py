@@ -10,7 +10,12 @@ from typing import AsyncIterator
 
 sys.path.insert(0, os.path.abspath(os.path.join(os.path.dirname(__file__), "../..")))
 
-from iftk.helpers.transformers import transformer_stream
+from iftk.helpers.transformers import (
+    ChatSession,
+    transformer_model_spec,
+    transformer_stream,
+)
+from iftk.registry import default_registry
 
 MODEL_ID = "TinyLlama/TinyLlama-1.1B-Chat-v1.0"
 messages = [{"role": "user", "content": "How are you doing?"}]
@@ -20,3 +25,38 @@ class TestLLM(unittest.IsolatedAsyncioTestCase):
     async def test_llm(self):
         async for token in transformer_stream(model_id=MODEL_ID, messages=messages):
             self.assertIsInstance(token, str)
+
+    async def test_llm_yields_only_the_reply(self):
+        text = "".join(
+            [t async for t in transformer_stream(model_id=MODEL_ID, messages=messages)]
+        )
+        tokenizer, _ = default_registry().get(transformer_model_spec(MODEL_ID))
+        # Neither special tokens such as </s>, nor the prompt, are yielded.
+        for special in tokenizer.all_special_tokens:
+            self.assertNotIn(special, text)
+        self.assertFalse(text.lstrip().startswith("<|user|>"))
+
+    async def test_llm_cancel(self):
+        stream = transformer_stream(
+            model_id=MODEL_ID, messages=messages, max_new_tokens=1000
+        )
+        token = await anext(stream)
+        self.assertIsInstance(token, str)
+        # Closing the stream stops generation instead of running to max_new_tokens.
+        await stream.aclose()
+
+    async def test_llm_session_reuses_prefix(self):
+        session = ChatSession()
+        history = list(messages)
+        for question in ("What is your name?", "Where do you live?"):
+            history.append({"role": "user", "content": question})
+            tokens = []
+            async for token in transformer_stream(
+                model_id=MODEL_ID, messages=history, session=session
+            ):
+                tokens.append(token)
+            history.append({"role": "assistant", "content": "".join(tokens)})
+
+        self.assertEqual(session.stats.turns, 2)
+        self.assertEqual(session.stats.prefix_hits, 1)
+        self.assertGreater(session.stats.reused_tokens, 0)
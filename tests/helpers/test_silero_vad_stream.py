@@ -11,7 +11,8 @@ from .test_deepgram_stream import stream_file
 
 sys.path.insert(0, os.path.abspath(os.path.join(os.path.dirname(__file__), "../..")))
 
-from iftk.helpers.silero_vad import silero_vad_stream
+from iftk.events import SpeechEndEvent, SpeechStartEvent
+from iftk.helpers.silero_vad import silero_vad_events, silero_vad_stream
 
 AUDIO_FILE = "tests/helpers/audio_test.wav"
 CHUNK = 512 * 8
@@ -23,6 +24,20 @@ class TestSileroVAD(unittest.IsolatedAsyncioTestCase):
         async for timestamp in silero_vad_stream(stream_file(AUDIO_FILE, chunk=CHUNK)):
             self.assertIsInstance(timestamp, list)
 
+    async def test_vad_events(self):
+        events = []
+        async for event in silero_vad_events(stream_file(AUDIO_FILE, chunk=CHUNK)):
+            events.append(event)
+        self.assertTrue(events)
+        # Speech boundaries alternate, starting with speech start.
+        for i, event in enumerate(events):
+            expected = SpeechStartEvent if i % 2 == 0 else SpeechEndEvent
+            self.assertIsInstance(event, expected)
+        self.assertEqual(
+            [event.sample for event in events],
+            sorted(event.sample for event in events),
+        )
+
 
 if __name__ == "__main__":
     unittest.main()
@@ -3,6 +3,7 @@
 # This source code is licensed under the MIT license found in the
 # LICENSE file in the root directory of this source tree.
 
+import asyncio
 import os
 import sys
 import unittest
@@ -11,7 +12,12 @@ from .test_deepgram_stream import stream_file
 
 sys.path.insert(0, os.path.abspath(os.path.join(os.path.dirname(__file__), "../..")))
 
-from iftk.helpers.whisper import whisper_stream
+from iftk.events import TranscriptEvent
+from iftk.helpers.whisper import (
+    WhisperBatcher,
+    whisper_incremental_stream,
+    whisper_stream,
+)
 
 AUDIO_FILE = "tests/helpers/audio_test.wav"
 CHUNK = 512 * 100
@@ -24,6 +30,32 @@ class TestWhisper(unittest.IsolatedAsyncioTestCase):
             self.assertIsInstance(output, str)
             self.assertIsNotNone(output)
 
+    async def test_whisper_incremental(self):
+        final_text = []
+        async for event in whisper_incremental_stream(stream_file(AUDIO_FILE, 512)):
+            self.assertIsInstance(event, TranscriptEvent)
+            if event.is_final:
+                final_text.append(event.text)
+        self.assertTrue(" ".join(final_text).strip())
+
+    async def test_whisper_batched_sessions(self):
+        batcher = WhisperBatcher(max_batch_size=4, max_wait=0.1)
+
+        async def session():
+            return [
+                output
+                async for output in whisper_stream(
+                    stream_file(AUDIO_FILE, CHUNK), batcher=batcher
+                )
+            ]
+
+        results = await asyncio.gather(*(session() for _ in range(4)))
+        await batcher.close()
+        for outputs in results:
+            self.assertTrue(outputs)
+            self.assertEqual(outputs, results[0])
+        self.assertGreater(batcher.stats.mean_batch_size, 1)
+
 
 if __name__ == "__main__":
     unittest.main()
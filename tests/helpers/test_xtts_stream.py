@@ -11,7 +11,7 @@ import torch
 
 sys.path.insert(0, os.path.abspath(os.path.join(os.path.dirname(__file__), "../..")))
 
-from iftk.helpers.xtts import xtts_stream
+from iftk.helpers.xtts import XttsSynthesizer, xtts_stream
 
 
 class TestXTTS(unittest.IsolatedAsyncioTestCase):
@@ -21,6 +21,17 @@ class TestXTTS(unittest.IsolatedAsyncioTestCase):
             self.assertIsInstance(chunk, torch.Tensor)
             self.assertGreater(len(chunk), 1_000)
 
+    async def test_synthesizer_stream(self):
+        async def sentences():
+            yield "Hello there!"
+            yield "How are you?"
+
+        synthesizer = XttsSynthesizer()
+        chunks = [chunk async for chunk in synthesizer.stream(sentences())]
+        self.assertGreater(len(chunks), 1)
+        latents = await synthesizer.speaker_latents()
+        self.assertIs(await synthesizer.speaker_latents(), latents)
+
 
 if __name__ == "__main__":
     unittest.main()
@@ -0,0 +1,42 @@
+# Copyright (c) Meta Platforms, Inc. and affiliates.
+#
+# This source code is licensed under the MIT license found in the
+# LICENSE file in the root directory of this source tree.
+
+import unittest
+
+import numpy as np
+
+from .context import iftk
+
+
+class TestAudioFrame(unittest.TestCase):
+    def test_views_share_memory(self):
+        data = bytearray(np.array([0, 16384, -32768], dtype=np.int16).tobytes())
+        frame = iftk.AudioFrame(data, sample_rate=16000, timestamp=1.0)
+
+        self.assertEqual(frame.num_frames, 3)
+        self.assertAlmostEqual(frame.end_timestamp, 1.0 + 3 / 16000)
+        samples = frame.numpy()
+        data[0:2] = np.int16(7).tobytes()
+        self.assertEqual(samples[0], 7)
+
+    def test_float32_is_cached(self):
+        raw = np.array([16384, -32768], dtype=np.int16).tobytes()
+        frame = iftk.AudioFrame.from_chunk(raw, sample_rate=8000)
+
+        normalized = frame.float32()
+        self.assertEqual(normalized.dtype, np.float32)
+        np.testing.assert_allclose(normalized, [0.5, -1.0])
+        self.assertIs(frame.float32(), normalized)
+        self.assertIs(iftk.AudioFrame.from_chunk(frame, 16000), frame)
+
+    def test_multichannel(self):
+        raw = np.arange(8, dtype=np.int16).tobytes()
+        frame = iftk.AudioFrame(raw, sample_rate=16000, channels=2)
+        self.assertEqual(frame.num_frames, 4)
+        self.assertEqual(frame.numpy().shape, (4, 2))
+
+
+if __name__ == "__main__":
+    unittest.main()
@@ -0,0 +1,76 @@
+# Copyright (c) Meta Platforms, Inc. and affiliates.
+#
+# This source code is licensed under the MIT license found in the
+# LICENSE file in the root directory of this source tree.
+
+import asyncio
+import unittest
+
+from .context import iftk
+
+
+class TestMicroBatcher(unittest.IsolatedAsyncioTestCase):
+    async def test_gathers_concurrent_requests(self):
+        batches = []
+
+        def double(items):
+            batches.append(list(items))
+            return [2 * x for x in items]
+
+        batcher = iftk.MicroBatcher(double, max_batch_size=4, max_wait=0.05)
+        results = await asyncio.gather(*(batcher.submit(i) for i in range(6)))
+        await batcher.close()
+
+        self.assertEqual(results, [2 * i for i in range(6)])
+        self.assertEqual(batches, [[0, 1, 2, 3], [4, 5]])
+        self.assertEqual(batcher.stats.batches, 2)
+        self.assertEqual(batcher.stats.batch_sizes, {4: 1, 2: 1})
+        self.assertEqual(batcher.stats.mean_batch_size, 3)
+        self.assertEqual(len(batcher.stats.latencies), 2)
+
+    async def test_requests_spread_over_the_window(self):
+        batches = []
+
+        def record(items):
+            batches.append(list(items))
+            return items
+
+        batcher = iftk.MicroBatcher(record, max_batch_size=100, max_wait=0.2)
+
+        async def submit(i):
+            await asyncio.sleep(0.01 * i)
+            return await batcher.submit(i)
+
+        results = await asyncio.wait_for(
+            asyncio.gather(*(submit(i) for i in range(5))), timeout=2
+        )
+        await batcher.close()
+        self.assertEqual(results, list(range(5)))
+        # Later requests join the batch the first one opened.
+        self.assertEqual(batches, [[0, 1, 2, 3, 4]])
+
+    async def test_errors_reach_every_caller(self):
+        def fail(items):
+            raise ValueError("bad batch")
+
+        batcher = iftk.MicroBatcher(fail, max_wait=0.01)
+        results = await asyncio.gather(
+            batcher.submit(1), batcher.submit(2), return_exceptions=True
+        )
+        await batcher.close()
+        self.assertTrue(all(isinstance(r, ValueError) for r in results))
+
+    async def test_missing_results_fail_every_caller(self):
+        batcher = iftk.MicroBatcher(lambda items: items[:-1], max_wait=0.01)
+        results = await asyncio.wait_for(
+            asyncio.gather(
+                batcher.submit(1), batcher.submit(2), return_exceptions=True
+            ),
+            timeout=1,
+        )
+        await batcher.close()
+        self.assertTrue(all(isinstance(r, ValueError) for r in results))
+
+
+if __name__ == "__main__":
+    unittest.main()
@@ -0,0 +1,46 @@
+# Copyright (c) Meta Platforms, Inc. and affiliates.
+#
+# This source code is licensed under the MIT license found in the
+# LICENSE file in the root directory of this source tree.
+
+import json
+import os
+import subprocess
+import sys
+import unittest
+
+SUITE = os.path.join(os.path.dirname(__file__), "../benchmarks/bench_suite.py")
+
+
+class TestBenchSuite(unittest.TestCase):
+    def test_runs_against_the_fakes(self):
+        # pipeline/local needs torch for the helpers, even with stub models.
+        names = ["pubsub", "channel", "pipeline/deepgram", "pipeline/api"]
+        result = subprocess.run(
+            [sys.executable, SUITE, "--events", "200", "--turns", "1", "--only"]
+            + names,
+            capture_output=True,
+            text=True,
+            timeout=60,
+        )
+        self.assertEqual(result.returncode, 0, result.stderr)
+        results = json.loads(result.stdout)["results"]
+        self.assertEqual(
+            sorted(results),
+            [
+                "channel/deque",
+                "channel/ring",
+                "pipeline/api",
+                "pipeline/deepgram",
+                "pubsub/concurrent",
+                "pubsub/inline",
+            ],
+        )
+        for name, metrics in results.items():
+            self.assertNotIn("skipped", metrics, name)
+        api = results["pipeline/api"]
+        self.assertEqual(api["end_of_speech_to_first_audio"]["count"], 1)
+
+
+if __name__ == "__main__":
+    unittest.main()
@@ -0,0 +1,110 @@
+# Copyright (c) Meta Platforms, Inc. and affiliates.
+#
+# This source code is licensed under the MIT license found in the
+# LICENSE file in the root directory of this source tree.
+
+import asyncio
+import os
+import tempfile
+import unittest
+import wave
+
+from .context import iftk
+
+RATE = 1000  # 2000 bytes per second of int16 mono
+
+
+def write_wav(path: str, frames: int) -> bytes:
+    data = b"".join(i.to_bytes(2, "little") for i in range(frames))
+    with wave.open(path, "wb") as w:
+        w.setnchannels(1)
+        w.setsampwidth(2)
+        w.setframerate(RATE)
+        w.writeframes(data)
+    return data
+
+
+class TestAudioRingBuffer(unittest.TestCase):
+    def ring(self, overflow=iftk.OverflowPolicy.DROP_OLDEST):
+        return iftk.AudioRingBuffer(8, 2, 2 * RATE, overflow)
+
+    def test_wraps_around(self):
+        ring = self.ring()
+        ring.write(b"abcdef", timestamp=10.0)
+        self.assertEqual(ring.read(4)[0], b"abcd")
+        ring.write(b"ghijkl", timestamp=10.003)
+        data, timestamp = ring.read(8)
+        self.assertEqual(data, b"efghijkl")
+        self.assertAlmostEqual(timestamp, 10.002)
+        self.assertIsNone(ring.read(2))
+
+    def test_drop_oldest(self):
+        ring = self.ring()
+        ring.write(b"abcdef")
+        ring.write(b"ghij")
+        ring.write(b"0123456789")
+        self.assertEqual(ring.read(8)[0], b"23456789")
+        self.assertEqual(ring.stats.captured, 10)
+        self.assertEqual(ring.stats.dropped, 6)
+        self.assertEqual(ring.stats.overflows, 2)
+
+    def test_drop_newest(self):
+        ring = self.ring(iftk.OverflowPolicy.DROP_NEWEST)
+        ring.write(b"abcdef")
+        ring.write(b"ghij")
+        self.assertEqual(ring.read(8)[0], b"abcdefgh")
+        self.assertEqual(ring.stats.dropped, 1)
+
+    def test_rejects_coalesce(self):
+        with self.assertRaises(ValueError):
+            self.ring(iftk.OverflowPolicy.COALESCE)
+
+
+class TestWavFileSource(unittest.IsolatedAsyncioTestCase):
+    def setUp(self):
+        self.dir = tempfile.TemporaryDirectory()
+        self.path = os.path.join(self.dir.name, "audio.wav")
+        self.data = write_wav(self.path, 250)
+
+    def tearDown(self):
+        self.dir.cleanup()
+
+    async def test_chunks_aggregate_to_duration(self):
+        async with iftk.WavFileSource(
+            self.path, frames_per_buffer=7, realtime=False, chunk_duration=0.1
+        ) as source:
+            frames = [frame async for frame in source]
+        self.assertEqual([f.num_frames for f in frames], [100, 100, 50])
+        self.assertEqual(b"".join(f.data for f in frames), self.data)
+        self.assertAlmostEqual(frames[1].timestamp - frames[0].timestamp, 0.1)
+        self.assertEqual(source.stats.dropped, 0)
+        self.assertEqual(source.stats.chunks, 3)
+
+    async def test_slow_consumer_drops_oldest(self):
+        source = iftk.WavFileSource(
+            self.path,
+            frames_per_buffer=10,
+            realtime=False,
+            chunk_duration=0.01,
+            buffer_duration=0.05,
+            overflow=iftk.OverflowPolicy.DROP_OLDEST,
+        )
+        await source.start()
+        await asyncio.sleep(0.1)  # The whole file is read meanwhile.
+        frames = [frame async for frame in source]
+        await source.close()
+        self.assertEqual(b"".join(f.data for f in frames), self.data[-100:])
+        self.assertEqual(source.stats.captured, 250)
+        self.assertEqual(source.stats.dropped, 200)
+
+    async def test_close_stops_realtime_capture(self):
+        source = iftk.WavFileSource(self.path, frames_per_buffer=10)
+        frame = await source.read()
+        await source.close()
+        self.assertEqual(frame.num_frames, 32)
+        self.assertLess(source.stats.captured, 250)
+        self.assertFalse(source._thread.is_alive())
+
+
+if __name__ == "__main__":
+    unittest.main()
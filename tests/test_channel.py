@@ -0,0 +1,82 @@
+# Copyright (c) Meta Platforms, Inc. and affiliates.
+#
+# This source code is licensed under the MIT license found in the
+# LICENSE file in the root directory of this source tree.
+
+import asyncio
+import unittest
+
+from .context import iftk
+
+
+class TestRingChannel(unittest.IsolatedAsyncioTestCase):
+    async def test_read_waits_for_write(self):
+        channel = iftk.RingChannel(capacity=2)
+        reader = asyncio.create_task(channel.read())
+        await asyncio.sleep(0)
+        self.assertFalse(reader.done())
+        await channel.write("a")
+        self.assertEqual(await reader, "a")
+
+    async def test_write_applies_backpressure(self):
+        channel = iftk.RingChannel(capacity=2)
+        await channel.write(1)
+        self.assertTrue(channel.try_write(2))
+        self.assertFalse(channel.try_write(3))
+        writer = asyncio.create_task(channel.write(3))
+        await asyncio.sleep(0)
+        self.assertFalse(writer.done())
+
+        self.assertEqual(channel.try_read(), 1)
+        await writer
+        self.assertEqual(await channel.read_many(10), [2, 3])
+        self.assertIsNone(channel.try_read())
+
+    async def test_batches_wrap_around(self):
+        channel = iftk.RingChannel(capacity=3)
+        writer = asyncio.create_task(channel.write_many(range(10)))
+        received = []
+        while len(received) < 10:
+            received += await channel.read_many(2)
+        await writer
+        self.assertEqual(received, list(range(10)))
+
+    async def test_close(self):
+        channel = iftk.RingChannel(capacity=1)
+        await channel.write("last")
+        blocked = asyncio.create_task(channel.write("never"))
+        await asyncio.sleep(0)
+        await channel.close()
+
+        with self.assertRaises(iftk.ChannelClosedEvent):
+            await blocked
+        with self.assertRaises(iftk.ChannelClosedEvent):
+            channel.try_write("never")
+        self.assertEqual(await channel.read(), "last")
+        self.assertIsNone(await channel.read())
+        self.assertEqual(await channel.read_many(1), [])
+
+    async def test_notify_readable(self):
+        notified = []
+        channel = iftk.RingChannel(4, notify_readable=lambda: notified.append(1))
+        await channel.write(0)
+        await channel.write_many([1, 2])
+        self.assertEqual(len(notified), 2)
+
+
+class TestPubSubChannel(unittest.IsolatedAsyncioTestCase):
+    async def test_ring_output_channel(self):
+        pubsub = iftk.PubSub()
+        channel = iftk.PubSubChannel(
+            pubsub, output_channel=iftk.RingChannel(4), subscribes_to=str
+        )
+        reader = asyncio.create_task(channel.read())
+        await channel.write(1)
+        await channel.write("reply")
+        self.assertEqual(await reader, "reply")
+        await channel.close()
+        self.assertIsNone(await channel.read())
+
+
+if __name__ == "__main__":
+    unittest.main()
@@ -0,0 +1,85 @@
+# Copyright (c) Meta Platforms, Inc. and affiliates.
+#
+# This source code is licensed under the MIT license found in the
+# LICENSE file in the root directory of this source tree.
+
+import threading
+import unittest
+
+from iftk._iter_utils import iter_on_thread
+
+from .context import iftk
+
+
+def thread_name(*args):
+    return threading.current_thread().name
+
+
+class TestExecutors(unittest.IsolatedAsyncioTestCase):
+    def tearDown(self):
+        iftk.shutdown_executors()
+
+    async def test_named_executor(self):
+        self.assertIs(iftk.get_executor("model"), iftk.get_executor("model"))
+        name = await iftk.run_in_executor("model", thread_name)
+        self.assertTrue(name.startswith("iftk-model"))
+        self.assertNotEqual(await iftk.run_in_executor(None, thread_name), name)
+
+    async def test_micro_batcher_uses_executor(self):
+        batcher = iftk.MicroBatcher(
+            lambda items: [thread_name() for _ in items], executor="batch"
+        )
+        self.assertTrue((await batcher.submit(0)).startswith("iftk-batch"))
+        await batcher.close()
+
+
+class TestIterOnThread(unittest.IsolatedAsyncioTestCase):
+    def tearDown(self):
+        iftk.shutdown_executors()
+
+    async def test_per_item(self):
+        names = [n async for n in iter_on_thread(map(thread_name, range(3)), "items")]
+        self.assertEqual(len(names), 3)
+        self.assertTrue(all(n.startswith("iftk-items") for n in names))
+
+    async def test_batched_runs_in_one_call(self):
+        threads = []
+
+        def produce():
+            for i in range(100):
+                threads.append(threading.get_ident())
+                yield i
+
+        items = [
+            i async for i in iter_on_thread(produce(), batched=True, max_buffered=4)
+        ]
+        self.assertEqual(items, list(range(100)))
+        self.assertEqual(len(set(threads)), 1)
+
+    async def test_batched_bounds_read_ahead(self):
+        produced = []
+
+        def produce():
+            for i in range(100):
+                produced.append(i)
+                yield i
+
+        stream = iter_on_thread(produce(), batched=True, max_buffered=4)
+        self.assertEqual(await anext(stream), 0)
+        await stream.aclose()
+        # At most max_buffered items ahead, plus the one in progress.
+        self.assertLessEqual(len(produced), 6)
+
+    async def test_batched_raises_iterator_error(self):
+        def produce():
+            yield 1
+            raise ValueError("decoder failed")
+
+        stream = iter_on_thread(produce(), batched=True)
+        self.assertEqual(await anext(stream), 1)
+        with self.assertRaises(ValueError):
+            await anext(stream)
+
+
+if __name__ == "__main__":
+    unittest.main()
@@ -0,0 +1,129 @@
+# Copyright (c) Meta Platforms, Inc. and affiliates.
+#
+# This source code is licensed under the MIT license found in the
+# LICENSE file in the root directory of this source tree.
+
+import asyncio
+import time
+import unittest
+
+from .context import iftk
+from .test_utils import QueueSubscriber
+
+
+class Reply:
+    """A fake LLM and TTS that record what was started and what was cancelled."""
+
+    def __init__(self, sentences: list[str]) -> None:
+        self.sentences = sentences
+        self.generated = []
+        self.llm_cancelled = False
+        self.tts_cancelled = []
+
+    async def llm(self):
+        try:
+            for sentence in self.sentences:
+                await asyncio.sleep(0.005)
+                self.generated.append(sentence)
+                yield sentence
+        except (asyncio.CancelledError, GeneratorExit):
+            self.llm_cancelled = True
+            raise
+
+    async def tts(self, sentence: str):
+        try:
+            await asyncio.sleep(0.005)
+            yield sentence.encode()
+        except asyncio.CancelledError:
+            self.tts_cancelled.append(sentence)
+            raise
+
+
+async def speak(turn: iftk.AssistantTurn, reply: Reply, play_time: float, stops: list):
+    async with turn:
+        sentences = turn.closing(reply.llm())
+        audios = turn.closing(iftk.prefetch_stream(sentences, reply.tts, depth=2))
+        i = 0
+        async for audio in audios:
+            async for _ in audio:
+                pass
+            text = reply.generated[i]
+            i += 1
+            stop = lambda: stops.append(text)
+            await turn.say(text, asyncio.sleep(play_time), stop=stop)
+    return turn
+
+
+class TestBargeIn(unittest.IsolatedAsyncioTestCase):
+    async def test_speech_interrupts_turn(self):
+        pubsub = iftk.PubSub(concurrent=True)
+        barge_in = iftk.BargeIn(pubsub)
+        interruptions = QueueSubscriber(pubsub)
+        interruptions.subscribes_to = iftk.InterruptionEvent
+        reply = Reply([f"Sentence {i}." for i in range(10)])
+        stops = []
+
+        speaking = asyncio.create_task(speak(barge_in.turn(), reply, 0.05, stops))
+        # The first sentence has played and the second is playing.
+        await asyncio.sleep(0.09)
+        await pubsub.publish(iftk.SpeechStartEvent(0, 16000, time.monotonic()))
+        turn = await asyncio.wait_for(speaking, 0.05)
+
+        self.assertTrue(turn.interrupted)
+        self.assertEqual(
+            turn.message(), {"role": "assistant", "content": "Sentence 0."}
+        )
+        self.assertEqual(stops, ["Sentence 1."])
+        self.assertTrue(reply.llm_cancelled)
+        self.assertLess(len(reply.generated), 10)
+        self.assertIsNone(barge_in.current)
+
+        event = await asyncio.wait_for(interruptions.queue.get(), 0.05)
+        self.assertEqual(event.spoken, "Sentence 0.")
+        self.assertLess(event.latency, 0.05)
+        await pubsub.shutdown()
+
+    async def test_ignores_speech_from_before_the_turn(self):
+        pubsub = iftk.PubSub()
+        barge_in = iftk.BargeIn(pubsub)
+        before = time.monotonic()
+        reply = Reply(["One.", "Two."])
+
+        speaking = asyncio.create_task(speak(barge_in.turn(), reply, 0.01, []))
+        await asyncio.sleep(0.005)
+        # Late news of the speech being answered, then speech of unknown time
+        # after the turn.
+        await pubsub.publish(iftk.SpeechStartEvent(0, 16000, before))
+        turn = await speaking
+        await pubsub.publish(iftk.SpeechStartEvent(0, 16000))
+
+        self.assertFalse(turn.interrupted)
+        self.assertEqual(turn.text, "One. Two.")
+        self.assertFalse(reply.llm_cancelled)
+
+    async def test_interrupt_after_the_last_wait(self):
+        turn = iftk.AssistantTurn()
+        async with turn:
+            await asyncio.sleep(0)
+            turn.interrupt()  # The block ends before the cancellation arrives.
+        self.assertTrue(turn.interrupted)
+        # The cancellation was taken back, and doesn't hit the next wait.
+        self.assertEqual(asyncio.current_task().cancelling(), 0)
+        await asyncio.sleep(0)
+
+    async def test_outside_cancellation_propagates(self):
+        pubsub = iftk.PubSub()
+        barge_in = iftk.BargeIn(pubsub)
+        reply = Reply([f"Sentence {i}." for i in range(10)])
+
+        speaking = asyncio.create_task(speak(barge_in.turn(), reply, 1.0, []))
+        await asyncio.sleep(0.02)
+        speaking.cancel()
+        with self.assertRaises(asyncio.CancelledError):
+            await speaking
+        self.assertTrue(reply.llm_cancelled)
+        self.assertIsNone(barge_in.current)
+
+
+if __name__ == "__main__":
+    unittest.main()
@@ -0,0 +1,155 @@
+# Copyright (c) Meta Platforms, Inc. and affiliates.
+#
+# This source code is licensed under the MIT license found in the
+# LICENSE file in the root directory of this source tree.
+
+import asyncio
+import unittest
+
+from .context import iftk
+
+
+async def aiter_list(items):
+    for item in items:
+        yield item
+
+
+async def collect(iterator):
+    return [x async for x in iterator]
+
+
+class TestPrefetchStream(unittest.IsolatedAsyncioTestCase):
+    async def test_prefetches_in_order(self):
+        started = []
+
+        async def synthesize(sentence):
+            started.append(sentence)
+            # Later sentences finish first, but output stays in order.
+            await asyncio.sleep(0.01 * (3 - len(started)))
+            for part in sentence.split():
+                yield part
+
+        outputs = []
+        async for audio in iftk.prefetch_stream(
+            aiter_list(["a b", "c", "d e"]), synthesize, depth=2
+        ):
+            if not outputs:
+                await asyncio.sleep(0.05)  # "play" the first sentence
+                # Everything else was synthesized in the meantime.
+                self.assertEqual(started, ["a b", "c", "d e"])
+            outputs.append([part async for part in audio])
+        self.assertEqual(outputs, [["a", "b"], ["c"], ["d", "e"]])
+
+    async def test_depth_bounds_lookahead(self):
+        started = []
+
+        async def synthesize(item):
+            started.append(item)
+            yield item
+
+        stream = iftk.prefetch_stream(aiter_list(range(10)), synthesize, depth=1)
+        first = await anext(stream)
+        await asyncio.sleep(0.01)
+        self.assertEqual(started, [0, 1])
+        self.assertEqual([x async for x in first], [0])
+
+    async def test_close_cancels_outstanding_work(self):
+        cancelled = []
+
+        async def synthesize(item):
+            try:
+                yield item
+                await asyncio.sleep(10)
+            except asyncio.CancelledError:
+                cancelled.append(item)
+                raise
+
+        stream = iftk.prefetch_stream(aiter_list(range(3)), synthesize, depth=2)
+        first = await anext(stream)
+        self.assertEqual(await anext(first), 0)
+        await asyncio.sleep(0.01)
+        await stream.aclose()
+        await asyncio.sleep(0)
+        self.assertEqual(sorted(cancelled), [0, 1, 2])
+
+    async def test_errors_reach_consumer(self):
+        async def synthesize(item):
+            raise ValueError(item)
+            yield
+
+        stream = iftk.prefetch_stream(aiter_list(["bad"]), synthesize)
+        with self.assertRaises(ValueError):
+            async for audio in stream:
+                async for _ in audio:
+                    pass
+
+
+class TestBroadcast(unittest.IsolatedAsyncioTestCase):
+    async def test_every_consumer_sees_every_item(self):
+        chunks = [bytes([i]) * 4 for i in range(10)]
+        consumers = iftk.tee(aiter_list(chunks), 3, max_lag=2)
+        results = await asyncio.gather(*map(collect, consumers))
+        for result in results:
+            self.assertEqual(result, chunks)
+            # Shared, not copied.
+            self.assertTrue(all(a is b for a, b in zip(result, chunks)))
+
+    async def test_block_holds_back_fast_consumer(self):
+        pulled = []
+
+        async def source():
+            for i in range(10):
+                pulled.append(i)
+                yield i
+
+        fast, slow = iftk.tee(source(), 2, max_lag=3)
+        first = [await anext(fast) for _ in range(3)]
+        self.assertEqual(first, [0, 1, 2])
+        blocked = asyncio.create_task(anext(fast))
+        await asyncio.sleep(0.01)
+        self.assertFalse(blocked.done())
+        self.assertEqual(pulled, [0, 1, 2])
+
+        self.assertEqual(await anext(slow), 0)
+        self.assertEqual(await blocked, 3)
+        self.assertEqual(slow.lag, 3)
+
+    async def test_drop_oldest_skips_for_slow_consumer(self):
+        broadcast = iftk.Broadcast(aiter_list(range(10)))
+        fast = broadcast.subscribe()
+        slow = broadcast.subscribe(max_lag=4, policy=iftk.OverflowPolicy.DROP_OLDEST)
+        self.assertEqual([x async for x in fast], list(range(10)))
+        self.assertEqual([x async for x in slow], [6, 7, 8, 9])
+        self.assertEqual(slow.dropped, 6)
+        self.assertEqual(len(broadcast._buffer), 0)
+
+    async def test_closed_consumer_is_not_waited_for(self):
+        a, b = iftk.tee(aiter_list(range(5)), 2, max_lag=1)
+        await b.aclose()
+        self.assertEqual([x async for x in a], list(range(5)))
+
+    async def test_source_error_reaches_all_consumers(self):
+        async def source():
+            yield 1
+            raise RuntimeError("mic unplugged")
+
+        for consumer in iftk.tee(source(), 2):
+            self.assertEqual(await anext(consumer), 1)
+            with self.assertRaises(RuntimeError):
+                await anext(consumer)
+
+    async def test_cancelled_consumer_does_not_break_source(self):
+        async def source():
+            for i in range(3):
+                await asyncio.sleep(0.01)
+                yield i
+
+        a, b = iftk.tee(source(), 2)
+        task = asyncio.create_task(anext(a))
+        await asyncio.sleep(0)
+        task.cancel()
+        self.assertEqual([x async for x in b], [0, 1, 2])
+
+
+if __name__ == "__main__":
+    unittest.main()
@@ -0,0 +1,182 @@
+# Copyright (c) Meta Platforms, Inc. and affiliates.
+#
+# This source code is licensed under the MIT license found in the
+# LICENSE file in the root directory of this source tree.
+
+import asyncio
+import time
+import unittest
+from dataclasses import dataclass
+
+from .context import iftk
+
+
+@dataclass
+class Text:
+    value: str
+
+
+@dataclass
+class Audio:
+    value: str
+
+
+class Source(iftk.Stage):
+    publishes = Text
+
+    def __init__(self, items: list[str]) -> None:
+        super().__init__()
+        self.items = items
+
+    async def run(self) -> None:
+        for item in self.items:
+            await self.publish(Text(item))
+
+
+class Synthesize(iftk.Stage):
+    subscribes_to = Text
+    publishes = Audio
+
+    def __init__(self, delay: float) -> None:
+        super().__init__()
+        self.delay = delay
+
+    async def on_event(self, event: Text) -> None:
+        await asyncio.sleep(self.delay)
+        await self.publish(Audio(event.value.upper()))
+
+
+class Play(iftk.Stage):
+    subscribes_to = Audio
+
+    def __init__(self, delay: float) -> None:
+        super().__init__()
+        self.delay = delay
+        self.played = []
+
+    async def on_event(self, event: Audio) -> None:
+        await asyncio.sleep(self.delay)
+        self.played.append(event.value)
+
+
+class TestPipelineCheck(unittest.IsolatedAsyncioTestCase):
+    async def test_reports_unconnected_and_mistyped_edges(self):
+        class Mistyped(iftk.Stage):
+            subscribes_to = "Text"
+
+        pipeline = iftk.Pipeline([Synthesize(0), Mistyped()])
+        problems = pipeline.check()
+        self.assertEqual(len(problems), 1)
+        self.assertIn("Mistyped.subscribes_to", problems[0])
+
+        pipeline = iftk.Pipeline([Synthesize(0)])
+        self.assertEqual(
+            pipeline.check(),
+            [
+                "Synthesize subscribes to Text, which no other stage publishes",
+                "Synthesize publishes Audio, which no other stage subscribes to",
+            ],
+        )
+        with self.assertRaises(iftk.PipelineError):
+            pipeline.build()
+        # Events exchanged with the outside connect it.
+        pipeline = iftk.Pipeline([Synthesize(0)], inputs=Text, outputs=Audio)
+        self.assertEqual(pipeline.check(), [])
+
+    async def test_subclasses_connect(self):
+        class Start(iftk.SpeechStartEvent):
+            pass
+
+        class Vad(iftk.Stage):
+            publishes = Start
+
+        class Listener(iftk.Stage):
+            subscribes_to = iftk.SpeechEvent
+
+        self.assertEqual(iftk.Pipeline([Vad(), Listener()]).check(), [])
+
+
+class TestPipeline(unittest.IsolatedAsyncioTestCase):
+    async def assertFinishes(self, pipeline: iftk.Pipeline) -> None:
+        async def run():
+            async with pipeline:
+                await pipeline.join()
+
+        task = asyncio.create_task(run())
+        done, _ = await asyncio.wait([task], timeout=1)
+        self.assertIn(task, done, "the pipeline didn't finish")
+
+    async def test_stages_run_concurrently(self):
+        items = [str(i) for i in range(5)]
+        play = Play(0.02)
+        pipeline = iftk.Pipeline([Source(items), Synthesize(0.02), play], inbox_size=2)
+        start = time.monotonic()
+        async with pipeline:
+            await pipeline.join()
+        elapsed = time.monotonic() - start
+
+        self.assertEqual(play.played, items)
+        # One after another, this would take 5 * (0.02 + 0.02) seconds.
+        self.assertLess(elapsed, 0.18)
+        self.assertEqual(pipeline.stats()["Play"].handled, 5)
+
+    async def test_reports_the_bottleneck(self):
+        pipeline = iftk.Pipeline(
+            [Source([str(i) for i in range(10)]), Synthesize(0.001), Play(0.02)],
+            inbox_size=2,
+        )
+        async with pipeline:
+            await pipeline.join()
+            stats = pipeline.stats()
+
+        self.assertEqual(pipeline.bottleneck(), "Play")
+        self.assertGreater(stats["Play"].utilization, 0.8)
+        # Synthesize spends most of its time waiting for room in Play's
+        # inbox, which doesn't count as work.
+        self.assertLess(stats["Synthesize"].utilization, 0.3)
+        self.assertLessEqual(stats["Play"].max_depth, 2)
+
+    async def test_stream_stage(self):
+        async def shout(texts):
+            async for text in texts:
+                await asyncio.sleep(0.01)
+                yield Audio(text.value.upper())
+
+        play = Play(0)
+        stage = iftk.StreamStage(shout, subscribes_to=Text, publishes=Audio)
+        pipeline = iftk.Pipeline([Source(["a", "b", "c"]), stage, play])
+        async with pipeline:
+            await pipeline.join()
+            stats = pipeline.stats()
+
+        self.assertEqual(play.played, ["A", "B", "C"])
+        self.assertAlmostEqual(stats["shout"].busy, 0.03, delta=0.02)
+
+    async def test_stream_stage_that_fails(self):
+        async def fail(texts):
+            async for text in texts:
+                raise RuntimeError(text.value)
+            yield
+
+        play = Play(0)
+        stage = iftk.StreamStage(fail, subscribes_to=Text, publishes=Audio)
+        pipeline = iftk.Pipeline([Source(["a", "b", "c"]), stage, play])
+        with self.assertLogs("iftk.pipeline", "ERROR"):
+            await self.assertFinishes(pipeline)
+        self.assertEqual(play.played, [])
+
+    async def test_stream_stage_that_ends_early(self):
+        async def first(texts):
+            async for text in texts:
+                yield Audio(text.value.upper())
+                return
+
+        play = Play(0)
+        stage = iftk.StreamStage(first, subscribes_to=Text, publishes=Audio)
+        pipeline = iftk.Pipeline([Source(["a", "b", "c"]), stage, play])
+        await self.assertFinishes(pipeline)
+        self.assertEqual(play.played, ["A"])
+
+
+if __name__ == "__main__":
+    unittest.main()
@@ -0,0 +1,178 @@
+# Copyright (c) Meta Platforms, Inc. and affiliates.
+#
+# This source code is licensed under the MIT license found in the
+# LICENSE file in the root directory of this source tree.
+
+import asyncio
+import os
+import unittest
+
+from .context import iftk
+
+
+async def reverse_frames(inputs, tag="out"):
+    """A stage that reverses each frame's bytes and reports on other inputs."""
+    async for x in inputs:
+        if isinstance(x, iftk.AudioFrame):
+            yield iftk.AudioFrame(
+                bytes(x.data)[::-1], x.sample_rate, timestamp=x.timestamp
+            )
+        else:
+            yield (tag, x, os.getpid())
+
+
+async def fail_on_second(inputs):
+    async for i in inputs:
+        if i == 2:
+            raise ValueError("bad input")
+        yield i
+
+
+async def read_all(channel):
+    outputs = []
+    while (x := await channel.read()) is not None:
+        outputs.append(x)
+    return outputs
+
+
+class TestSharedRing(unittest.TestCase):
+    def test_wraps_around(self):
+        ring = iftk.SharedRing(8)
+        other = iftk.SharedRing(name=ring.name)
+        try:
+            self.assertTrue(ring.write(b"abcdef"))
+            self.assertEqual(other.read(4), b"abcd")
+            self.assertFalse(ring.write(b"0123456"))
+            self.assertTrue(ring.write(b"ghijkl"))
+            self.assertEqual(other.read(8), b"efghijkl")
+            self.assertEqual(len(ring), 0)
+            with self.assertRaises(ValueError):
+                ring.write(bytes(9))
+            self.assertFalse(other.room_wanted())
+            ring.want_room()
+            self.assertTrue(other.room_wanted())
+            self.assertFalse(other.room_wanted())
+        finally:
+            other.close()
+            ring.close(unlink=True)
+
+
+class TestProcessSystemLoad(unittest.IsolatedAsyncioTestCase):
+    async def test_loads_without_blocking_the_loop(self):
+        system = iftk.ProcessSystem({"reverse": iftk.ProcessStage(reverse_frames)})
+        ticks = 0
+
+        async def tick():
+            nonlocal ticks
+            while True:
+                ticks += 1
+                await asyncio.sleep(0.01)
+
+        ticker = asyncio.create_task(tick())
+        try:
+            channel = await system.create_async_channel()
+            await channel.close()
+            self.assertEqual(await read_all(channel), [])
+        finally:
+            ticker.cancel()
+            system.close()
+        # Starting a worker process takes longer than a tick.
+        self.assertGreater(ticks, 1)
+
+
+class TestProcessSystem(unittest.IsolatedAsyncioTestCase):
+    @classmethod
+    def setUpClass(cls):
+        cls.system = iftk.ProcessSystem(
+            {
+                "reverse": iftk.ProcessStage(reverse_frames),
+                "fail": iftk.ProcessStage(fail_on_second),
+            },
+            ring_capacity=1 << 12,
+        )
+        cls.system.load()
+
+    @classmethod
+    def tearDownClass(cls):
+        cls.system.close()
+
+    async def test_frames_and_events(self):
+        notified = []
+        channel = await self.system.create_async_channel(
+            lambda: notified.append(True), stage="reverse", tag="vad"
+        )
+        # More audio than the ring holds at once.
+        frames = [
+            iftk.AudioFrame(bytes([i]) * 1000 + b"\x01\x02", 16000, timestamp=i)
+            for i in range(10)
+        ]
+        for frame in frames:
+            await channel.write(frame)
+            self.assertEqual((await channel.read()).data, bytes(frame.data)[::-1])
+        await channel.write({"speech": True})
+        await channel.close()
+        ((tag, item, pid),) = await read_all(channel)
+        self.assertEqual((tag, item), ("vad", {"speech": True}))
+        self.assertNotEqual(pid, os.getpid())
+        self.assertTrue(notified)
+
+    async def test_concurrent_writes(self):
+        channel = await self.system.create_async_channel(stage="reverse")
+        reading = asyncio.create_task(read_all(channel))
+
+        async def write(value):
+            # Two frames overflow the ring, so writers wait for room together.
+            for i in range(10):
+                await channel.write(iftk.AudioFrame(bytes([value, i]) * 1000, 16000))
+
+        await asyncio.gather(*(write(value) for value in range(4)))
+        await channel.close()
+        outputs = await asyncio.wait_for(reading, 10)
+        self.assertCountEqual(
+            [bytes(x.data) for x in outputs],
+            [bytes([i, value]) * 1000 for value in range(4) for i in range(10)],
+        )
+
+    async def test_worker_is_reused(self):
+        pids = set()
+        for _ in range(2):
+            channel = await self.system.create_async_channel(stage="reverse")
+            await channel.write("ping")
+            await channel.close()
+            ((_, _, pid),) = await read_all(channel)
+            pids.add(pid)
+        self.assertEqual(len(pids), 1)
+
+    async def test_one_channel_per_stage(self):
+        channel = await self.system.create_async_channel(stage="reverse")
+        with self.assertRaises(RuntimeError):
+            await self.system.create_async_channel(stage="reverse")
+        await channel.close()
+        # Closing is enough to open the next one.
+        channel = await self.system.create_async_channel(stage="reverse")
+        await channel.close()
+        self.assertEqual(await read_all(channel), [])
+
+    async def test_many_writes_without_reading(self):
+        # Enough to fill the pipes both ways, should either side block on them.
+        channel = await self.system.create_async_channel(stage="reverse")
+        items = [str(i) * 10000 for i in range(100)]
+        for item in items:
+            await channel.write(item)
+        await channel.close()
+        self.assertEqual([x[1] for x in await read_all(channel)], items)
+
+    async def test_stage_error_is_raised(self):
+        channel = await self.system.create_async_channel(stage="fail")
+        for i in range(4):
+            await channel.write(i)
+        await channel.close()
+        self.assertEqual(await channel.read(), 0)
+        self.assertEqual(await channel.read(), 1)
+        with self.assertRaises(ValueError):
+            await channel.read()
+        self.assertIsNone(await channel.read())
+
+
+if __name__ == "__main__":
+    unittest.main()
@@ -0,0 +1,128 @@
+# Copyright (c) Meta Platforms, Inc. and affiliates.
+#
+# This source code is licensed under the MIT license found in the
+# LICENSE file in the root directory of this source tree.
+
+import asyncio
+import unittest
+
+from .context import iftk
+from .test_utils import QueueSubscriber
+
+
+class Base:
+    pass
+
+
+class Derived(Base):
+    pass
+
+
+class Other:
+    pass
+
+
+class BaseEventSubscriber(QueueSubscriber):
+    subscribes_to = Base
+
+
+class OtherSubscriber(QueueSubscriber):
+    subscribes_to = (Other, int)
+
+
+class TestPubSubDispatch(unittest.IsolatedAsyncioTestCase):
+    async def test_dispatch_by_type(self):
+        pubsub = iftk.PubSub()
+        everything = QueueSubscriber(pubsub)
+        base = BaseEventSubscriber(pubsub)
+        other = OtherSubscriber(pubsub)
+
+        for event in (Derived(), Other(), 3, Base()):
+            await pubsub.publish(event)
+
+        self.assertEqual(everything.queue.qsize(), 4)
+        self.assertEqual(base.queue.qsize(), 2)
+        self.assertEqual(other.queue.qsize(), 2)
+        self.assertIsInstance(base.queue.get_nowait(), Derived)
+        self.assertIsInstance(other.queue.get_nowait(), Other)
+
+    async def test_subscribe_rebuilds_index(self):
+        pubsub = iftk.PubSub()
+        first = BaseEventSubscriber(pubsub)
+        await pubsub.publish(Derived())
+        second = BaseEventSubscriber(pubsub)
+        await pubsub.publish(Derived())
+
+        self.assertEqual(first.queue.qsize(), 2)
+        self.assertEqual(second.queue.qsize(), 1)
+
+
+class SlowSubscriber(QueueSubscriber):
+    """Subscriber that blocks in on_event() until `release` is set."""
+
+    def __init__(self, pubsub: iftk.PubSub) -> None:
+        super().__init__(pubsub)
+        self.release = asyncio.Event()
+
+    async def on_event(self, evt) -> None:
+        await self.release.wait()
+        await super().on_event(evt)
+
+
+class TestPubSubConcurrent(unittest.IsolatedAsyncioTestCase):
+    async def test_slow_subscriber_does_not_stall_others(self):
+        pubsub = iftk.PubSub(concurrent=True)
+        slow = SlowSubscriber(pubsub)
+        fast = QueueSubscriber(pubsub)
+
+        for i in range(5):
+            await pubsub.publish(i)
+        for i in range(5):
+            self.assertEqual(await fast.queue.get(), i)
+        self.assertEqual(slow.queue.qsize(), 0)
+        self.assertEqual(pubsub.inbox_stats()[slow].depth, 4)
+
+        slow.release.set()
+        await pubsub.drain()
+        self.assertEqual([slow.queue.get_nowait() for _ in range(5)], list(range(5)))
+
+    async def test_overflow_policies(self):
+        cases = {
+            iftk.OverflowPolicy.DROP_OLDEST: ((1, 2, 3, 4), [0, 3, 4]),
+            iftk.OverflowPolicy.DROP_NEWEST: ((1, 2, 3, 4), [0, 1, 2]),
+            iftk.OverflowPolicy.COALESCE: ((1, "a", "b", 4), [0, "b", 4]),
+        }
+        for policy, (published, delivered) in cases.items():
+            with self.subTest(policy=policy):
+                pubsub = iftk.PubSub(concurrent=True, inbox_size=2, overflow=policy)
+                slow = SlowSubscriber(pubsub)
+                # The first event is taken off the inbox by the worker and
+                # blocks there, the rest compete for the two inbox slots.
+                await pubsub.publish(0)
+                await asyncio.sleep(0)
+                for event in published:
+                    await pubsub.publish(event)
+                slow.release.set()
+                await pubsub.shutdown()
+                events = [slow.queue.get_nowait() for _ in range(slow.queue.qsize())]
+                self.assertEqual(events, delivered)
+
+    async def test_block_applies_backpressure(self):
+        pubsub = iftk.PubSub(concurrent=True, inbox_size=1)
+        slow = SlowSubscriber(pubsub)
+        await pubsub.publish(0)
+        await asyncio.sleep(0)
+        await pubsub.publish(1)
+        blocked = asyncio.create_task(pubsub.publish(2))
+        await asyncio.sleep(0)
+        self.assertFalse(blocked.done())
+
+        slow.release.set()
+        await blocked
+        await pubsub.drain()
+        self.assertEqual(pubsub.inbox_stats()[slow].delivered, 3)
+        self.assertEqual(pubsub.inbox_stats()[slow].max_depth, 1)
+
+
+if __name__ == "__main__":
+    unittest.main()
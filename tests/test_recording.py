@@ -0,0 +1,140 @@
+# Copyright (c) Meta Platforms, Inc. and affiliates.
+#
+# This source code is licensed under the MIT license found in the
+# LICENSE file in the root directory of this source tree.
+
+import asyncio
+import os
+import tempfile
+import threading
+import time
+import unittest
+from dataclasses import dataclass
+
+from .context import iftk
+from .test_utils import QueueSubscriber
+
+
+def frame(value: int, n: int = 160) -> iftk.AudioFrame:
+    return iftk.AudioFrame(value.to_bytes(2, "little", signed=True) * n, 16000)
+
+
+@dataclass(frozen=True)
+class Captured:
+    timestamp: float
+
+
+class TestRecording(unittest.IsolatedAsyncioTestCase):
+    def setUp(self):
+        self.tmp = tempfile.TemporaryDirectory()
+        self.path = os.path.join(self.tmp.name, "session.log")
+
+    def tearDown(self):
+        self.tmp.cleanup()
+
+    async def record(self, events, gap: float = 0.0):
+        pubsub = iftk.PubSub()
+        recorder = iftk.EventRecorder(pubsub, self.path)
+        for event in events:
+            await pubsub.publish(event)
+            await asyncio.sleep(gap)
+        await pubsub.shutdown()
+        return recorder
+
+    async def test_round_trip(self):
+        start = time.monotonic()
+        audio = [frame(1), frame(-2, 161), frame(3)]
+        speech = iftk.SpeechStartEvent(160, 16000, start)
+        recorder = await self.record(
+            [audio[0], speech, audio[1], iftk.TranscriptEvent("hi"), audio[2]]
+        )
+        self.assertEqual(recorder.recorded["AudioFrame"], 3)
+
+        # The samples are stored as raw PCM, each frame aligned to 8 bytes.
+        with open(iftk.pcm_path(self.path), "rb") as f:
+            pcm = f.read()
+        self.assertEqual(pcm[:320], bytes(audio[0].data))
+        self.assertEqual(pcm[320:642], bytes(audio[1].data))
+        self.assertEqual(pcm[648:], bytes(audio[2].data))
+
+        with iftk.EventLog(self.path) as log:
+            records = list(log)
+            events = [r.event for r in records]
+            self.assertEqual(
+                [type(e).__name__ for e in events],
+                [
+                    "AudioFrame",
+                    "SpeechStartEvent",
+                    "AudioFrame",
+                    "TranscriptEvent",
+                    "AudioFrame",
+                ],
+            )
+            self.assertEqual(
+                [bytes(e.data) for e in events[::2]], [bytes(a.data) for a in audio]
+            )
+            # A view of the mapped file, not a copy.
+            self.assertIsInstance(events[0].data, memoryview)
+            self.assertEqual(events[3], iftk.TranscriptEvent("hi"))
+            # Times are relative to the start of the recording.
+            self.assertAlmostEqual(events[1].timestamp, 0.0, delta=0.1)
+            self.assertLess(events[0].timestamp, 0.1)
+            self.assertEqual(sorted(r.time for r in records), [r.time for r in records])
+            del records, events
+
+    async def test_skips_unpicklable_events(self):
+        recorder = await self.record([threading.Lock(), "kept"])
+        self.assertEqual(recorder.skipped["lock"], 1)
+        with iftk.EventLog(self.path) as log:
+            self.assertEqual([r.event for r in log], ["kept"])
+
+    async def test_reads_up_to_a_cut_short_record(self):
+        await self.record(["a", "b", frame(1)])
+        size = os.path.getsize(self.path)
+        with open(self.path, "r+b") as f:
+            f.truncate(size - 3)
+        with iftk.EventLog(self.path) as log:
+            self.assertEqual([r.event for r in log], ["a", "b"])
+
+    async def test_replay(self):
+        await self.record([frame(1), "a", frame(2), "b"], gap=0.03)
+        with iftk.EventLog(self.path) as log:
+            recorded = [r.time for r in log]
+            captured = [
+                r.event.timestamp for r in log if isinstance(r.event, iftk.AudioFrame)
+            ]
+        pubsub = iftk.PubSub()
+        received = QueueSubscriber(pubsub)
+
+        start = time.monotonic()
+        stats = await iftk.replay(self.path, pubsub)
+        self.assertEqual(stats.events, 4)
+        self.assertGreaterEqual(stats.duration, recorded[-1])
+        self.assertLess(stats.max_lag, 0.1)
+        events = [received.queue.get_nowait() for _ in range(4)]
+        self.assertEqual(events[1::2], ["a", "b"])
+        # Capture times are moved to the replay's clock.
+        self.assertAlmostEqual(events[2].timestamp, start + captured[1], delta=0.1)
+
+        start = time.monotonic()
+        stats = await iftk.replay(self.path, pubsub, speed=None, only=iftk.AudioFrame)
+        self.assertEqual(stats.events, 2)
+        self.assertLess(time.monotonic() - start, recorded[-1])
+
+    async def test_frozen_events(self):
+        captured = time.monotonic()
+        await self.record([Captured(captured)])
+        with iftk.EventLog(self.path) as log:
+            ((_, event),) = list(log)
+        self.assertLess(event.timestamp, 0.1)
+
+        pubsub = iftk.PubSub()
+        received = QueueSubscriber(pubsub)
+        await iftk.replay(self.path, pubsub, speed=None)
+        self.assertAlmostEqual(
+            received.queue.get_nowait().timestamp, time.monotonic(), delta=0.1
+        )
+
+
+if __name__ == "__main__":
+    unittest.main()
@@ -0,0 +1,82 @@
+# Copyright (c) Meta Platforms, Inc. and affiliates.
+#
+# This source code is licensed under the MIT license found in the
+# LICENSE file in the root directory of this source tree.
+
+import asyncio
+import threading
+import time
+import unittest
+
+from .context import iftk
+
+
+class CountingLoader:
+    """Loader returning a fresh object per call, after an optional delay."""
+
+    def __init__(self, delay: float = 0.0) -> None:
+        self.delay = delay
+        self.calls = 0
+        self.lock = threading.Lock()
+
+    def __call__(self) -> object:
+        with self.lock:
+            self.calls += 1
+        time.sleep(self.delay)
+        return object()
+
+
+class TestModelRegistry(unittest.IsolatedAsyncioTestCase):
+    async def test_concurrent_acquire_loads_once(self):
+        registry = iftk.ModelRegistry()
+        loader = CountingLoader(delay=0.05)
+        spec = iftk.ModelSpec("model", loader)
+
+        models = await asyncio.gather(*(registry.acquire(spec) for _ in range(8)))
+        self.assertEqual(loader.calls, 1)
+        self.assertTrue(all(model is models[0] for model in models))
+        self.assertIs(
+            registry.get(iftk.ModelSpec("model", CountingLoader())), models[0]
+        )
+
+    async def test_key_includes_quantization_and_device(self):
+        registry = iftk.ModelRegistry()
+        loader = CountingLoader()
+        registry.get(iftk.ModelSpec("model", loader))
+        registry.get(iftk.ModelSpec("model", loader, quantization="4bit"))
+        registry.get(iftk.ModelSpec("model", loader, device="cuda"))
+        self.assertEqual(loader.calls, 3)
+        self.assertEqual(len(registry), 3)
+
+    def test_warm_up_and_memory_budget(self):
+        registry = iftk.ModelRegistry(memory_budget=2, size_of=lambda model: 1)
+        specs = [iftk.ModelSpec(name, CountingLoader()) for name in "abc"]
+        registry.warm_up(specs[:2])
+        self.assertIn(specs[0], registry)
+        self.assertIn(specs[1], registry)
+
+        registry.get(specs[0])  # a is now more recently used than b
+        registry.get(specs[2])
+        self.assertIn(specs[0], registry)
+        self.assertNotIn(specs[1], registry)
+        self.assertEqual(registry.memory_usage, 2)
+
+    def test_system_uses_default_registry(self):
+        self.assertIs(iftk.System().models, iftk.default_registry())
+
+    def test_system_load_warms_up_its_models(self):
+        loader = CountingLoader()
+
+        class Loaded(iftk.System):
+            model_specs = [iftk.ModelSpec("system model", loader)]
+
+        system = Loaded(iftk.ModelRegistry())
+        system.load()
+        system.load()
+        self.assertEqual(loader.calls, 1)
+        self.assertIn(Loaded.model_specs[0], system.models)
+        iftk.System(iftk.ModelRegistry()).load()  # No models to load.
+
+
+if __name__ == "__main__":
+    unittest.main()
@@ -0,0 +1,72 @@
+# Copyright (c) Meta Platforms, Inc. and affiliates.
+#
+# This source code is licensed under the MIT license found in the
+# LICENSE file in the root directory of this source tree.
+
+import unittest
+
+from .context import iftk
+
+
+def segment(tokens, policy=iftk.SegmentPolicy.SENTENCE, **kwargs):
+    segmenter = iftk.Segmenter(policy, **kwargs)
+    segments = []
+    for token in tokens:
+        segments += segmenter.push(token)
+    return segments + segmenter.flush()
+
+
+class TestSegmenter(unittest.TestCase):
+    def test_sentences(self):
+        tokens = ["Hi", " there", "!", " How", " are", " you", "?", " Fine", "."]
+        self.assertEqual(segment(tokens), ["Hi there!", "How are you?", "Fine."])
+
+    def test_sentence_end_is_held_for_lookahead(self):
+        segmenter = iftk.Segmenter()
+        self.assertEqual(segmenter.push("It costs 3."), [])
+        self.assertEqual(segmenter.push("5 dollars. Then"), ["It costs 3.5 dollars."])
+        self.assertEqual(segmenter.flush(), ["Then"])
+
+    def test_abbreviations_initials_and_lists(self):
+        text = "Ask Dr. Smith, e.g. about J. Doe in the U.S. now.\n1. Go home. Rest"
+        self.assertEqual(
+            segment(list(text)),
+            [
+                "Ask Dr. Smith, e.g. about J. Doe in the U.S. now.",
+                "1. Go home.",
+                "Rest",
+            ],
+        )
+
+    def test_newlines_and_closers(self):
+        tokens = ['He said "stop."', " Then\n", "left\n\n", "done"]
+        self.assertEqual(segment(tokens), ['He said "stop."', "Then", "left", "done"])
+
+    def test_clause_policy(self):
+        tokens = ["Well, I think", " that is fine; but", " maybe not."]
+        self.assertEqual(
+            segment(tokens, iftk.SegmentPolicy.CLAUSE),
+            ["Well, I think that is fine;", "but maybe not."],
+        )
+
+    def test_first_chunk_policy(self):
+        tokens = "The answer to your question is that it depends. Really.".split(" ")
+        tokens = [tokens[0]] + [" " + t for t in tokens[1:]]
+        self.assertEqual(
+            segment(tokens, iftk.SegmentPolicy.FIRST_CHUNK, first_chunk_words=3),
+            ["The answer to", "your question is that it depends.", "Really."],
+        )
+
+
+class TestSegmentStream(unittest.IsolatedAsyncioTestCase):
+    async def test_flushes_at_end_of_stream(self):
+        async def tokens():
+            for token in ["One.", " Two", ""]:
+                yield token
+
+        segments = [s async for s in iftk.segment_stream(tokens())]
+        self.assertEqual(segments, ["One.", "Two"])
+
+
+if __name__ == "__main__":
+    unittest.main()
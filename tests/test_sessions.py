@@ -0,0 +1,180 @@
+# Copyright (c) Meta Platforms, Inc. and affiliates.
+#
+# This source code is licensed under the MIT license found in the
+# LICENSE file in the root directory of this source tree.
+
+import asyncio
+import contextvars
+import threading
+import unittest
+from dataclasses import dataclass
+
+from .context import iftk
+
+
+@dataclass
+class Utterance:
+    text: str
+
+
+@dataclass
+class Reply:
+    text: str
+    turn: int
+
+
+class Counter(iftk.Subscriber):
+    """Replies to each utterance with the number of turns in its session."""
+
+    subscribes_to = Utterance
+    publishes = Reply
+
+    def __init__(self, session: iftk.Session, executor=None) -> None:
+        super().__init__(session.pubsub)
+        self.session = session
+        self.executor = executor
+        session.state["turns"] = 0
+
+    async def on_event(self, event: Utterance) -> None:
+        self.session.state["turns"] += 1
+        text = await iftk.run_in_executor(self.executor, str.upper, event.text)
+        await self.publish(Reply(text, self.session.state["turns"]))
+
+
+def counter_setup(session: iftk.Session, executor=None) -> None:
+    Counter(session, executor)
+
+
+class TestSessionManager(unittest.IsolatedAsyncioTestCase):
+    async def test_sessions_are_isolated(self):
+        manager = iftk.SessionManager(counter_setup, outputs=Reply)
+        a = await manager.create_async_channel(session_id="a")
+        b = await manager.create_async_channel(session_id="b")
+        await a.write(Utterance("one"))
+        await a.write(Utterance("two"))
+        await b.write(Utterance("three"))
+
+        self.assertEqual(await a.read(), Reply("ONE", 1))
+        self.assertEqual(await a.read(), Reply("TWO", 2))
+        self.assertEqual(await b.read(), Reply("THREE", 1))
+        await manager.shutdown()
+        self.assertEqual(len(manager), 0)
+
+    async def test_admission_limit(self):
+        manager = iftk.SessionManager(counter_setup, max_sessions=1)
+        first = await manager.create_async_channel()
+        with self.assertRaises(iftk.SessionLimitError):
+            await manager.create_async_channel()
+        self.assertEqual(manager.stats.rejected, 1)
+
+        manager.admission_timeout = 1.0
+        waiting = asyncio.create_task(manager.create_async_channel(session_id="next"))
+        await asyncio.sleep(0.01)
+        self.assertFalse(waiting.done())
+        await first.close()
+        second = await waiting
+        self.assertIs(manager.get("next"), second)
+        await manager.shutdown()
+
+    async def test_duplicate_id_while_waiting_for_a_slot(self):
+        manager = iftk.SessionManager(
+            counter_setup, max_sessions=3, admission_timeout=1.0
+        )
+        sessions = [await manager.create_async_channel() for _ in range(3)]
+        waiting = [
+            asyncio.create_task(manager.create_async_channel(session_id="x"))
+            for _ in range(2)
+        ]
+        await asyncio.sleep(0.01)
+        await sessions[0].close()
+        await sessions[1].close()
+        first, second = await asyncio.gather(*waiting, return_exceptions=True)
+
+        self.assertIs(manager.get("x"), first)
+        self.assertIsInstance(second, ValueError)
+        await manager.shutdown()
+
+    async def test_idle_sessions_expire(self):
+        manager = iftk.SessionManager(counter_setup, outputs=Reply, idle_timeout=0.05)
+        idle = await manager.create_async_channel()
+        active = await manager.create_async_channel()
+        # Fill the idle session's output, which nobody reads.
+        for _ in range(manager.output_size + 2):
+            await idle.write(Utterance("unread"))
+        for _ in range(4):
+            await asyncio.sleep(0.03)
+            await active.write(Utterance("hi"))
+            await active.read()
+
+        self.assertEqual(list(manager.sessions.values()), [active])
+        self.assertEqual(manager.stats.expired, 1)
+        self.assertIsNone(await idle.read())
+        await manager.shutdown()
+
+    async def test_setup_failure_frees_slot(self):
+        def setup(session):
+            raise ValueError("bad config")
+
+        manager = iftk.SessionManager(setup, max_sessions=1)
+        for _ in range(2):
+            with self.assertRaises(ValueError):
+                await manager.create_async_channel()
+        self.assertEqual(len(manager), 0)
+
+    async def test_fair_executor_keys_by_session(self):
+        executor = iftk.FairExecutor()
+        manager = iftk.SessionManager(
+            lambda session: counter_setup(session, executor), outputs=Reply
+        )
+        session = await manager.create_async_channel(session_id="s")
+        await session.write(Utterance("x"))
+        await session.read()
+        await manager.shutdown()
+        executor.shutdown()
+        self.assertEqual(executor.completed, {"s": 1})
+
+
+class TestFairExecutor(unittest.TestCase):
+    def test_round_robin_between_sessions(self):
+        executor = iftk.FairExecutor()
+        release = threading.Event()
+        order = []
+
+        def submit(session, name):
+            def run():
+                current = iftk.current_session.set(session)
+                try:
+                    return executor.submit(order.append, name)
+                finally:
+                    iftk.current_session.reset(current)
+
+            return contextvars.copy_context().run(run)
+
+        started = threading.Event()
+        executor.submit(lambda: started.set() or release.wait())
+        started.wait()
+        futures = [submit("a", f"a{i}") for i in range(3)]
+        futures += [submit("b", f"b{i}") for i in range(2)]
+        self.assertEqual(executor.pending(), {"a": 3, "b": 2})
+        release.set()
+        for future in futures:
+            future.result()
+        executor.shutdown()
+        self.assertEqual(order, ["a0", "b0", "a1", "b1", "a2"])
+
+    def test_shutdown_cancels_queued(self):
+        executor = iftk.FairExecutor()
+        started, release = threading.Event(), threading.Event()
+        running = executor.submit(lambda: started.set() or release.wait())
+        queued = executor.submit(int)
+        started.wait()
+        threading.Timer(0.01, release.set).start()
+        executor.shutdown(cancel_futures=True)
+        self.assertTrue(running.result())
+        self.assertTrue(queued.cancelled())
+        with self.assertRaises(RuntimeError):
+            executor.submit(int)
+
+
+if __name__ == "__main__":
+    unittest.main()
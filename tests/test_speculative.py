@@ -0,0 +1,104 @@
+# Copyright (c) Meta Platforms, Inc. and affiliates.
+#
+# This source code is licensed under the MIT license found in the
+# LICENSE file in the root directory of this source tree.
+
+import asyncio
+import unittest
+
+from .context import iftk
+
+
+class Responder:
+    """A fake LLM that records which prompts it was started and cancelled on."""
+
+    def __init__(self) -> None:
+        self.started = []
+        self.cancelled = []
+
+    async def __call__(self, text):
+        self.started.append(text)
+        try:
+            for word in text.split():
+                await asyncio.sleep(0.001)
+                yield word.upper()
+        except asyncio.CancelledError:
+            self.cancelled.append(text)
+            raise
+
+
+async def collect(stream):
+    return [x async for x in stream]
+
+
+async def events(*items):
+    for text, is_final, speech_final in items:
+        yield iftk.TranscriptEvent(text, is_final, speech_final=speech_final)
+        await asyncio.sleep(0.01)
+
+
+class TestSpeculator(unittest.IsolatedAsyncioTestCase):
+    async def test_hit_reuses_speculation(self):
+        respond = Responder()
+        speculator = iftk.Speculator(respond, stable_updates=2)
+        speculator.update("hello there")
+        self.assertEqual(respond.started, [])
+        speculator.update("Hello there")
+        await asyncio.sleep(0.05)
+        self.assertEqual(respond.started, ["Hello there"])
+
+        result = await collect(speculator.finalize("Hello, there."))
+        self.assertEqual(result, ["HELLO", "THERE"])
+        self.assertEqual(respond.started, ["Hello there"])
+        self.assertEqual(speculator.stats, iftk.SpeculationStats(1, 1, 0))
+
+    async def test_miss_restarts_on_final_text(self):
+        respond = Responder()
+        speculator = iftk.Speculator(respond, stable_updates=1)
+        speculator.update("turn on")
+        await asyncio.sleep(0)
+        result = await collect(speculator.finalize("turn on the lights"))
+        self.assertEqual(result, ["TURN", "ON", "THE", "LIGHTS"])
+        self.assertEqual(respond.started, ["turn on", "turn on the lights"])
+        self.assertEqual(respond.cancelled, ["turn on"])
+        self.assertEqual(speculator.stats, iftk.SpeculationStats(2, 0, 1))
+
+    async def test_closing_response_cancels_it(self):
+        respond = Responder()
+        speculator = iftk.Speculator(respond)
+        stream = speculator.finalize("one two three")
+        await anext(stream)
+        await stream.aclose()
+        await asyncio.sleep(0)
+        self.assertEqual(respond.cancelled, ["one two three"])
+
+
+class TestSpeculativeResponses(unittest.IsolatedAsyncioTestCase):
+    async def test_utterances(self):
+        respond = Responder()
+        transcripts = events(
+            ("what", False, False),
+            ("what time", False, False),
+            ("what time", False, False),
+            ("what time", True, False),
+            ("is it", False, False),
+            ("is it", True, True),
+            ("bye", True, True),
+        )
+        results = []
+        async for text, response in iftk.speculative_responses(transcripts, respond):
+            results.append((text, await collect(response)))
+
+        self.assertEqual(
+            results,
+            [
+                ("what time is it", ["WHAT", "TIME", "IS", "IT"]),
+                ("bye", ["BYE"]),
+            ],
+        )
+        # Speculated on "what time" and "what time is it", then used the latter.
+        self.assertEqual(respond.started, ["what time", "what time is it", "bye"])
+
+
+if __name__ == "__main__":
+    unittest.main()
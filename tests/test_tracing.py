@@ -0,0 +1,155 @@
+# Copyright (c) Meta Platforms, Inc. and affiliates.
+#
+# This source code is licensed under the MIT license found in the
+# LICENSE file in the root directory of this source tree.
+
+import asyncio
+import json
+import unittest
+
+from .context import iftk
+from .test_utils import QueueSubscriber
+
+
+async def slow_source(n: int, delay: float = 0.0):
+    for i in range(n):
+        await asyncio.sleep(delay)
+        yield i
+
+
+@iftk.traced_stream("double")
+async def double(stream):
+    async for x in stream:
+        yield 2 * x
+
+
+@iftk.traced_stream("add")
+async def add(stream, *, other):
+    other = aiter(other)
+    async for x in stream:
+        yield x + await anext(other)
+
+
+@iftk.traced_stream("vad")
+async def fake_vad(n_turns: int):
+    for i in range(n_turns):
+        yield iftk.SpeechStartEvent(i * 100, 1000)
+        await asyncio.sleep(0.01)
+        yield iftk.SpeechEndEvent(i * 100 + 50, 1000)
+
+
+class Reply:
+    pass
+
+
+class Responder(iftk.Subscriber):
+    subscribes_to = iftk.SpeechEndEvent
+    publishes = Reply
+
+    async def on_event(self, event) -> None:
+        await asyncio.sleep(0.02)
+        await self.publish(Reply())
+
+
+class TestTracing(unittest.IsolatedAsyncioTestCase):
+    def tearDown(self):
+        iftk.disable_tracing()
+
+    def test_disabled_returns_stream_unchanged(self):
+        stream = double(slow_source(1))
+        self.assertEqual(stream.__qualname__, "double")
+        self.assertIsNone(iftk.get_tracer())
+
+    async def test_service_time_excludes_input_wait(self):
+        tracer = iftk.enable_tracing()
+        self.assertEqual([x async for x in double(slow_source(3, 0.02))], [0, 2, 4])
+
+        spans = [r for r in tracer.records if r.name == "double"]
+        self.assertEqual(len(spans), 3)
+        for span in spans:
+            self.assertGreaterEqual(span.duration, 0.02)
+            self.assertLess(span.args["service"], 0.01)
+        self.assertLess(tracer.service_times()["double"].percentile(99), 0.01)
+
+    async def test_service_time_excludes_every_input_wait(self):
+        tracer = iftk.enable_tracing()
+        stream = add(slow_source(3, 0.02), other=slow_source(3, 0.02))
+        self.assertEqual([x async for x in stream], [0, 2, 4])
+
+        spans = [r for r in tracer.records if r.name == "add"]
+        self.assertEqual(len(spans), 3)
+        for span in spans:
+            self.assertGreaterEqual(span.duration, 0.04)
+            self.assertLess(span.args["service"], 0.01)
+
+    async def test_turns_are_per_context(self):
+        tracer = iftk.enable_tracing()
+        event = iftk.SpeechStartEvent(0, 1000)
+
+        async def see(event):
+            tracer.on_event(event)
+            return iftk.current_turn.get()
+
+        # Each session's tasks start their own turn on the same event.
+        turns = await asyncio.gather(see(event), see(event))
+        self.assertNotIn(None, turns)
+        self.assertNotEqual(turns[0], turns[1])
+
+    async def test_turns_flow_through_concurrent_pubsub(self):
+        tracer = iftk.enable_tracing()
+        pubsub = iftk.PubSub(concurrent=True)
+        Responder(pubsub)
+        replies = QueueSubscriber(pubsub)
+        replies.subscribes_to = Reply
+
+        async for event in fake_vad(3):
+            await pubsub.publish(event)
+            await pubsub.drain()
+        await pubsub.shutdown()
+
+        turns = [r.turn for r in tracer.records if r.name == "Reply"]
+        self.assertEqual(len(set(turns)), 3)
+        for turn in turns:
+            names = {r.name for r in tracer.records if r.turn == turn}
+            self.assertLessEqual(
+                {
+                    "turn",
+                    "SpeechStartEvent",
+                    "SpeechEndEvent",
+                    "vad:first",
+                    "Responder",
+                },
+                names,
+            )
+
+        latency = tracer.latency("SpeechEndEvent", "Reply")
+        self.assertEqual(len(latency), 3)
+        self.assertGreaterEqual(latency.percentile(50), 0.02)
+        self.assertIn("service/Responder", tracer.histograms())
+
+    async def test_chrome_trace(self):
+        tracer = iftk.enable_tracing()
+        iftk.start_turn("t")
+        async for _ in double(slow_source(2)):
+            pass
+        trace = json.loads(json.dumps(tracer.chrome_trace()))
+
+        events = trace["traceEvents"]
+        names = {e["args"]["name"] for e in events if e["ph"] == "M"}
+        self.assertEqual(names, {"turns", "double"})
+        self.assertEqual(
+            sum(e["ph"] == "X" and e["name"] == "double" for e in events), 2
+        )
+        self.assertIn("turn t", {e["name"] for e in events})
+
+
+class TestHistogram(unittest.TestCase):
+    def test_summary_and_buckets(self):
+        histogram = iftk.Histogram([0.004, 0.001, 0.002, 0.0005])
+        self.assertEqual(histogram.percentile(50), 0.002)
+        self.assertEqual(histogram.summary()["max"], 0.004)
+        self.assertEqual(histogram.buckets(), [(0.001, 2), (0.002, 1), (0.004, 1)])
+
+
+if __name__ == "__main__":
+    unittest.main()